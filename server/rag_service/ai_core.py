@@ -5,9 +5,9 @@ import logging
 import os
 import io
 import re
-import copy
 import uuid
-from typing import Any, Callable, Dict, List, Optional, Union
+import hashlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
 from datetime import datetime # For improved date parsing in metadata
 
 # --- Global Initializations ---
@@ -21,6 +21,16 @@ except ImportError as e:
     # Depending on how critical config is, you might want to sys.exit(1)
     # For now, we'll let it proceed and other parts will fail if config isn't loaded.
 
+import model_registry # Lazy, on-demand loading of spaCy / embedding models
+import embedding_service # Shared, deduplicated embedding encoders
+import embedding_cache # Persistent chunk-embedding cache
+import embedding_pool # Multi-process encoding for large documents (ingestion workers)
+import pdf_extraction # Page-parallel pdfplumber extraction
+import ocr_engine # Process-pool OCR
+import text_splitter # Offset-based recursive chunk splitter
+import ingestion_pipeline # Overlapped embed -> upsert stages
+import text_normalizer # Precompiled cleaning / layout regexes
+
 
 # Local aliases for config flags, models, constants, and classes from config.py
 # Ensure all these are actually defined in your config.py
@@ -32,11 +42,13 @@ PPTX_AVAILABLE = getattr(config, 'PPTX_AVAILABLE', False)
 PIL_AVAILABLE = getattr(config, 'PIL_AVAILABLE', False)
 FITZ_AVAILABLE = getattr(config, 'FITZ_AVAILABLE', False)
 PYTESSERACT_AVAILABLE = getattr(config, 'PYTESSERACT_AVAILABLE', False)
-SPACY_MODEL_LOADED = getattr(config, 'SPACY_MODEL_LOADED', False)
+OCR_AVAILABLE = getattr(config, 'OCR_AVAILABLE', False) # the configured OCR_BACKEND is importable
 PYPDF2_AVAILABLE = getattr(config, 'PYPDF2_AVAILABLE', False)
-EMBEDDING_MODEL_LOADED = getattr(config, 'EMBEDDING_MODEL_LOADED', False)
 MAX_TEXT_LENGTH_FOR_NER  = getattr(config, 'MAX_TEXT_LENGTH_FOR_NER', 500000)
-LANGCHAIN_SPLITTER_AVAILABLE = getattr(config, 'LANGCHAIN_SPLITTER_AVAILABLE', False)
+SPACY_SEGMENT_CHARS = getattr(config, 'SPACY_SEGMENT_CHARS', 20000)
+SPACY_BATCH_SIZE = getattr(config, 'SPACY_BATCH_SIZE', 16)
+SPACY_N_PROCESS = getattr(config, 'SPACY_N_PROCESS', 1)
+SPACY_PARALLEL_MIN_CHARS = getattr(config, 'SPACY_PARALLEL_MIN_CHARS', 200000)
 
 PYPDF_PDFREADERROR = getattr(config, 'PYPDF_PDFREADERROR', Exception)
 TESSERACT_ERROR = getattr(config, 'TESSERACT_ERROR', Exception)
@@ -51,14 +63,23 @@ Presentation = getattr(config, 'Presentation', None)
 Image = getattr(config, 'Image', None)
 fitz = getattr(config, 'fitz', None)
 pytesseract = getattr(config, 'pytesseract', None)
-nlp_spacy_core = getattr(config, 'nlp_spacy_core', None)
-document_embedding_model = getattr(config, 'document_embedding_model', None)
-RecursiveCharacterTextSplitter = getattr(config, 'RecursiveCharacterTextSplitter', None)
 
 # Constants
 AI_CORE_CHUNK_SIZE = getattr(config, 'AI_CORE_CHUNK_SIZE', 1024) # Default if not in config
 AI_CORE_CHUNK_OVERLAP = getattr(config, 'AI_CORE_CHUNK_OVERLAP', 200) # Default if not in config
+AI_CORE_CHUNK_UNIT = getattr(config, 'AI_CORE_CHUNK_UNIT', 'chars') # 'chars' or 'tokens'
+AI_CORE_CHUNK_TOKENS = getattr(config, 'AI_CORE_CHUNK_TOKENS', 500)
+AI_CORE_CHUNK_OVERLAP_TOKENS = getattr(config, 'AI_CORE_CHUNK_OVERLAP_TOKENS', 64)
+STREAMING_PAGE_WINDOW = getattr(config, 'STREAMING_PAGE_WINDOW', 8) # Pages held in memory at once in streaming mode
 DOCUMENT_EMBEDDING_MODEL_NAME = getattr(config, 'DOCUMENT_EMBEDDING_MODEL_NAME', "unknown_model")
+EMBEDDING_TOKEN_BATCHING = getattr(config, 'EMBEDDING_TOKEN_BATCHING', True)
+EMBEDDING_BATCH_TOKEN_BUDGET = getattr(config, 'EMBEDDING_BATCH_TOKEN_BUDGET', 8192)
+EMBEDDING_MAX_BATCH_SIZE = getattr(config, 'EMBEDDING_MAX_BATCH_SIZE', 128)
+EMBEDDING_POOL_MIN_CHUNKS = getattr(config, 'EMBEDDING_POOL_MIN_CHUNKS', 256)
+
+
+class ProcessingCancelled(Exception):
+    """Raised by a progress_callback to stop processing a document (e.g. its ingestion job was taken over)."""
 
 
 # ==============================================================================
@@ -84,6 +105,38 @@ def _make_empty_extraction_result() -> Dict[str, Any]:
         'is_scanned_heuristic': False
     }
 
+def _convert_pdf_page_tables(page_tables_data: List[Any], page_idx: int, file_base_name: str) -> List[Any]:
+    """Turns pdfplumber extract_tables() rows into DataFrames (or keeps the rows if pandas can't)."""
+    tables = []
+    for table_data_list in page_tables_data or []:
+        if not table_data_list: continue
+        if PANDAS_AVAILABLE and pd:
+            try:
+                # Attempt to use first row as header if meaningful
+                if len(table_data_list) > 1 and all(c is not None and isinstance(c, str) for c in table_data_list[0]):
+                    df = pd.DataFrame(table_data_list[1:], columns=table_data_list[0])
+                else:
+                    df = pd.DataFrame(table_data_list)
+                tables.append(df)
+            except Exception as df_err:
+                logger.warning(f"pdfplumber: DataFrame conversion error for table on page {page_idx+1} of {file_base_name}: {df_err}. Storing as list.")
+                tables.append(table_data_list)
+        else:
+            tables.append(table_data_list)
+    return tables
+
+def _extract_fitz_page_images(doc_fitz: Any, page_idx: int, file_base_name: str) -> List[Any]:
+    images = []
+    for img_info_tuple in doc_fitz.get_page_images(page_idx):
+        xref = img_info_tuple[0]
+        try:
+            img_bytes_dict = doc_fitz.extract_image(xref)
+            if img_bytes_dict and "image" in img_bytes_dict:
+                 images.append(Image.open(io.BytesIO(img_bytes_dict["image"])))
+        except Exception as img_err:
+            logger.warning(f"fitz: Could not extract/open image xref {xref} from page {page_idx} of {file_base_name}: {img_err}")
+    return images
+
 def _extract_pdf_elements(file_path: str) -> Dict[str, Any]:
     if not os.path.exists(file_path):
         logger.error(f"PDF file not found: {file_path}")
@@ -96,43 +149,27 @@ def _extract_pdf_elements(file_path: str) -> Dict[str, Any]:
     # 1. Text and Table Extraction with pdfplumber (if available)
     if PDFPLUMBER_AVAILABLE and pdfplumber:
         try:
-            with pdfplumber.open(file_path) as pdf:
-                num_pages_plumber = len(pdf.pages)
-                for i, page in enumerate(pdf.pages):
-                    page_text = page.extract_text(x_tolerance=1, y_tolerance=1.5, layout=False) # layout=False for more raw text
-                    if page_text and page_text.strip():
-                        extracted_text_parts.append(page_text.strip())
-
-                    # Extract tables
-                    page_tables_data = page.extract_tables()
-                    if page_tables_data:
-                        for table_data_list in page_tables_data:
-                            if not table_data_list: continue
-                            if PANDAS_AVAILABLE and pd:
-                                try:
-                                    # Attempt to use first row as header if meaningful
-                                    if len(table_data_list) > 1 and all(c is not None and isinstance(c, str) for c in table_data_list[0]):
-                                        df = pd.DataFrame(table_data_list[1:], columns=table_data_list[0])
-                                    else:
-                                        df = pd.DataFrame(table_data_list)
-                                    result['tables'].append(df)
-                                except Exception as df_err:
-                                    logger.warning(f"pdfplumber: DataFrame conversion error for table on page {i+1} of {file_base_name}: {df_err}. Storing as list.")
-                                    result['tables'].append(table_data_list)
-                            else:
-                                result['tables'].append(table_data_list)
-                
-                result['text_content'] = "\n\n".join(extracted_text_parts).strip() or None
-                if result['tables']: logger.info(f"pdfplumber: Extracted {len(result['tables'])} tables from {file_base_name}.")
-
-                # Scanned PDF Heuristic (based on pdfplumber text)
-                if num_pages_plumber > 0:
-                    total_chars = sum(len(pt.replace(" ", "")) for pt in extracted_text_parts)
-                    avg_chars_per_page = total_chars / num_pages_plumber
-                    # Heuristic: low average characters per page suggests scanned
-                    if avg_chars_per_page < 20 and total_chars < (num_pages_plumber * 50): # Tunable thresholds
-                        result['is_scanned_heuristic'] = True
-                        logger.info(f"PDF {file_base_name} potentially scanned (low avg text [{avg_chars_per_page:.1f} chars/page] from pdfplumber).")
+            # Pages come back in order whether extracted serially or by a page-range process pool.
+            num_pages_plumber = 0
+            for i, page_text, page_tables_data in pdf_extraction.iter_pdf_pages(file_path):
+                num_pages_plumber += 1
+                if page_text and page_text.strip():
+                    extracted_text_parts.append(page_text.strip())
+
+                # Extract tables
+                result['tables'].extend(_convert_pdf_page_tables(page_tables_data, i, file_base_name))
+            
+            result['text_content'] = "\n\n".join(extracted_text_parts).strip() or None
+            if result['tables']: logger.info(f"pdfplumber: Extracted {len(result['tables'])} tables from {file_base_name}.")
+
+            # Scanned PDF Heuristic (based on pdfplumber text)
+            if num_pages_plumber > 0:
+                total_chars = sum(len(pt.replace(" ", "")) for pt in extracted_text_parts)
+                avg_chars_per_page = total_chars / num_pages_plumber
+                # Heuristic: low average characters per page suggests scanned
+                if avg_chars_per_page < 20 and total_chars < (num_pages_plumber * 50): # Tunable thresholds
+                    result['is_scanned_heuristic'] = True
+                    logger.info(f"PDF {file_base_name} potentially scanned (low avg text [{avg_chars_per_page:.1f} chars/page] from pdfplumber).")
 
         except Exception as e_plumber:
             logger.warning(f"pdfplumber: Error processing PDF {file_base_name}: {e_plumber}", exc_info=True)
@@ -161,20 +198,20 @@ def _extract_pdf_elements(file_path: str) -> Dict[str, Any]:
                 logger.info(f"PDF {file_base_name} likely scanned (no text extracted, but pages found by fitz).")
 
             for page_idx in range(len(doc_fitz)):
-                for img_info_tuple in doc_fitz.get_page_images(page_idx):
-                    xref = img_info_tuple[0]
-                    try:
-                        img_bytes_dict = doc_fitz.extract_image(xref)
-                        if img_bytes_dict and "image" in img_bytes_dict:
-                             result['images'].append(Image.open(io.BytesIO(img_bytes_dict["image"])))
-                    except Exception as img_err:
-                        logger.warning(f"fitz: Could not extract/open image xref {xref} from page {page_idx} of {file_base_name}: {img_err}")
+                result['images'].extend(_extract_fitz_page_images(doc_fitz, page_idx, file_base_name))
             if result['images']: logger.info(f"fitz: Extracted {len(result['images'])} images from {file_base_name}.")
             doc_fitz.close()
         except Exception as e_fitz:
             logger.warning(f"fitz: Error processing PDF {file_base_name} for images: {e_fitz}", exc_info=True)
 
     # 3. Metadata with PyPDF2 (or pypdf if PyPDF2 not available/fails)
+    result['parser_metadata'] = _extract_pdf_parser_metadata(file_path, file_base_name)
+
+    return result
+
+def _extract_pdf_parser_metadata(file_path: str, file_base_name: str) -> Dict[str, Any]:
+    """Title, author, dates and page count with PyPDF2 (or pypdf if PyPDF2 not available/fails)."""
+    parser_metadata: Dict[str, Any] = {}
     metadata_extractor = None
     if PYPDF2_AVAILABLE and PyPDF2:
         metadata_extractor = PyPDF2.PdfReader
@@ -189,8 +226,8 @@ def _extract_pdf_elements(file_path: str) -> Dict[str, Any]:
                 reader = metadata_extractor(f)
                 info = reader.metadata
                 if info:
-                    if hasattr(info, 'title') and info.title: result['parser_metadata']['title'] = str(info.title).strip()
-                    if hasattr(info, 'author') and info.author: result['parser_metadata']['author'] = str(info.author).strip()
+                    if hasattr(info, 'title') and info.title: parser_metadata['title'] = str(info.title).strip()
+                    if hasattr(info, 'author') and info.author: parser_metadata['author'] = str(info.author).strip()
                     
                     pdf_date_formats = [
                         "D:%Y%m%d%H%M%S%z",    
@@ -213,25 +250,23 @@ def _extract_pdf_elements(file_path: str) -> Dict[str, Any]:
                     raw_creation_date = info.get("/CreationDate") if isinstance(info, dict) else getattr(info, 'creation_date', None)
                     creation_date_obj = parse_pdf_date(raw_creation_date)
 
-                    if creation_date_obj: result['parser_metadata']['creation_date'] = creation_date_obj.isoformat()
+                    if creation_date_obj: parser_metadata['creation_date'] = creation_date_obj.isoformat()
                     
                     raw_mod_date = info.get("/ModDate") if isinstance(info, dict) else getattr(info, 'modification_date', None)
                     modification_date_obj = parse_pdf_date(raw_mod_date)
                     
-                    if modification_date_obj: result['parser_metadata']['modification_date'] = modification_date_obj.isoformat()
+                    if modification_date_obj: parser_metadata['modification_date'] = modification_date_obj.isoformat()
 
-                result['parser_metadata']['page_count'] = len(reader.pages)
+                parser_metadata['page_count'] = len(reader.pages)
         except Exception as e_meta:
             logger.warning(f"Metadata: Error using {extractor_name} for {file_base_name}: {e_meta}", exc_info=True)
-            if 'page_count' not in result['parser_metadata'] and FITZ_AVAILABLE and fitz: # Fallback page count
+            if 'page_count' not in parser_metadata and FITZ_AVAILABLE and fitz: # Fallback page count
                 try:
                     doc_fitz_pc = fitz.open(file_path)
-                    result['parser_metadata']['page_count'] = len(doc_fitz_pc)
+                    parser_metadata['page_count'] = len(doc_fitz_pc)
                     doc_fitz_pc.close()
                 except: pass
-
-
-    return result
+    return parser_metadata
 
 def _extract_docx_elements(file_path: str) -> Dict[str, Any]:
     if not (DOCX_AVAILABLE and DocxDocument and PIL_AVAILABLE and Image):
@@ -305,6 +340,37 @@ def _extract_docx_elements(file_path: str) -> Dict[str, Any]:
     
     return result
 
+def _extract_pptx_slide_elements(slide: Any, slide_idx: int, file_base_name: str) -> tuple[Optional[str], List[Any]]:
+    """Text (shape texts joined by newlines, or None) and images of one slide."""
+    slide_texts = []
+    slide_images = []
+    for shape in slide.shapes:
+        if hasattr(shape, "text_frame") and shape.text_frame and shape.text_frame.text.strip():
+            slide_texts.append(shape.text_frame.text.strip())
+        elif hasattr(shape, "text") and shape.text.strip(): # For shapes with direct text
+            slide_texts.append(shape.text.strip())
+        
+        # Image extraction
+        if hasattr(shape, "image"): # If shape is an image
+            try:
+                image_bytes = shape.image.blob
+                img = Image.open(io.BytesIO(image_bytes))
+                slide_images.append(img)
+            except Exception as e_img_shape:
+                logger.warning(f"pptx: Error extracting image from shape on slide {slide_idx} of {file_base_name}: {e_img_shape}")
+    return ("\n".join(slide_texts) if slide_texts else None), slide_images
+
+def _extract_pptx_parser_metadata(prs: Any) -> Dict[str, Any]:
+    parser_metadata: Dict[str, Any] = {}
+    props = prs.core_properties
+    if props.title: parser_metadata['title'] = props.title
+    if props.author: parser_metadata['author'] = props.author
+    if props.created: parser_metadata['creation_date'] = props.created.isoformat()
+    if props.last_modified_by : parser_metadata['last_modified_by'] = props.last_modified_by
+    if props.modified : parser_metadata['modification_date'] = props.modified.isoformat()
+    parser_metadata['page_count'] = len(prs.slides)
+    return parser_metadata
+
 def _extract_pptx_elements(file_path: str) -> Dict[str, Any]:
     if not (PPTX_AVAILABLE and Presentation and PIL_AVAILABLE and Image):
         logger.error("python-pptx or Pillow not available. PPTX parsing will be limited.")
@@ -317,37 +383,16 @@ def _extract_pptx_elements(file_path: str) -> Dict[str, Any]:
     try:
         prs = Presentation(file_path)
         for slide_idx, slide in enumerate(prs.slides):
-            slide_texts = []
-            for shape in slide.shapes:
-                if hasattr(shape, "text_frame") and shape.text_frame and shape.text_frame.text.strip():
-                    slide_texts.append(shape.text_frame.text.strip())
-                elif hasattr(shape, "text") and shape.text.strip(): # For shapes with direct text
-                    slide_texts.append(shape.text.strip())
-                
-                # Image extraction
-                if hasattr(shape, "image"): # If shape is an image
-                    try:
-                        image_bytes = shape.image.blob
-                        img = Image.open(io.BytesIO(image_bytes))
-                        result['images'].append(img)
-                    except Exception as e_img_shape:
-                        logger.warning(f"pptx: Error extracting image from shape on slide {slide_idx} of {file_base_name}: {e_img_shape}")
-            
-            if slide_texts:
-                text_content_parts.append("\n".join(slide_texts))
+            slide_text, slide_images = _extract_pptx_slide_elements(slide, slide_idx, file_base_name)
+            result['images'].extend(slide_images)
+            if slide_text:
+                text_content_parts.append(slide_text)
         
         result['text_content'] = "\n\n".join(text_content_parts).strip() or None
         if result['images']: logger.info(f"pptx: Extracted {len(result['images'])} images from {file_base_name}.")
 
         # Metadata
-        props = prs.core_properties
-        if props.title: result['parser_metadata']['title'] = props.title
-        if props.author: result['parser_metadata']['author'] = props.author
-        if props.created: result['parser_metadata']['creation_date'] = props.created.isoformat()
-        if props.last_modified_by : result['parser_metadata']['last_modified_by'] = props.last_modified_by
-        if props.modified : result['parser_metadata']['modification_date'] = props.modified.isoformat()
-
-        result['parser_metadata']['page_count'] = len(prs.slides)
+        result['parser_metadata'] = _extract_pptx_parser_metadata(prs)
 
         # Scanned Heuristic
         if not result['text_content'] and result['images']:
@@ -460,99 +505,144 @@ def _get_initial_parsed_document(file_path: str) -> Dict[str, Any]:
 
 def perform_ocr_on_images(image_objects: List[Any], file_base_name_for_log: str ="") -> str: # Added filename for logging
     if not image_objects: return ""
-    if not (PYTESSERACT_AVAILABLE and pytesseract):
-        logger.error(f"Pytesseract not available. OCR for {file_base_name_for_log} cannot be performed.")
+    if not OCR_AVAILABLE:
+        logger.error(f"OCR backend '{config.OCR_BACKEND}' not available. OCR for {file_base_name_for_log} cannot be performed.")
         return ""
 
     logger.info(f"Performing OCR on {len(image_objects)} image(s) for {file_base_name_for_log}.")
     ocr_text_parts = []
     images_ocrd = 0
+    images_for_ocr = []
+    image_positions = []
     for i, img_obj in enumerate(image_objects):
         try:
             if not (PIL_AVAILABLE and Image and isinstance(img_obj, Image.Image)):
                 logger.warning(f"Skipping non-PIL Image object at index {i} for OCR of {file_base_name_for_log}.")
                 continue
             # Improve image for OCR: convert to grayscale, potentially apply thresholding if needed
-            processed_img_for_ocr = img_obj.convert('L') # Grayscale
-            text = pytesseract.image_to_string(processed_img_for_ocr)
-            if text and text.strip():
-                ocr_text_parts.append(text.strip())
-                images_ocrd += 1
+            images_for_ocr.append(img_obj.convert('L')) # Grayscale
+            image_positions.append(i)
         except Exception as e:
-            if TESSERACT_ERROR and isinstance(e, TESSERACT_ERROR): # Check specific Tesseract error
-                logger.critical(f"Tesseract executable not found or error for {file_base_name_for_log}. OCR will fail. Error: {e}")
-                # Re-raise if it's a critical setup issue that will affect all subsequent OCR
-                # For now, we'll let it try other images, but this indicates a setup problem.
-            logger.error(f"Error during OCR for image {i+1}/{len(image_objects)} of {file_base_name_for_log}: {e}", exc_info=True)
+            logger.error(f"Error preparing image {i+1}/{len(image_objects)} of {file_base_name_for_log} for OCR: {e}", exc_info=True)
+
+    # OCR runs in a bounded process pool with a per-image timeout; results keep the page order.
+    for i, (text, error, _) in zip(image_positions, ocr_engine.get_ocr_engine().ocr_images(images_for_ocr)):
+        if error:
+            if 'TesseractNotFound' in error:
+                logger.critical(f"Tesseract executable not found or error for {file_base_name_for_log}. OCR will fail. Error: {error}")
+            logger.error(f"Error during OCR for image {i+1}/{len(image_objects)} of {file_base_name_for_log}: {error}")
+        elif text and text.strip():
+            ocr_text_parts.append(text.strip())
+            images_ocrd += 1
     
     full_ocr_text = "\n\n--- OCR Text from Image ---\n\n".join(ocr_text_parts).strip()
     logger.info(f"OCR for {file_base_name_for_log}: Extracted {len(full_ocr_text)} chars from {images_ocrd} image(s).")
     return full_ocr_text
 
 
-def clean_and_normalize_text_content(text: str, file_base_name_for_log: str ="") -> str:
-    if not text or not text.strip(): return ""
+def _split_for_spacy(paragraphs: List[str], max_chars: int) -> List[str]:
+    """Packs paragraphs into segments of at most max_chars (long paragraphs are cut at whitespace)."""
+    segments: List[str] = []
+    current: List[str] = []
+    current_len = 0
+    for paragraph in paragraphs:
+        if current and current_len + 1 + len(paragraph) > max_chars:
+            segments.append(" ".join(current))
+            current, current_len = [], 0
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(' ', 0, max_chars + 1)
+            cut = cut if cut > 0 else max_chars
+            segments.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        if paragraph:
+            current.append(paragraph)
+            current_len += len(paragraph) + (1 if len(current) > 1 else 0)
+    if current:
+        segments.append(" ".join(current))
+    return segments
+
+
+def _is_lemma_token(token: Any) -> bool:
+    return not token.is_stop and \
+           not token.is_punct and \
+           not token.is_space and \
+           len(token.lemma_) > 1 and \
+           token.lemma_ != '-PRON-' # Exclude pronouns after lemmatization
+
+
+def clean_and_analyze_text_content(text: str, file_base_name_for_log: str ="",
+                                   ner_char_budget: int = MAX_TEXT_LENGTH_FOR_NER) -> tuple[str, Dict[str, set]]:
+    """
+    Cleaning and NER in one spaCy pass: the regex-cleaned text keeps its case, is tokenized once,
+    and yields both the lowercased lemma stream and the unique entity texts per label. NER runs on
+    roughly the first ner_char_budget characters (0 = lemmas only, the NER pipe stays disabled).
+    """
+    if not text or not text.strip(): return "", {}
     logger.info(f"Text cleaning for {file_base_name_for_log}: Initial length {len(text)}")
     
-    # Basic regex cleaning (order matters)
-    text = re.sub(r'<script[^>]*>.*?</script>|<style[^>]*>.*?</style>', ' ', text, flags=re.I | re.S) # Remove script/style
-    text = re.sub(r'<[^>]+>', ' ', text) # Remove all other HTML tags
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE) # Remove URLs
-    text = re.sub(r'\S*@\S*\s?', '', text, flags=re.MULTILINE) # Remove emails
-    text = re.sub(r'\s*&\w+;\s*', ' ', text) # Remove HTML entities like  
-    text = re.sub(r'[\n\r\t]+', ' ', text) # Normalize whitespace (newlines, tabs to single space)
-    text = re.sub(r'\s+', ' ', text).strip() # Consolidate multiple spaces to one and strip ends
-    
-    # Character filtering (allow more common punctuation useful for context)
-    # text = re.sub(r'[^\w\s.,!?"\'():;-]', '', text) # Keeps more standard punctuation
-    # For more aggressive cleaning for embedding, you might use:
-    text = re.sub(r'[^a-zA-Z0-9\s.,!?-]', '', text) # More restrictive, closer to your original
-
-    text_lower = text.lower() # Convert to lowercase AFTER regex to preserve case for URLs/emails if needed
-
-    if not (SPACY_MODEL_LOADED and nlp_spacy_core):
-        logger.warning(f"SpaCy model not loaded for {file_base_name_for_log}. Skipping lemmatization. Returning regex-cleaned text.")
-        return text_lower
+    # Regex cleaning (markup, URLs, e-mails; then per-paragraph whitespace and character filtering).
+    # Paragraphs are normalized (and later lemmatized) independently; joined with a space they give
+    # the same tokens as normalizing the whole document at once, but keep the boundaries for nlp.pipe.
+    # Case is kept for tagging and NER; lemmas are lowercased below.
+    paragraphs = text_normalizer.clean_paragraphs(text)
+    text_lower = " ".join(paragraphs).lower()
+
+    nlp_spacy_core = model_registry.get_model('spacy')
+    if nlp_spacy_core is None:
+        logger.warning(f"SpaCy model not loaded for {file_base_name_for_log}. Skipping lemmatization and NER. Returning regex-cleaned text.")
+        return text_lower, {}
     
+    entities_by_type: Dict[str, set] = {}
     try:
-        # Process in chunks if text is very long to avoid SpaCy memory issues, though less likely after cleaning
-        max_spacy_len = 1000000 # SpaCy's default internal limit for nlp()
-        if len(text_lower) > max_spacy_len:
-            logger.warning(f"Text for SpaCy in {file_base_name_for_log} exceeds {max_spacy_len} chars. Processing in parts or truncating.")
-            # Simple truncation for now, chunking for spacy is more complex
-            text_lower = text_lower[:max_spacy_len]
-
-        doc = nlp_spacy_core(text_lower, disable=['parser', 'ner']) # Disable unused pipes
-        lemmatized_tokens = [
-            token.lemma_ for token in doc 
-            if not token.is_stop and \
-               not token.is_punct and \
-               not token.is_space and \
-               len(token.lemma_) > 1 and \
-               token.lemma_ != '-PRON-' # Exclude pronouns after lemmatization
-        ]
+        # Bounded segments through nlp.pipe: the whole document is lemmatized (no 1M-char nlp.max_length
+        # truncation) and large documents can be spread over SPACY_N_PROCESS processes.
+        segments = _split_for_spacy(paragraphs, min(SPACY_SEGMENT_CHARS, nlp_spacy_core.max_length))
+        n_process = SPACY_N_PROCESS if len(text_lower) >= SPACY_PARALLEL_MIN_CHARS else 1
+        # Segments within the NER budget go through tagger+lemmatizer+NER, the rest skip NER.
+        num_ner_segments, ner_chars = 0, 0
+        while num_ner_segments < len(segments) and ner_chars < ner_char_budget:
+            ner_chars += len(segments[num_ner_segments])
+            num_ner_segments += 1
+        lemmatized_tokens = []
+        for segment_group, disabled_pipes in ((segments[:num_ner_segments], ['parser']),
+                                              (segments[num_ner_segments:], ['parser', 'ner'])):
+            if not segment_group:
+                continue
+            for doc in nlp_spacy_core.pipe(segment_group, batch_size=SPACY_BATCH_SIZE, n_process=n_process,
+                                           disable=disabled_pipes): # Disable unused pipes
+                lemmatized_tokens.extend(token.lemma_.lower() for token in doc if _is_lemma_token(token))
+                for ent in doc.ents:
+                    entities_by_type.setdefault(ent.label_, set()).add(ent.text)
         final_cleaned_text = " ".join(lemmatized_tokens)
-        logger.info(f"SpaCy cleaning for {file_base_name_for_log}: Final length {len(final_cleaned_text)}")
-        return final_cleaned_text
+        logger.info(f"SpaCy cleaning for {file_base_name_for_log}: {len(segments)} segment(s) ({num_ner_segments} with NER), "
+                    f"{n_process} process(es), final length {len(final_cleaned_text)}, "
+                    f"{sum(len(v) for v in entities_by_type.values())} unique named entities")
+        return final_cleaned_text, entities_by_type
     except Exception as e:
         logger.error(f"SpaCy processing failed for {file_base_name_for_log}: {e}. Returning pre-SpaCy cleaned text.", exc_info=True)
-        return text_lower
+        return text_lower, entities_by_type
+
+
+def clean_and_normalize_text_content(text: str, file_base_name_for_log: str ="") -> str:
+    """Lemma stream only (see clean_and_analyze_text_content)."""
+    return clean_and_analyze_text_content(text, file_base_name_for_log, ner_char_budget=0)[0]
 
 
-def reconstruct_document_layout(text_content: str, tables_data: List[Any], file_type: str, file_base_name_for_log: str ="") -> str:
+def reconstruct_document_layout(text_content: str, tables_data: List[Any], file_type: str, file_base_name_for_log: str ="", table_number_offset: int = 0) -> str:
     if not text_content and not tables_data: return ""
     logger.info(f"Layout reconstruction for {file_base_name_for_log} ({file_type}): Text len {len(text_content)}, Tables {len(tables_data)}")
     
     # Hyphenated word de-joining (if text_content is not None)
     processed_text = text_content if text_content else ""
-    processed_text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', processed_text) # Across newlines
+    processed_text = text_normalizer.join_hyphenated_line_breaks(processed_text) # Across newlines
     # processed_text = re.sub(r'(\w+)-(\w+)', r'\1\2', processed_text) # Within same line (less common needed after initial parse)
 
     if tables_data:
         table_md_parts = []
         for i, table_obj in enumerate(tables_data):
-            table_header = f"\n\n[START OF TABLE {i+1} extracted from {file_base_name_for_log}]\n"
-            table_footer = f"\n[END OF TABLE {i+1}]\n"
+            table_number = table_number_offset + i + 1
+            table_header = f"\n\n[START OF TABLE {table_number} extracted from {file_base_name_for_log}]\n"
+            table_footer = f"\n[END OF TABLE {table_number}]\n"
             md_table_content = ""
             try:
                 if PANDAS_AVAILABLE and pd and isinstance(table_obj, pd.DataFrame):
@@ -579,17 +669,35 @@ def reconstruct_document_layout(text_content: str, tables_data: List[Any], file_
             processed_text += "\n\n" + "\n\n".join(table_md_parts)
     
     # Final whitespace cleanup
-    final_layout_text = re.sub(r'\s{2,}', ' ', processed_text).strip() # Consolidate multiple spaces
+    final_layout_text = text_normalizer.collapse_whitespace(processed_text) # Consolidate multiple spaces
     logger.info(f"Layout reconstruction for {file_base_name_for_log}: Final length {len(final_layout_text)}")
     return final_layout_text
 
 
+def _extract_named_entities(text_for_ner: str, original_file_name: str) -> Dict[str, set]:
+    """Unique entity texts per spaCy label ({} if there is no text or no spaCy model)."""
+    nlp_spacy_core = model_registry.get_model('spacy') if text_for_ner else None
+    if not (text_for_ner and nlp_spacy_core):
+        logger.info(f"Skipping NER for {original_file_name} (no text or SpaCy model not loaded/configured for NER).")
+        return {}
+    logger.info(f"Extracting named entities for {original_file_name}...")
+    entities_by_type: Dict[str, set] = {}
+    try:
+        spacy_doc = nlp_spacy_core(text_for_ner) # NER pipe should be enabled by default
+        for ent in spacy_doc.ents:
+            entities_by_type.setdefault(ent.label_, set()).add(ent.text)
+        logger.info(f"Extracted {sum(len(v) for v in entities_by_type.values())} unique named entities for {original_file_name}.")
+    except Exception as e_ner:
+        logger.error(f"Metadata: NER error for {original_file_name}: {e_ner}", exc_info=True)
+    return entities_by_type
+
 def extract_document_metadata_info(
     file_path: str, 
     processed_text: str, 
     parsed_doc_elements: Dict[str, Any], # Output from _get_initial_parsed_document
     original_file_name: str, 
-    user_id: str
+    user_id: str,
+    named_entities: Optional[Dict[str, set]] = None # From clean_and_analyze_text_content; None = run NER here
 ) -> Dict[str, Any]:
     logger.info(f"Metadata extraction for: {original_file_name} (User: {user_id})")
     
@@ -597,6 +705,7 @@ def extract_document_metadata_info(
     file_type_from_parser = os.path.splitext(original_file_name)[1].lower() # Fallback if not in parser_meta
 
     doc_meta = {
+        'doc_id': document_id(user_id, original_file_name),
         'user_id': user_id,
         'original_name': original_file_name,
         'file_name': original_file_name,
@@ -630,83 +739,127 @@ def extract_document_metadata_info(
     if doc_meta['page_count'] == 0 and processed_text:
         doc_meta['page_count'] = max(1, processed_text.count('\n\n') + 1) # Rough estimate
 
-    # NER (Named Entity Recognition) - using SpaCy
-    if processed_text and SPACY_MODEL_LOADED and nlp_spacy_core:
-        logger.info(f"Extracting named entities for {original_file_name}...")
-        try:
-            text_for_ner = processed_text[:MAX_TEXT_LENGTH_FOR_NER] # Use config alias
-            spacy_doc = nlp_spacy_core(text_for_ner) # NER pipe should be enabled by default
-            
-            entities_by_type = {}
-            for ent in spacy_doc.ents:
-                entities_by_type.setdefault(ent.label_, set()).add(ent.text)
-            
-            doc_meta['named_entities'] = {label: sorted(list(texts)) for label, texts in entities_by_type.items()}
-            num_entities_found = sum(len(v) for v in doc_meta['named_entities'].values())
-            logger.info(f"Extracted {num_entities_found} unique named entities for {original_file_name}.")
-        except Exception as e_ner:
-            logger.error(f"Metadata: NER error for {original_file_name}: {e_ner}", exc_info=True)
-    else:
-        logger.info(f"Skipping NER for {original_file_name} (no text or SpaCy model not loaded/configured for NER).")
+    # NER (Named Entity Recognition) - using SpaCy, unless the cleaning pass already found the entities
+    entities_by_type = named_entities if named_entities is not None else \
+        _extract_named_entities(processed_text[:MAX_TEXT_LENGTH_FOR_NER] if processed_text else "", original_file_name)
+    doc_meta['named_entities'] = {label: sorted(list(texts)) for label, texts in entities_by_type.items()}
     
     logger.info(f"Metadata extraction complete for {original_file_name}.")
     return doc_meta
 
+# Document-level fields copied into every chunk payload: the ones search filters on and cites.
+# Everything else lives once in the document record (VectorDBService.upsert_document_record).
+CHUNK_DOCUMENT_FIELDS = ('doc_id', 'user_id', 'original_name', 'file_name', 'title')
+
+def document_id(user_id: str, file_name: str) -> str:
+    """Stable id of a user's document; chunks reference their document record by it."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"rag-document:{user_id}/{file_name}"))
+
+def chunk_fingerprint(text_content: str) -> str:
+    """Identifies a chunk's embedding input: same fingerprint, same vector (used to skip unchanged chunks on update)."""
+    material = f"{DOCUMENT_EMBEDDING_MODEL_NAME}|{config.EMBEDDING_VARIANT}|{text_content}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+def chunk_point_id(doc_id: str, fingerprint: str, occurrence: int) -> str:
+    """
+    Qdrant point id of the occurrence-th chunk (0-based, in document order) with this fingerprint.
+    Deterministic, so re-running a failed or interrupted ingestion overwrites the points it already
+    wrote instead of adding duplicates.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"rag-chunk:{doc_id}:{fingerprint}:{occurrence}"))
+
+CHUNK_SEPARATORS = ["\n\n", "\n", ". ", " ", ""] # each separator stays at the start of the following chunk
+
+def _make_chunk_splitter() -> text_splitter.RecursiveTextSplitter:
+    """Splitter for AI_CORE_CHUNK_UNIT: characters, or tokens of the document embedding model's tokenizer."""
+    if AI_CORE_CHUNK_UNIT == 'tokens':
+        tokenizer = embedding_service.get_document_encoder().get_tokenizer()
+        if getattr(tokenizer, 'is_fast', False):
+            return text_splitter.TokenTextSplitter(tokenizer, AI_CORE_CHUNK_TOKENS, AI_CORE_CHUNK_OVERLAP_TOKENS,
+                                                   separators=CHUNK_SEPARATORS)
+        logger.error(f"No fast tokenizer for {DOCUMENT_EMBEDDING_MODEL_NAME}; chunking by characters instead.")
+    return text_splitter.RecursiveTextSplitter(AI_CORE_CHUNK_SIZE, AI_CORE_CHUNK_OVERLAP, separators=CHUNK_SEPARATORS)
+
+def _window_overlap_tail(text: str) -> str:
+    """
+    End of a streamed page window that is carried into the next one, so chunks overlap across windows
+    as they do within one: AI_CORE_CHUNK_OVERLAP characters, or AI_CORE_CHUNK_OVERLAP_TOKENS tokens
+    when chunking by tokens.
+    """
+    splitter = _make_chunk_splitter()
+    if not isinstance(splitter, text_splitter.TokenTextSplitter):
+        return text[-AI_CORE_CHUNK_OVERLAP:] if AI_CORE_CHUNK_OVERLAP > 0 else ""
+    if AI_CORE_CHUNK_OVERLAP_TOKENS <= 0:
+        return ""
+    # Only the end of the window is tokenized; 16 characters per token is well above what real text averages.
+    region_start = max(0, len(text) - 16 * AI_CORE_CHUNK_OVERLAP_TOKENS)
+    try:
+        token_starts = splitter.token_start_offsets(text[region_start:])
+    except Exception as e_tok:
+        logger.warning(f"Chunking: Could not tokenize the end of a page window, carrying {AI_CORE_CHUNK_OVERLAP} characters over: {e_tok}")
+        return text[-AI_CORE_CHUNK_OVERLAP:] if AI_CORE_CHUNK_OVERLAP > 0 else ""
+    if not token_starts:
+        return ""
+    tail_start = token_starts[-min(AI_CORE_CHUNK_OVERLAP_TOKENS, len(token_starts))]
+    return text[region_start + tail_start:]
+
 # Chunking and Embedding functions remain largely the same as your corrected versions,
 # just ensure they consume the correct data.
 def chunk_document_into_segments(
     text_to_chunk: str,
-    document_level_metadata: Dict[str, Any] # This is the output from extract_document_metadata_info
+    document_level_metadata: Dict[str, Any], # This is the output from extract_document_metadata_info (only CHUNK_DOCUMENT_FIELDS are copied)
+    chunk_index_offset: int = 0, # First chunk_index to use (streaming mode chunks a document in windows)
+    char_offset: int = 0, # Position of text_to_chunk in the document's processed text (for chunk_start_char/chunk_end_char)
+    fingerprint_counts: Optional[Dict[str, int]] = None # Chunks per fingerprint so far (streaming mode shares it across windows)
 ) -> List[Dict[str, Any]]:
     if not text_to_chunk or not text_to_chunk.strip():
         logger.warning(f"Chunking: No text for {document_level_metadata.get('file_name', 'unknown')}.")
         return []
 
-    if not (LANGCHAIN_SPLITTER_AVAILABLE and RecursiveCharacterTextSplitter):
-        logger.error("RecursiveCharacterTextSplitter not available. Cannot chunk text.")
-        return []
-        
-    chunk_s = AI_CORE_CHUNK_SIZE
-    chunk_o = AI_CORE_CHUNK_OVERLAP
     original_doc_name_for_log = document_level_metadata.get('file_name', 'unknown_doc')
-    logger.info(f"Chunking {original_doc_name_for_log}: Size={chunk_s}, Overlap={chunk_o}")
-    
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_s,
-        chunk_overlap=chunk_o,
-        length_function=len,
-        separators=["\n\n", "\n", ". ", " ", ""], 
-        keep_separator=True # Consider if True or False is better for your LLM
-    )
+    fingerprint_counts = {} if fingerprint_counts is None else fingerprint_counts
+    splitter = _make_chunk_splitter()
+    unit = 'tokens' if isinstance(splitter, text_splitter.TokenTextSplitter) else 'chars'
+    logger.info(f"Chunking {original_doc_name_for_log}: Size={splitter.chunk_size}, Overlap={splitter.chunk_overlap} ({unit})")
 
     try:
-        raw_text_segments: List[str] = text_splitter.split_text(text_to_chunk)
-    except Exception as e_split: 
-        logger.error(f"Chunking: Error splitting text for {original_doc_name_for_log}: {e_split}", exc_info=True)
-        return []
+        segment_spans: List[tuple[int, int]] = splitter.split_offsets(text_to_chunk)
+    except Exception as e_split:
+        if unit != 'tokens':
+            raise
+        # Don't let a tokenizer failure turn the document into zero chunks: chunk it by characters.
+        logger.error(f"Chunking: Token splitter failed for {original_doc_name_for_log}, chunking by characters instead: {e_split}", exc_info=True)
+        segment_spans = text_splitter.RecursiveTextSplitter(AI_CORE_CHUNK_SIZE, AI_CORE_CHUNK_OVERLAP,
+                                                            separators=CHUNK_SEPARATORS).split_offsets(text_to_chunk)
         
     output_chunks: List[Dict[str, Any]] = []
     # Use a more robust base name if original name contains problematic characters for reference
     base_file_name_for_ref = re.sub(r'[^a-zA-Z0-9_-]', '_', os.path.splitext(original_doc_name_for_log)[0])
 
 
-    for i, segment_content in enumerate(raw_text_segments):
+    for i, (segment_start, segment_end) in enumerate(segment_spans, start=chunk_index_offset):
+        segment_content = text_to_chunk[segment_start:segment_end]
         if not segment_content.strip(): 
             logger.debug(f"Skipping empty chunk at index {i} for {original_doc_name_for_log}.")
             continue
 
-        # Create a deep copy of document-level metadata for each chunk
-        chunk_specific_metadata = copy.deepcopy(document_level_metadata)
+        # Compact payload: the document reference and filter fields, not the whole document record
+        chunk_specific_metadata = {field: document_level_metadata[field] for field in CHUNK_DOCUMENT_FIELDS
+                                   if field in document_level_metadata}
         
-        qdrant_point_id = str(uuid.uuid4()) # Unique ID for this chunk in Qdrant
+        fingerprint = chunk_fingerprint(segment_content)
+        occurrence = fingerprint_counts.get(fingerprint, 0)
+        fingerprint_counts[fingerprint] = occurrence + 1
+        qdrant_point_id = chunk_point_id(document_level_metadata.get('doc_id', original_doc_name_for_log), fingerprint, occurrence)
 
         # Add chunk-specific details to its metadata
         chunk_specific_metadata['chunk_id'] = qdrant_point_id 
         chunk_specific_metadata['chunk_reference_name'] = f"{base_file_name_for_ref}_chunk_{i:04d}"
         chunk_specific_metadata['chunk_index'] = i
         chunk_specific_metadata['chunk_char_count'] = len(segment_content)
-        # Remove potentially very large or redundant fields from chunk metadata if necessary
-        # e.g., chunk_specific_metadata.pop('named_entities', None) if too verbose per chunk
+        chunk_specific_metadata['chunk_start_char'] = max(0, char_offset + segment_start)
+        chunk_specific_metadata['chunk_end_char'] = char_offset + segment_end
+        chunk_specific_metadata['chunk_fingerprint'] = fingerprint
         
         output_chunks.append({
             'id': qdrant_point_id, # This ID is for Qdrant
@@ -719,7 +872,8 @@ def chunk_document_into_segments(
 
 def generate_segment_embeddings(document_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     if not document_chunks: return []
-    if not (EMBEDDING_MODEL_LOADED and document_embedding_model):
+    document_encoder = embedding_service.get_document_encoder()
+    if not document_encoder.is_available():
         logger.error("Embedding model not loaded. Cannot generate embeddings.")
         for chunk_dict in document_chunks: chunk_dict['embedding'] = None
         return document_chunks
@@ -743,11 +897,38 @@ def generate_segment_embeddings(document_chunks: List[Dict[str, Any]]) -> List[D
         logger.warning("Embedding: No text content found in chunks to generate embeddings.")
         return document_chunks
 
+    # Reuse embeddings of chunk texts we've already seen (re-uploads, shared syllabi/lecture notes).
+    cache = embedding_cache.get_embedding_cache()
+    cached_vectors: List[Optional[Any]] = [None] * len(texts_to_embed)
+    if cache is not None:
+        try:
+            cached_vectors = cache.get_many(model_name_for_logging, texts_to_embed)
+        except Exception as e_cache:
+            logger.warning(f"Embedding: Cache lookup failed, embedding all chunks: {e_cache}")
+    miss_positions = [i for i, vector in enumerate(cached_vectors) if vector is None]
+    if cache is not None:
+        logger.info(f"Embedding: {len(texts_to_embed) - len(miss_positions)} of {len(texts_to_embed)} chunks served from cache.")
+
     try:
-        embeddings_np_array = document_embedding_model.encode(texts_to_embed, show_progress_bar=True) # Set to True for long lists
+        embeddings_np_array = list(cached_vectors)
+        if miss_positions:
+            miss_texts = [texts_to_embed[i] for i in miss_positions]
+            pool = embedding_pool.get_embedding_pool() if len(miss_texts) >= EMBEDDING_POOL_MIN_CHUNKS else None
+            if EMBEDDING_TOKEN_BATCHING or pool is not None:
+                miss_vectors = document_encoder.encode_in_token_batches(
+                    miss_texts, EMBEDDING_BATCH_TOKEN_BUDGET, EMBEDDING_MAX_BATCH_SIZE, pool=pool)
+            else:
+                miss_vectors = document_encoder.encode(miss_texts, show_progress_bar=True) # Set to True for long lists
+            for position, vector in zip(miss_positions, miss_vectors):
+                embeddings_np_array[position] = vector
+            if cache is not None:
+                try:
+                    cache.put_many(model_name_for_logging, miss_texts, miss_vectors)
+                except Exception as e_cache:
+                    logger.warning(f"Embedding: Could not store {len(miss_texts)} new embeddings in cache: {e_cache}")
         
         for i, original_chunk_idx in enumerate(valid_chunk_indices):
-            if i < len(embeddings_np_array):
+            if i < len(embeddings_np_array) and embeddings_np_array[i] is not None:
                 document_chunks[original_chunk_idx]['embedding'] = embeddings_np_array[i].tolist()
             else: # Should not happen if encode works correctly
                 logger.error(f"Embedding: Mismatch in embedding count for chunk at original index {original_chunk_idx}.")
@@ -767,10 +948,17 @@ def process_document_for_qdrant(
     file_path: str, # Could be empty if text_content_override is used
     original_name: str,
     user_id: str,
-    text_content_override: Optional[str] = None # NEW parameter
+    text_content_override: Optional[str] = None, # NEW parameter
+    progress_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None, # Called as each stage starts
+    embed_chunks: bool = True, # False: return chunks without embeddings (caller embeds only what changed)
+    document_record_callback: Optional[Callable[[Dict[str, Any]], None]] = None # Receives the document-level record
 ) -> tuple[List[Dict[str, Any]], Optional[str], List[Dict[str, Any]]]:
     """
     Main orchestrator for processing a document or raw text.
+    progress_callback(stage, details) is invoked when each stage begins (parse, ocr, clean, layout,
+    metadata, chunk, embed), e.g. to record per-stage status for ingestion jobs.
+    Chunk payloads only carry CHUNK_DOCUMENT_FIELDS; the full document-level metadata is handed
+    to document_record_callback once the document has been chunked, to be stored once.
     Returns:
         - final_chunks_for_qdrant: List of chunks with embeddings for Qdrant.
         - text_for_node_analysis: Consolidated text for Node.js general analysis (FAQ, Topics).
@@ -788,7 +976,14 @@ def process_document_for_qdrant(
     no_analysis_text = None
     empty_kg_chunks = []
 
+    def report_stage(stage: str, **details: Any) -> None:
+        if progress_callback:
+            try: progress_callback(stage, details)
+            except ProcessingCancelled: raise
+            except Exception as e_cb: logger.warning(f"ai_core: progress_callback failed at stage '{stage}': {e_cb}")
+
     try:
+        report_stage('parse')
         initial_text_from_parser = None
         images_from_parser = []
         tables_from_parser = []
@@ -823,12 +1018,13 @@ def process_document_for_qdrant(
                       (initial_text_from_parser and len(initial_text_from_parser) < 200 * len(images_from_parser) and images_from_parser))
 
         if should_ocr and images_from_parser:
-            if PYTESSERACT_AVAILABLE and pytesseract:
+            if OCR_AVAILABLE:
                 logger.info(f"OCR triggered for {original_name} based on heuristics/file type.")
+                report_stage('ocr', num_images=len(images_from_parser))
                 ocr_text_output = perform_ocr_on_images(images_from_parser, original_name)
                 if ocr_text_output: ocr_applied_flag = True
             else:
-                logger.warning(f"OCR needed for {original_name} but Pytesseract not available. Content may be incomplete.")
+                logger.warning(f"OCR needed for {original_name} but OCR backend {config.OCR_BACKEND} not available. Content may be incomplete.")
         
         # 3. Combine Text (Parser/Override + OCR)
         combined_raw_text_parts = []
@@ -841,12 +1037,15 @@ def process_document_for_qdrant(
             return empty_qdrant_chunks, no_analysis_text, empty_kg_chunks
 
         # 4. Clean Text
-        cleaned_text = clean_and_normalize_text_content(combined_raw_text, original_name)
+        report_stage('clean', num_chars=len(combined_raw_text))
+        # One spaCy pass: lemmas for chunking, entities (from the original-cased text) for metadata
+        cleaned_text, entities_by_type = clean_and_analyze_text_content(combined_raw_text, original_name)
         if not cleaned_text and not tables_from_parser: # If cleaning results in empty text
             logger.warning(f"No meaningful text for {original_name} after cleaning, and no tables. Processing cannot continue.")
             return empty_qdrant_chunks, no_analysis_text, empty_kg_chunks
 
         # 5. Reconstruct Layout (Integrate Tables as Markdown)
+        report_stage('layout', num_tables=len(tables_from_parser))
         text_for_further_processing = reconstruct_document_layout(
             cleaned_text, # Use the cleaned text
             tables_from_parser,
@@ -856,17 +1055,20 @@ def process_document_for_qdrant(
         raw_text_for_node_analysis = text_for_further_processing 
 
         # 6. Extract Comprehensive Metadata
+        report_stage('metadata')
         doc_metadata = extract_document_metadata_info(
             file_path if not text_content_override else f"virtual://{original_name}", # Provide a sensible path for metadata if override
             text_for_further_processing, # Pass the final text that will be chunked
             parsed_doc_elements if not text_content_override else {}, # Pass initial parse results or empty if override
             original_name,
-            user_id
+            user_id,
+            named_entities=entities_by_type
         )
         doc_metadata['ocr_applied'] = ocr_applied_flag # Update with actual OCR status
         doc_metadata['source_type_actual'] = file_type_from_parser # Capture true source type from URL processing
 
         # 7. Chunk Document
+        report_stage('chunk')
         chunks_with_metadata_for_qdrant_and_kg = chunk_document_into_segments(
             text_for_further_processing,
             doc_metadata # Pass rich metadata to chunks
@@ -875,12 +1077,19 @@ def process_document_for_qdrant(
             logger.warning(f"No chunks produced for {original_name}. Cannot proceed with Qdrant/KG.")
             return empty_qdrant_chunks, raw_text_for_node_analysis, empty_kg_chunks
 
+        doc_metadata['num_chunks'] = len(chunks_with_metadata_for_qdrant_and_kg)
+        if document_record_callback:
+            document_record_callback(doc_metadata)
+
         # Prepare chunks for KG worker (these don't need embeddings yet)
-        chunks_for_kg_worker = copy.deepcopy(chunks_with_metadata_for_qdrant_and_kg) 
-        for chunk in chunks_for_kg_worker:
-            chunk.pop('embedding', None) 
+        chunks_for_kg_worker = [{'id': chunk['id'], 'text_content': chunk['text_content'], 'metadata': dict(chunk['metadata'])}
+                                for chunk in chunks_with_metadata_for_qdrant_and_kg]
+
+        if not embed_chunks:
+            return chunks_with_metadata_for_qdrant_and_kg, raw_text_for_node_analysis, chunks_for_kg_worker
 
         # 8. Generate Embeddings for Qdrant chunks
+        report_stage('embed', num_chunks=len(chunks_with_metadata_for_qdrant_and_kg))
         final_chunks_for_qdrant = generate_segment_embeddings(chunks_with_metadata_for_qdrant_and_kg)
         
         logger.info(f"ai_core: Successfully processed '{original_name}'. Generated {len(final_chunks_for_qdrant)} chunks for Qdrant.")
@@ -892,4 +1101,255 @@ def process_document_for_qdrant(
             raise
         
         logger.error(f"ai_core: Critical error processing {original_name}: {e}", exc_info=True)
-        raise
\ No newline at end of file
+        raise
+
+# ==============================================================================
+# Streaming Pipeline (page windows, bounded memory)
+# ==============================================================================
+
+IMAGE_FILE_TYPES = ['.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif']
+
+def _iter_document_pages(file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields one element dict per page/slide: {'page_index', 'text_content', 'tables', 'images'}.
+    PDF and PPTX are read one page at a time; every other type comes through as a single page.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    file_base_name = os.path.basename(file_path)
+
+    if ext == '.pdf' and PDFPLUMBER_AVAILABLE and pdfplumber:
+        doc_fitz = fitz.open(file_path) if (FITZ_AVAILABLE and fitz and PIL_AVAILABLE and Image) else None
+        next_page_idx = 0
+        try:
+            try:
+                for page_idx, page_text, page_tables_data in pdf_extraction.iter_pdf_pages(file_path):
+                    yield {
+                        'page_index': page_idx,
+                        'text_content': page_text.strip() if page_text and page_text.strip() else None,
+                        'tables': _convert_pdf_page_tables(page_tables_data, page_idx, file_base_name),
+                        'images': _extract_fitz_page_images(doc_fitz, page_idx, file_base_name) if doc_fitz else [],
+                    }
+                    next_page_idx = page_idx + 1
+            except Exception as e_plumber:
+                # Same fallback as _extract_pdf_elements, for the pages not yet yielded: text only, no tables.
+                if not (PYPDF_AVAILABLE and pypdf):
+                    raise
+                logger.warning(f"pdfplumber: Error processing PDF {file_base_name} at page {next_page_idx + 1}, "
+                               f"reading the remaining pages with pypdf: {e_plumber}", exc_info=True)
+                reader = pypdf.PdfReader(file_path)
+                for page_idx in range(next_page_idx, len(reader.pages)):
+                    page_text = reader.pages[page_idx].extract_text()
+                    yield {
+                        'page_index': page_idx,
+                        'text_content': page_text.strip() if page_text and page_text.strip() else None,
+                        'tables': [],
+                        'images': _extract_fitz_page_images(doc_fitz, page_idx, file_base_name) if doc_fitz else [],
+                    }
+        finally:
+            if doc_fitz: doc_fitz.close()
+        return
+
+    if ext == '.pptx' and PPTX_AVAILABLE and Presentation and PIL_AVAILABLE and Image:
+        prs = Presentation(file_path)
+        for slide_idx, slide in enumerate(prs.slides):
+            slide_text, slide_images = _extract_pptx_slide_elements(slide, slide_idx, file_base_name)
+            yield {'page_index': slide_idx, 'text_content': slide_text, 'tables': [], 'images': slide_images}
+        return
+
+    parsed = _get_initial_parsed_document(file_path)
+    yield {'page_index': 0, 'text_content': parsed.get('text_content'), 'tables': parsed.get('tables', []),
+           'images': parsed.get('images', []), 'is_scanned_heuristic': parsed.get('is_scanned_heuristic', False),
+           'parser_metadata': parsed.get('parser_metadata', {})}
+
+
+def _window_is_scanned(pages: List[Dict[str, Any]], ext: str) -> bool:
+    """The whole-document scanned heuristics of the extractors, applied to one window of pages."""
+    if any(page.get('is_scanned_heuristic') for page in pages):
+        return True
+    texts = [page['text_content'] for page in pages if page['text_content']]
+    if ext == '.pdf':
+        total_chars = sum(len(t.replace(" ", "")) for t in texts)
+        return not texts or (total_chars / len(pages) < 20 and total_chars < len(pages) * 50)
+    return not texts and any(page['images'] for page in pages)
+
+
+def process_document_for_qdrant_streaming(
+    file_path: str,
+    original_name: str,
+    user_id: str,
+    upsert_chunks: Callable[[List[Dict[str, Any]]], int],
+    document_record_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    progress_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    page_window: Optional[int] = None,
+    pipeline_stats_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> tuple[int, Optional[str], List[Dict[str, Any]]]:
+    """
+    Streaming variant of process_document_for_qdrant for large, image-heavy files.
+    Pages are taken page_window at a time (STREAMING_PAGE_WINDOW by default) through
+    OCR -> clean -> layout -> chunk -> embed, and each window's chunks are handed to
+    upsert_chunks before the next window is read, so images, tables and embeddings of
+    only one window are held in memory at a time. Within a window, embedding and upserting
+    overlap batch by batch (ingestion_pipeline); pipeline_stats_callback receives the
+    per-stage busy/idle times summed over all windows.
+
+    Chunk payloads only carry CHUNK_DOCUMENT_FIELDS; once all pages are done,
+    document_record_callback receives the complete document-level record (entities from
+    every window, char count, OCR/scanned flags) to store once.
+    Returns (num_chunks_upserted, text_for_node_analysis, chunks_for_kg_worker).
+    """
+    page_window = max(1, page_window or STREAMING_PAGE_WINDOW)
+    logger.info(f"ai_core: Streaming document processing for '{original_name}', user '{user_id}' (window: {page_window} pages)")
+    if not (file_path and os.path.exists(file_path)):
+        logger.error(f"File not found at ai_core streaming entry: {file_path}")
+        return 0, None, []
+
+    def report_stage(stage: str, **details: Any) -> None:
+        if progress_callback:
+            try: progress_callback(stage, details)
+            except ProcessingCancelled: raise
+            except Exception as e_cb: logger.warning(f"ai_core: progress_callback failed at stage '{stage}': {e_cb}")
+
+    ext = os.path.splitext(original_name)[1].lower()
+    file_base_name = os.path.basename(file_path)
+    parser_metadata: Dict[str, Any] = {}
+    if ext == '.pdf':
+        parser_metadata = _extract_pdf_parser_metadata(file_path, file_base_name)
+    elif ext == '.pptx' and PPTX_AVAILABLE and Presentation:
+        parser_metadata = _extract_pptx_parser_metadata(Presentation(file_path))
+
+    doc_metadata: Optional[Dict[str, Any]] = None
+    entities_by_type: Dict[str, set] = {}
+    ner_chars_used = 0
+    any_tables = any_scanned = any_ocr = False
+    tables_so_far = 0
+    next_chunk_index = 0
+    fingerprint_counts: Dict[str, int] = {} # keeps chunk point ids unique across windows
+    overlap_tail = ""
+    layout_texts: List[str] = []
+    chunks_for_kg_worker: List[Dict[str, Any]] = []
+    num_upserted = 0
+    pipeline_stats: Optional[Dict[str, Any]] = None
+
+    def process_window(pages: List[Dict[str, Any]], window_number: int) -> None:
+        nonlocal doc_metadata, ner_chars_used, any_tables, any_scanned, any_ocr, tables_so_far
+        nonlocal next_chunk_index, overlap_tail, num_upserted, parser_metadata, pipeline_stats
+        first_page, last_page = pages[0]['page_index'] + 1, pages[-1]['page_index'] + 1
+        report_stage('page_window', window=window_number, first_page=first_page, last_page=last_page)
+        if pages[0].get('parser_metadata'):
+            parser_metadata = {**pages[0]['parser_metadata'], **parser_metadata}
+
+        window_text = "\n\n".join(page['text_content'] for page in pages if page['text_content']).strip()
+        window_images = [img for page in pages for img in page['images']]
+        window_tables = [table for page in pages for table in page['tables']]
+        window_scanned = _window_is_scanned(pages, ext)
+        any_scanned = any_scanned or window_scanned
+        any_tables = any_tables or bool(window_tables)
+
+        # OCR, with the same heuristics as the whole-document path
+        should_ocr = window_images and (window_scanned or ext in IMAGE_FILE_TYPES or not window_text or
+                                        len(window_text) < 200 * len(window_images))
+        if should_ocr:
+            if OCR_AVAILABLE:
+                ocr_text_output = perform_ocr_on_images(window_images, f"{original_name} p{first_page}-{last_page}")
+                if ocr_text_output:
+                    any_ocr = True
+                    window_text = "\n\n".join(part for part in (window_text, ocr_text_output) if part).strip()
+            else:
+                logger.warning(f"OCR needed for {original_name} but OCR backend {config.OCR_BACKEND} not available. Content may be incomplete.")
+        window_images.clear()
+        for page in pages: page['images'] = [] # let the PIL images go before embedding
+
+        cleaned_text, window_entities = clean_and_analyze_text_content(
+            window_text, original_name, ner_char_budget=max(0, MAX_TEXT_LENGTH_FOR_NER - ner_chars_used)
+        ) if window_text else ("", {})
+        ner_chars_used += len(window_text)
+        for label, texts in window_entities.items():
+            entities_by_type.setdefault(label, set()).update(texts)
+        if not cleaned_text and not window_tables:
+            return
+        layout_text = reconstruct_document_layout(cleaned_text, window_tables, ext, original_name,
+                                                  table_number_offset=tables_so_far)
+        tables_so_far += len(window_tables)
+        if not layout_text:
+            return
+        # Where this window starts in text_for_node_analysis ("\n\n".join(layout_texts))
+        window_start_char = sum(len(text) + 2 for text in layout_texts)
+        layout_texts.append(layout_text)
+
+        if doc_metadata is None:
+            doc_metadata = extract_document_metadata_info(
+                file_path, layout_text,
+                {'parser_metadata': parser_metadata, 'tables': window_tables, 'is_scanned_heuristic': window_scanned},
+                original_name, user_id, named_entities=entities_by_type
+            )
+            doc_metadata['source_type_actual'] = ext
+        else:
+            doc_metadata['named_entities'] = {label: sorted(texts) for label, texts in entities_by_type.items()}
+        doc_metadata['ocr_applied'] = any_ocr
+        doc_metadata['is_scanned_document'] = any_scanned
+
+        # Carry the end of the previous window over so chunks still overlap across windows. It is joined
+        # with the same '\n\n' as the windows in text_for_node_analysis, so the prefix is a verbatim slice
+        # of that text and chunk offsets are exact.
+        prefix = overlap_tail + "\n\n" if overlap_tail else ""
+        window_chunks = chunk_document_into_segments(prefix + layout_text, doc_metadata,
+                                                     chunk_index_offset=next_chunk_index,
+                                                     char_offset=window_start_char - len(prefix),
+                                                     fingerprint_counts=fingerprint_counts)
+        overlap_tail = _window_overlap_tail(layout_text)
+        if not window_chunks:
+            return
+        next_chunk_index = window_chunks[-1]['metadata']['chunk_index'] + 1
+
+        for chunk in window_chunks:
+            chunks_for_kg_worker.append({'id': chunk['id'], 'text_content': chunk['text_content'],
+                                         'metadata': dict(chunk['metadata'])})
+        report_stage('embed_upsert', window=window_number, num_chunks=len(window_chunks))
+        window_upserted, window_stats = ingestion_pipeline.embed_and_upsert(
+            window_chunks, generate_segment_embeddings, upsert_chunks)
+        num_upserted += window_upserted
+        pipeline_stats = ingestion_pipeline.merge_stats(pipeline_stats, window_stats)
+
+    try:
+        report_stage('parse')
+        window: List[Dict[str, Any]] = []
+        window_number = 0
+        for page in _iter_document_pages(file_path):
+            window.append(page)
+            if len(window) >= page_window:
+                window_number += 1
+                process_window(window, window_number)
+                window = []
+        if window:
+            process_window(window, window_number + 1)
+    except Exception as e:
+        if TESSERACT_ERROR and isinstance(e, TESSERACT_ERROR):
+            logger.critical(f"ai_core: Tesseract (OCR) not found processing {original_name}. OCR failed. Error: {e}", exc_info=False)
+            raise
+        logger.error(f"ai_core: Critical error while streaming {original_name}: {e}", exc_info=True)
+        raise
+
+    if doc_metadata is None:
+        logger.warning(f"No text content or tables for {original_name} after streaming all pages.")
+        return 0, None, []
+
+    text_for_node_analysis = "\n\n".join(layout_texts)
+    final_metadata = {
+        'named_entities': {label: sorted(texts) for label, texts in entities_by_type.items()},
+        'char_count_processed_text': len(text_for_node_analysis),
+        'structural_elements': "Paragraphs" + (", Tables" if any_tables else ""),
+        'is_scanned_document': any_scanned,
+        'ocr_applied': any_ocr,
+    }
+    if not parser_metadata.get('page_count'):
+        final_metadata['page_count'] = max(1, text_for_node_analysis.count('\n\n') + 1)
+    if document_record_callback and num_upserted:
+        report_stage('finalize_metadata')
+        document_record_callback({**doc_metadata, **final_metadata, 'num_chunks': len(chunks_for_kg_worker)})
+
+    if pipeline_stats is not None:
+        summary = ingestion_pipeline.log_stats(pipeline_stats, original_name)
+        if pipeline_stats_callback:
+            pipeline_stats_callback(summary)
+    logger.info(f"ai_core: Streamed '{original_name}': {num_upserted} chunks upserted to Qdrant.")
+    return num_upserted, text_for_node_analysis, chunks_for_kg_worker
@@ -37,7 +37,12 @@ try:
     import ai_core
     import neo4j_handler
     from neo4j import exceptions as neo4j_exceptions
-    from tts_service import initialize_tts
+    import model_registry
+    import warmup
+    import embedding_cache
+    import retrieval_cache
+    import ingestion_jobs
+    import ingestion_store
     import document_generator
     import podcast_generator
     import google.generativeai as genai
@@ -118,29 +123,71 @@ else:
 app = Flask(__name__)
 
 
-metrics = PrometheusMetrics(app)
+if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    # Pre-fork (gunicorn) mode: aggregate metrics from every worker process into /metrics.
+    from prometheus_flask_exporter.multiprocess import GunicornInternalPrometheusMetrics
+    metrics = GunicornInternalPrometheusMetrics(app)
+else:
+    metrics = PrometheusMetrics(app)
 logger.info("Prometheus metrics endpoint initialized at /metrics.")
 
 GENERATED_DOCS_DIR = os.path.join(SERVER_DIR, 'generated_docs')
 os.makedirs(GENERATED_DOCS_DIR, exist_ok=True)
 app.config['GENERATED_DOCS_DIR'] = GENERATED_DOCS_DIR
 
+# Helper pool processes (OCR, PDF extraction; see worker_pools.py) re-import the main script as
+# __mp_main__ under `python app.py`. They only need this module importable, not its services.
+IS_POOL_PROCESS = __name__ == '__mp_main__'
+
 # Initialize services
 vector_service = None
-try:
-    vector_service = VectorDBService()
-    vector_service.setup_collection()
-    app.vector_service = vector_service
-except Exception as e:
-    logger.critical(f"Failed to initialize VectorDBService: {e}", exc_info=True)
-
-try:
-    neo4j_handler.init_driver()
-except Exception as e:
-    logger.critical(f"Neo4j driver failed to initialize: {e}.")
-atexit.register(neo4j_handler.close_driver)
+if not IS_POOL_PROCESS:
+    try:
+        vector_service = VectorDBService()
+        vector_service.setup_collection()
+        app.vector_service = vector_service
+    except Exception as e:
+        logger.critical(f"Failed to initialize VectorDBService: {e}", exc_info=True)
 
-initialize_tts()
+    try:
+        neo4j_handler.init_driver()
+    except Exception as e:
+        logger.critical(f"Neo4j driver failed to initialize: {e}.")
+    atexit.register(neo4j_handler.close_driver)
+
+    # Models load lazily on first use; the ones listed in PRELOAD_MODELS are loaded and warmed
+    # (in the background by default) so /ready can gate traffic until they are usable.
+    warmup.start_warmup()
+
+
+def reinitialize_after_fork():
+    """
+    Called in each gunicorn worker right after fork (see gunicorn.conf.py). Network clients created in
+    the master must not be shared between processes, so each worker opens its own connections.
+    Models loaded in the master stay shared copy-on-write.
+    """
+    neo4j_handler.reset_driver_after_fork()
+    if vector_service:
+        vector_service.reconnect()
+
+
+# --- Worker roles (RAG_SERVICE_ROLE) ---
+# Endpoints that run the long, CPU-heavy ingestion pipelines.
+INGESTION_ENDPOINTS = {'add_document_qdrant', 'process_media_file_route', 'process_url_source_route',
+                       'submit_add_document_job_route', 'get_job_status_route', 'update_document_qdrant'}
+# Probes, metrics and diagnostics are served regardless of role.
+ALWAYS_SERVED_ENDPOINTS = {'liveness_check', 'readiness_check', 'health_check', 'model_stats_route', 'cache_stats_route', 'prometheus_metrics', 'static'}
+
+@app.before_request
+def enforce_worker_role():
+    role = config.RAG_SERVICE_ROLE
+    endpoint = request.endpoint
+    if role == 'all' or endpoint is None or endpoint in ALWAYS_SERVED_ENDPOINTS:
+        return None
+    is_ingestion = endpoint in INGESTION_ENDPOINTS
+    if (role == 'query' and is_ingestion) or (role == 'ingestion' and not is_ingestion):
+        return create_error_response(f"Endpoint '{request.path}' is not served by workers with role '{role}'.", 421)
+    return None
 
 
 def create_error_response(message, status_code=500, details=None):
@@ -416,8 +463,14 @@ def search_qdrant_documents():
 
     try:
         k = data.get('k', 5)
+
+        cache_key, cached_payload = retrieval_cache.lookup(user_id, document_context_name, query_text, k, use_kg)
+        if cached_payload is not None:
+            current_app.logger.info("RAG+KG search served from retrieval cache.")
+            return jsonify(cached_payload), 200
         
         facts_from_kg = ""
+        kg_search_failed = False
         if use_kg and document_context_name:
             current_app.logger.info(f"KG search is ENABLED for doc '{document_context_name}'.")
             try:
@@ -425,6 +478,7 @@ def search_qdrant_documents():
             except Exception as e_kg:
                 logger.error(f"Error during KG search part of RAG query: {e_kg}", exc_info=True)
                 facts_from_kg = "Note: An error occurred while searching the knowledge graph."
+                kg_search_failed = True
         else:
             current_app.logger.info("KG search is DISABLED for this query.")
 
@@ -454,6 +508,8 @@ def search_qdrant_documents():
             "retrieved_documents_map": docs_map,
         }
         
+        if not kg_search_failed:
+            retrieval_cache.store(cache_key, response_payload)
         current_app.logger.info(f"RAG+KG search successful. Returning {len(retrieved_docs)} documents.")
         return jsonify(response_payload), 200
         
@@ -461,6 +517,24 @@ def search_qdrant_documents():
         logger.error(f"Error in /query (RAG+KG search): {e}", exc_info=True)
         return create_error_response(f"Query failed: {str(e)}", 500)
 
+@app.route('/live', methods=['GET'])
+def liveness_check():
+    """Cheap liveness probe: the process is up and serving HTTP. Never touches models or databases."""
+    return jsonify({"status": "alive"}), 200
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 only once the hot models (READINESS_MODELS) are loaded and warmed.
+    A required model whose warm-up inference failed reports 'warmup_failed' and keeps this at 503."""
+    warmup_status = warmup.get_status()
+    is_ready = warmup_status["ready"] and vector_service is not None
+    payload = {
+        "status": "ready" if is_ready else "not_ready",
+        "vector_service": "initialized" if vector_service is not None else "failed_to_initialize",
+        **warmup_status,
+    }
+    return jsonify(payload), 200 if is_ready else 503
+
 @app.route('/health', methods=['GET'])
 def health_check():
     status_details = { "status": "error", "qdrant_service": "not_initialized", "neo4j_service": "not_initialized_via_handler", "neo4j_connection": "unknown"}
@@ -481,11 +555,35 @@ def health_check():
     else:
         status_details["neo4j_service"], status_details["neo4j_connection"] = "initialization_failed_or_handler_error", neo4j_conn_status
     
+    status_details["models"] = warmup.get_status()
+
     if status_details["qdrant_service"] == "initialized" and status_details.get("qdrant_collection_status") == "exists_and_accessible" and neo4j_ok:
         status_details["status"], http_status_code = "ok", 200
     
     return jsonify(status_details), http_status_code
 
+@app.route('/models/stats', methods=['GET'])
+def model_stats_route():
+    """Reports which models this worker has loaded, with load time and memory per model."""
+    return jsonify(model_registry.get_model_stats()), 200
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats_route():
+    """Hit/miss counters and sizes of this worker's caches."""
+    stats = {}
+    document_embedding_cache = embedding_cache.get_embedding_cache()
+    if document_embedding_cache is not None:
+        stats['document_embeddings'] = document_embedding_cache.stats()
+    if vector_service is not None and vector_service.query_embedding_cache is not None:
+        stats['query_embeddings'] = vector_service.query_embedding_cache.stats()
+    query_result_cache = retrieval_cache.get_retrieval_cache()
+    if query_result_cache is not None:
+        stats['query_results'] = query_result_cache.stats()
+    processed_document_store = ingestion_store.get_ingestion_store()
+    if processed_document_store is not None:
+        stats['processed_documents'] = processed_document_store.stats()
+    return jsonify(stats), 200
+
 @app.route('/add_document', methods=['POST'])
 def add_document_qdrant():
     data = request.get_json()
@@ -500,39 +598,80 @@ def add_document_qdrant():
         return create_error_response("Missing 'user_id' or 'original_name'", 400)
 
     # Conditional check for source of text
-    if text_content_override:
-        logger.info(f"Adding document '{original_name}' (from text_content_override), user '{user_id}'.")
-        # ai_core.process_document_for_qdrant needs to handle text_content_override
-        # Pass a dummy file_path as it's required by the signature, actual file is not read.
-        processed_chunks, raw_text, kg_chunks = ai_core.process_document_for_qdrant(
-            file_path="",  # Dummy, as content is overridden
-            original_name=original_name,
-            user_id=user_id,
-            text_content_override=text_content_override # Pass the override
-        )
-    elif file_path and os.path.exists(file_path):
-        logger.info(f"Adding document '{original_name}' (from file_path), user '{user_id}'.")
-        processed_chunks, raw_text, kg_chunks = ai_core.process_document_for_qdrant(
-            file_path=file_path,
-            original_name=original_name,
-            user_id=user_id
+    if not text_content_override and not (file_path and os.path.exists(file_path)):
+        return create_error_response("Neither 'file_path' (and file exists) nor 'text_content_override' provided.", 400)
+
+    result = ingestion_jobs.run_add_document(
+        app.vector_service, user_id, original_name,
+        file_path=file_path, text_content_override=text_content_override,
+        streaming=data.get('streaming') # None = STREAMING_INGESTION
+    )
+    return jsonify(result), 201
+
+@app.route('/update_document', methods=['POST'])
+def update_document_qdrant():
+    """Re-ingests a changed document; only new or edited chunks are embedded, vanished chunks are deleted."""
+    data = request.get_json()
+    if not data: return create_error_response("Request must be JSON", 400)
+
+    user_id = data.get('user_id')
+    file_path = data.get('file_path')
+    original_name = data.get('original_name')
+    text_content_override = data.get('text_content_override')
+
+    if not all([user_id, original_name]):
+        return create_error_response("Missing 'user_id' or 'original_name'", 400)
+    if not text_content_override and not (file_path and os.path.exists(file_path)):
+        return create_error_response("Neither 'file_path' (and file exists) nor 'text_content_override' provided.", 400)
+
+    try:
+        result = ingestion_jobs.run_update_document(
+            app.vector_service, user_id, original_name,
+            file_path=file_path, text_content_override=text_content_override
         )
-    else:
+    except Exception as e:
+        logger.error(f"Failed to update document '{original_name}' for user '{user_id}': {e}", exc_info=True)
+        return create_error_response(f"Document update failed: {str(e)}", 500)
+    return jsonify(result), 200
+
+@app.route('/jobs/add_document', methods=['POST'])
+def submit_add_document_job_route():
+    """Queues /add_document work for the ingestion worker pool and returns the job id at once."""
+    data = request.get_json()
+    if not data: return create_error_response("Request must be JSON", 400)
+
+    user_id = data.get('user_id')
+    file_path = data.get('file_path')
+    original_name = data.get('original_name')
+    text_content_override = data.get('text_content_override')
+
+    if not all([user_id, original_name]):
+        return create_error_response("Missing 'user_id' or 'original_name'", 400)
+    if not text_content_override and not (file_path and os.path.exists(file_path)):
         return create_error_response("Neither 'file_path' (and file exists) nor 'text_content_override' provided.", 400)
 
-    num_added, status = 0, "processed_no_content"
-    if processed_chunks:
-        num_added = app.vector_service.add_processed_chunks(processed_chunks)
-        if num_added > 0: status = "added_to_qdrant"
-    
-    return jsonify({
-        "message": "Document processed.",
-        "status": status,
-        "filename": original_name,
-        "num_chunks_added_to_qdrant": num_added,
-        "raw_text_for_analysis": raw_text or "",
-        "chunks_with_metadata": kg_chunks
-    }), 201
+    try:
+        job_id = ingestion_jobs.submit_add_document_job({
+            "user_id": user_id,
+            "file_path": file_path,
+            "original_name": original_name,
+            "text_content_override": text_content_override,
+            "streaming": data.get('streaming'),
+        })
+    except Exception as e:
+        logger.error(f"Failed to queue ingestion job for '{original_name}': {e}", exc_info=True)
+        return create_error_response(f"Could not queue ingestion job: {str(e)}", 500)
+
+    logger.info(f"Queued ingestion job {job_id} for '{original_name}', user '{user_id}'.")
+    return jsonify({"job_id": job_id, "status": ingestion_jobs.JOB_QUEUED, "status_url": f"/jobs/{job_id}"}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status_route(job_id):
+    """Per-stage status of an ingestion job; 'result' holds the /add_document response once completed."""
+    job = ingestion_jobs.get_job_store().get(job_id)
+    if job is None:
+        return create_error_response(f"Job '{job_id}' not found", 404)
+    return jsonify(job), 200
 
 
 @app.route('/academic_search', methods=['POST'])
@@ -621,9 +760,21 @@ def delete_qdrant_data_route():
     if not user_id or not document_name: return create_error_response("Missing fields", 400)
     try:
         result = vector_service.delete_document_vectors(user_id, document_name)
+        retrieval_cache.invalidate_document(user_id, document_name)
         return jsonify(result), 200
     except Exception as e: return create_error_response(f"Deletion failed: {str(e)}", 500)
 
+@app.route('/document_metadata/<user_id>/<path:document_name>', methods=['GET'])
+def get_document_metadata_route(user_id, document_name):
+    """The document-level record (entities, parser metadata, ...) that chunk payloads reference by doc_id."""
+    try:
+        record = vector_service.get_document_record(user_id, document_name)
+    except Exception as e:
+        return create_error_response(f"Document metadata retrieval failed: {str(e)}", 500)
+    if record is None:
+        return create_error_response(f"No metadata record for document '{document_name}'", 404)
+    return jsonify(record), 200
+
 @app.route('/kg', methods=['POST'])
 def add_or_update_kg_route():
     data = request.get_json()
@@ -632,6 +783,7 @@ def add_or_update_kg_route():
     if not all([user_id, original_name, isinstance(nodes, list), isinstance(edges, list)]): return create_error_response("Missing fields", 400)
     try:
         result = neo4j_handler.ingest_knowledge_graph(user_id, original_name, nodes, edges)
+        retrieval_cache.invalidate_document(user_id, original_name)
         return jsonify({"message": "KG ingested", "status": "completed", **result}), 201
     except Exception as e: return create_error_response(f"KG ingestion failed: {str(e)}", 500)
 
@@ -654,6 +806,7 @@ def get_kg_route(user_id, document_name):
 def delete_kg_route(user_id, document_name):
     try:
         deleted = neo4j_handler.delete_knowledge_graph(user_id, document_name)
+        retrieval_cache.invalidate_document(user_id, document_name)
         return jsonify({"message": "KG deleted"}) if deleted else create_error_response("KG not found", 404)
     except Exception as e: return create_error_response(f"KG deletion failed: {str(e)}", 500)
 
@@ -883,75 +1036,79 @@ def generate_document_from_topic_route():
 # #     }), 202 # 202 Accepted indicates the request is accepted but processing is not complete
 # # # --- END MODIFICATION ---
 
-if __name__ == '__main__':
-    @app.route('/process_media_file', methods=['POST'])
-    def process_media_file_route():
-        """Handles direct file uploads of audio, video, or images for transcription/OCR."""
-        current_app.logger.info("--- /process_media_file Request ---")
-        data = request.get_json()
-        if not data:
-            return create_error_response("Request must be JSON", 400)
-
-        file_path = data.get('file_path')
-        media_type = data.get('media_type')  # Expected: 'audio', 'video', or 'image'
-
-        if not file_path or not media_type:
-            return create_error_response("Missing 'file_path' or 'media_type'", 400)
-        if not os.path.exists(file_path):
-            return create_error_response(f"File not found at path: {file_path}", 404)
+@app.route('/process_media_file', methods=['POST'])
+def process_media_file_route():
+    """Handles direct file uploads of audio, video, or images for transcription/OCR."""
+    current_app.logger.info("--- /process_media_file Request ---")
+    data = request.get_json()
+    if not data:
+        return create_error_response("Request must be JSON", 400)
 
-        try:
-            text_content = None
-            if media_type == 'audio':
-                text_content = media_processor.process_uploaded_audio(file_path)
-            elif media_type == 'video':
-                text_content = media_processor.process_uploaded_video(file_path)
-            elif media_type == 'image':
-                text_content = media_processor.process_uploaded_image(file_path)
-            else:
-                return create_error_response(f"Unsupported media_type: {media_type}", 400)
-            
-            if not text_content or not text_content.strip():
-                return create_error_response(f"Failed to extract meaningful text from the {media_type} file.", 422)
-
-            return jsonify({
-                "success": True,
-                "message": f"Successfully extracted text from {media_type} file.",
-                "text_content": text_content,
-            }), 200
-        except Exception as e:
-            logger.error(f"Error in /process_media_file for type '{media_type}': {e}", exc_info=True)
-            return create_error_response(f"Failed to process {media_type} file: {str(e)}", 500)
-
-    @app.route('/process_url', methods=['POST'])
-    def process_url_source_route():
-        """Handles YouTube and generic web URLs."""
-        current_app.logger.info("--- /process_url Request ---")
-        data = request.get_json()
-        if not data: return create_error_response("Request must be JSON", 400)
-        
-        url = data.get('url')
-        user_id = data.get('user_id')
+    file_path = data.get('file_path')
+    media_type = data.get('media_type')  # Expected: 'audio', 'video', or 'image'
+
+    if not file_path or not media_type:
+        return create_error_response("Missing 'file_path' or 'media_type'", 400)
+    if not os.path.exists(file_path):
+        return create_error_response(f"File not found at path: {file_path}", 404)
 
-        if not url or not user_id: return create_error_response("Missing 'url' or 'user_id'", 400)
+    try:
+        text_content = None
+        if media_type == 'audio':
+            text_content = media_processor.process_uploaded_audio(file_path)
+        elif media_type == 'video':
+            text_content = media_processor.process_uploaded_video(file_path)
+        elif media_type == 'image':
+            text_content = media_processor.process_uploaded_image(file_path)
+        else:
+            return create_error_response(f"Unsupported media_type: {media_type}", 400)
         
-        try:
-            # Delegate to the knowledge engine
-            extracted_text, final_title, source_type = knowledge_engine.process_url_source(url, user_id)
-            if not extracted_text:
-                return create_error_response(f"Failed to extract meaningful text from the {source_type}.", 422)
-
-            return jsonify({
-                "success": True,
-                "message": f"Successfully extracted text from {source_type}.",
-                "text_content": extracted_text,
-                "title": final_title,
-                "source_type": source_type,
-            }), 200
-        except Exception as e:
-            logger.error(f"Error in /process_url for URL '{url}': {e}", exc_info=True)
-            return create_error_response(f"Failed to process URL: {str(e)}", 500)
+        if not text_content or not text_content.strip():
+            return create_error_response(f"Failed to extract meaningful text from the {media_type} file.", 422)
+
+        return jsonify({
+            "success": True,
+            "message": f"Successfully extracted text from {media_type} file.",
+            "text_content": text_content,
+        }), 200
+    except Exception as e:
+        logger.error(f"Error in /process_media_file for type '{media_type}': {e}", exc_info=True)
+        return create_error_response(f"Failed to process {media_type} file: {str(e)}", 500)
+
+@app.route('/process_url', methods=['POST'])
+def process_url_source_route():
+    """Handles YouTube and generic web URLs."""
+    current_app.logger.info("--- /process_url Request ---")
+    data = request.get_json()
+    if not data: return create_error_response("Request must be JSON", 400)
+    
+    url = data.get('url')
+    user_id = data.get('user_id')
 
+    if not url or not user_id: return create_error_response("Missing 'url' or 'user_id'", 400)
+    
+    try:
+        # Delegate to the knowledge engine
+        extracted_text, final_title, source_type = knowledge_engine.process_url_source(url, user_id)
+        if not extracted_text:
+            return create_error_response(f"Failed to extract meaningful text from the {source_type}.", 422)
+
+        return jsonify({
+            "success": True,
+            "message": f"Successfully extracted text from {source_type}.",
+            "text_content": extracted_text,
+            "title": final_title,
+            "source_type": source_type,
+        }), 200
+    except Exception as e:
+        logger.error(f"Error in /process_url for URL '{url}': {e}", exc_info=True)
+        return create_error_response(f"Failed to process URL: {str(e)}", 500)
+
+
+if __name__ == '__main__':
     logger.info(f"--- Starting RAG & Knowledge API Service on port {config.API_PORT} ---")
+    ingestion_supervisor = ingestion_jobs.start_supervisor_process()
+    if ingestion_supervisor:
+        atexit.register(ingestion_supervisor.terminate)
     # Using threaded=False for stability with external processes like ffmpeg/tesseract
     app.run(host='0.0.0.0', port=config.API_PORT, debug=False, threaded=False)
\ No newline at end of file
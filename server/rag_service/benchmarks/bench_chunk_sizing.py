@@ -0,0 +1,78 @@
+# server/rag_service/benchmarks/bench_chunk_sizing.py
+"""
+Character vs. token chunk sizing (AI_CORE_CHUNK_UNIT) on real documents: vectors per document,
+token length of the chunks (and how many exceed the model's max_seq_length, i.e. get truncated),
+and ingestion time through ai_core.process_document_for_qdrant (parse -> clean -> chunk -> embed,
+no Qdrant). The embedding cache is disabled so both modes really embed.
+
+    cd server/rag_service
+    python benchmarks/bench_chunk_sizing.py textbook.pdf lecture_notes.docx --tokens 500 --overlap-tokens 64
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+os.environ['EMBEDDING_CACHE_ENABLED'] = 'false'
+
+RAG_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAG_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, RAG_SERVICE_DIR)
+
+import config
+import ai_core
+import model_registry
+import embedding_service
+import text_splitter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help="Documents to ingest (any type ai_core parses).")
+    parser.add_argument('--chars', type=int, default=config.AI_CORE_CHUNK_SIZE)
+    parser.add_argument('--overlap-chars', type=int, default=config.AI_CORE_CHUNK_OVERLAP)
+    parser.add_argument('--tokens', type=int, default=config.AI_CORE_CHUNK_TOKENS)
+    parser.add_argument('--overlap-tokens', type=int, default=config.AI_CORE_CHUNK_OVERLAP_TOKENS)
+    args = parser.parse_args()
+
+    encoder = embedding_service.get_document_encoder()
+    tokenizer = encoder.get_tokenizer() # loads the embedding model before timing anything
+    if not getattr(tokenizer, 'is_fast', False):
+        raise SystemExit(f"No fast tokenizer for {config.DOCUMENT_EMBEDDING_MODEL_NAME}.")
+    model_registry.get_model('spacy')
+    max_seq_length = getattr(model_registry.get_model(encoder.registry_key), 'max_seq_length', None) or 512
+    counter = text_splitter.TokenTextSplitter(tokenizer, args.tokens, args.overlap_tokens)
+    ai_core.AI_CORE_CHUNK_SIZE, ai_core.AI_CORE_CHUNK_OVERLAP = args.chars, args.overlap_chars
+    ai_core.AI_CORE_CHUNK_TOKENS, ai_core.AI_CORE_CHUNK_OVERLAP_TOKENS = args.tokens, args.overlap_tokens
+
+    modes = (('chars', f"{args.chars} chars"), ('tokens', f"{args.tokens} tokens"))
+    totals = {mode: [0, 0.0] for mode, _ in modes}
+    print(f"model {config.DOCUMENT_EMBEDDING_MODEL_NAME}, max_seq_length {max_seq_length}\n")
+    print("document                       | chunk size  | vectors | tokens/chunk mean/max | truncated | seconds")
+    for path in args.files:
+        name = os.path.basename(path)
+        for mode, label in modes:
+            ai_core.AI_CORE_CHUNK_UNIT = mode
+            start = time.perf_counter()
+            chunks, _, _ = ai_core.process_document_for_qdrant(path, name, "benchmark")
+            seconds = time.perf_counter() - start
+            # +2 for the [CLS]/[SEP] style special tokens the encoder adds
+            lengths = [counter.count_tokens(chunk['text_content']) + 2 for chunk in chunks] or [0]
+            truncated = sum(length > max_seq_length for length in lengths)
+            totals[mode][0] += len(chunks)
+            totals[mode][1] += seconds
+            print(f"{name[:30]:30s} | {label:11s} | {len(chunks):7d} | {statistics.mean(lengths):10.0f} / {max(lengths):4d} "
+                  f"| {truncated:9d} | {seconds:7.1f}")
+
+    print()
+    for mode, label in modes:
+        vectors, seconds = totals[mode]
+        print(f"{label:11s}: {vectors} vectors ({vectors / len(args.files):.1f} per document), {seconds:.1f}s")
+    if totals['tokens'][0]:
+        print(f"chars/tokens: {totals['chars'][0] / totals['tokens'][0]:.2f}x vectors, "
+              f"{totals['chars'][1] / max(totals['tokens'][1], 1e-9):.2f}x time")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# server/rag_service/benchmarks/bench_embedding_backends.py
+"""
+Compares the PyTorch fp32 and ONNX Runtime (int8) embedding backends on CPU.
+
+Reports, per backend:
+  - document throughput (chunks/sec) encoding a corpus of chunk-sized texts
+  - single-query encode latency p50 / p99
+and the cosine-similarity parity of ONNX vs. fp32 on the same corpus.
+
+    cd server/rag_service
+    python onnx_encoder.py export                     # one-off
+    python benchmarks/bench_embedding_backends.py --chunks 512 --queries 200 --onnx-threads 4
+    python benchmarks/bench_embedding_backends.py --corpus some_extracted_text.txt
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+RAG_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAG_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, RAG_SERVICE_DIR)
+
+import config
+import onnx_encoder
+
+WORDS = ("recursion stack queue gradient descent matrix vector lecture theorem proof algorithm complexity "
+         "photosynthesis mitochondria revolution economy market equilibrium derivative integral entropy "
+         "protocol network packet compiler syntax semantics database index transaction").split()
+
+
+def _synthetic_chunks(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    # Mixed lengths, roughly the spread AI_CORE_CHUNK_SIZE produces (a few words up to ~512 chars).
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 90))) for _ in range(n)]
+
+
+def _corpus_chunks(path: str, n: int, size: int = 512):
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        text = " ".join(f.read().split())
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+    return chunks[:n]
+
+
+def _bench(encoder, chunks, queries, batch_size):
+    encoder.encode(chunks[:batch_size], batch_size=batch_size) # warm-up
+    start = time.perf_counter()
+    vectors = encoder.encode(chunks, batch_size=batch_size)
+    doc_seconds = time.perf_counter() - start
+
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        encoder.encode(q)
+        latencies.append(time.perf_counter() - t0)
+    return np.asarray(vectors), len(chunks) / doc_seconds, np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=config.DOCUMENT_EMBEDDING_MODEL_NAME)
+    parser.add_argument('--corpus', default=None, help="Text file to cut into chunks (default: synthetic chunks).")
+    parser.add_argument('--chunks', type=int, default=512)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--onnx-threads', type=int, default=config.ONNX_INTRA_OP_THREADS)
+    parser.add_argument('--torch-threads', type=int, default=0, help="0 leaves torch's default.")
+    args = parser.parse_args()
+
+    chunks = _corpus_chunks(args.corpus, args.chunks) if args.corpus else _synthetic_chunks(args.chunks)
+    queries = [" ".join(c.split()[:8]) for c in _synthetic_chunks(args.queries, seed=11)]
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    if args.torch_threads:
+        torch.set_num_threads(args.torch_threads)
+    torch_encoder = SentenceTransformer(args.model, device='cpu')
+
+    model_dir = onnx_encoder.model_export_dir(args.model)
+    if not os.path.exists(os.path.join(model_dir, onnx_encoder.INT8_MODEL_FILE)):
+        onnx_encoder.export_onnx_model(args.model, model_dir, quantize=True)
+    onnx_int8 = onnx_encoder.OnnxSentenceEncoder(model_dir, intra_op_threads=args.onnx_threads, quantized=True)
+
+    results = {}
+    for label, encoder in (("torch-fp32", torch_encoder), ("onnx-int8", onnx_int8)):
+        results[label] = _bench(encoder, chunks, queries, args.batch_size)
+        print(f"{label}: done", flush=True)
+
+    ref = results["torch-fp32"][0]
+    cand = results["onnx-int8"][0]
+    ref = ref / np.linalg.norm(ref, axis=1, keepdims=True)
+    cand = cand / np.linalg.norm(cand, axis=1, keepdims=True)
+    cosines = (ref * cand).sum(axis=1)
+
+    print(f"\nmodel: {args.model} | chunks: {len(chunks)} | queries: {len(queries)} | batch size: {args.batch_size}")
+    print("backend    | chunks/sec | query p50 ms | query p99 ms")
+    for label, (_, chunks_per_sec, p50, p99) in results.items():
+        print(f"{label:10} | {chunks_per_sec:10.1f} | {p50:12.2f} | {p99:12.2f}")
+    print(f"\nparity (onnx-int8 vs torch-fp32 cosine): min {cosines.min():.4f} | "
+          f"p01 {np.percentile(cosines, 1):.4f} | mean {cosines.mean():.4f}")
+
+
+if __name__ == '__main__':
+    main()
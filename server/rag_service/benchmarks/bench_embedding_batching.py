@@ -0,0 +1,118 @@
+# server/rag_service/benchmarks/bench_embedding_batching.py
+"""
+CPU throughput (chunks/sec) of document embedding with the encoder's own batching
+(encode(texts), fixed batch size in document order) against token-budget batching
+(SharedEncoder.encode_in_token_batches) for several EMBEDDING_BATCH_TOKEN_BUDGET values, plus the
+padding each plan computes and the cosine similarity of the vectors to the baseline.
+--pool-workers N adds the same plan spread over an embedding_pool.EmbeddingPool of N processes.
+
+The corpus mixes chunk lengths like real documents do: headings and captions, short paragraphs
+and full-size chunks. --corpus takes a text file instead; its paragraphs are used as chunks.
+
+    cd server/rag_service
+    python benchmarks/bench_embedding_batching.py --chunks 2000 --budgets 4096 8192 16384
+    python benchmarks/bench_embedding_batching.py --chunks 5000 --pool-workers 4
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+RAG_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAG_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, RAG_SERVICE_DIR)
+
+import config
+import embedding_service
+import embedding_pool
+
+WORDS = ("recursion stack queue gradient descent matrix vector lecture theorem proof algorithm complexity "
+         "photosynthesis mitochondria revolution economy market equilibrium derivative integral entropy "
+         "protocol network packet compiler syntax semantics database index transaction").split()
+
+
+def _mixed_chunks(n: int, seed: int = 17):
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(n):
+        kind = rng.random()
+        num_words = rng.randint(3, 12) if kind < 0.3 else rng.randint(20, 80) if kind < 0.6 else rng.randint(150, 380)
+        chunks.append(" ".join(rng.choice(WORDS) for _ in range(num_words)))
+    return chunks
+
+
+def _file_chunks(path: str, n: int):
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        paragraphs = [p.strip() for p in f.read().split("\n\n") if p.strip()]
+    return (paragraphs * (n // max(1, len(paragraphs)) + 1))[:n]
+
+
+def _padded_tokens(batches, lengths):
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help="Text file whose paragraphs are used as chunks.")
+    parser.add_argument('--chunks', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=32, help="Baseline encode() batch size.")
+    parser.add_argument('--budgets', type=int, nargs='+', default=[4096, 8192, 16384])
+    parser.add_argument('--max-batch-size', type=int, default=config.EMBEDDING_MAX_BATCH_SIZE)
+    parser.add_argument('--pool-workers', type=int, default=0, help="Also time an embedding pool of this many processes.")
+    parser.add_argument('--pool-threads', type=int, default=0, help="Threads per pool process (0 = cpu_count // workers).")
+    args = parser.parse_args()
+
+    texts = _file_chunks(args.corpus, args.chunks) if args.corpus else _mixed_chunks(args.chunks)
+    encoder = embedding_service.get_document_encoder()
+    if not encoder.is_available():
+        raise SystemExit(f"Embedding model {encoder.model_name} could not be loaded.")
+    lengths = encoder.token_lengths(texts)
+    if lengths is None:
+        raise SystemExit("Token-budget batching needs a fast tokenizer.")
+    encoder.encode(texts[:8]) # warm-up
+
+    real_tokens = sum(lengths)
+    in_order = [list(range(i, min(i + args.batch_size, len(texts)))) for i in range(0, len(texts), args.batch_size)]
+    print(f"{len(texts)} chunks, {real_tokens:,} tokens (min {min(lengths)}, mean {real_tokens / len(texts):.0f}, "
+          f"max {max(lengths)}), model {encoder.model_name}, {os.cpu_count()} CPUs\n")
+    print("batching                    | batches |             padded tokens | seconds | chunks/sec | min cosine")
+
+    start = time.perf_counter()
+    baseline = np.asarray(encoder.encode(texts, batch_size=args.batch_size))
+    seconds = time.perf_counter() - start
+    print(f"{'encode(), batch_size=' + str(args.batch_size):27s} | {len(in_order):7d} | "
+          f"{_padded_tokens(in_order, lengths):25,} | {seconds:7.1f} | {len(texts) / seconds:10.1f} | 1.000000")
+
+    for budget in args.budgets:
+        batches = embedding_service.token_budget_batches(lengths, budget, args.max_batch_size)
+        start = time.perf_counter()
+        vectors = encoder.encode_in_token_batches(texts, budget, args.max_batch_size)
+        seconds = time.perf_counter() - start
+        cosine = np.sum(vectors * baseline, axis=1) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(baseline, axis=1))
+        print(f"{'token budget ' + str(budget):27s} | {len(batches):7d} | {_padded_tokens(batches, lengths):25,} | "
+              f"{seconds:7.1f} | {len(texts) / seconds:10.1f} | {cosine.min():.6f}")
+    if args.pool_workers > 0:
+        threads = args.pool_threads or max(1, (os.cpu_count() or 1) // args.pool_workers)
+        pool = embedding_pool.EmbeddingPool(encoder.model_name, args.pool_workers, threads)
+        pool.start() # model load in every process is not timed
+        try:
+            budget = args.budgets[-1]
+            batches = embedding_service.token_budget_batches(lengths, budget, args.max_batch_size)
+            start = time.perf_counter()
+            vectors = pool.encode(texts, batches)
+            seconds = time.perf_counter() - start
+        finally:
+            pool.close()
+        cosine = np.sum(vectors * baseline, axis=1) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(baseline, axis=1))
+        label = f"pool {args.pool_workers}x{threads}, budget {budget}"
+        print(f"{label:27s} | {len(batches):7d} | {_padded_tokens(batches, lengths):25,} | "
+              f"{seconds:7.1f} | {len(texts) / seconds:10.1f} | {cosine.min():.6f}")
+    print("\n(encode() itself sorts each call by character length, so its real padding is lower than the "
+          "document-order figure; the token-budget plans are exact.)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# server/rag_service/benchmarks/bench_ingestion_pipeline.py
+"""
+Embed-then-upsert (one batch: everything is embedded, then upserted in one blocking call) against
+the pipelined embed/upsert of ingestion_pipeline.embed_and_upsert for several batch sizes, on real
+documents and the configured Qdrant. Prints wall time and each stage's busy/starved/blocked time.
+
+Documents are parsed and chunked once (not timed) and upserted under a throwaway user id, whose
+points are deleted afterwards. The embedding cache is disabled so every run really embeds.
+
+    cd server/rag_service
+    python benchmarks/bench_ingestion_pipeline.py textbook.pdf --batch-sizes 64 256 1024
+"""
+import os
+import sys
+import copy
+import uuid
+import argparse
+
+os.environ['EMBEDDING_CACHE_ENABLED'] = 'false'
+
+RAG_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAG_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, RAG_SERVICE_DIR)
+
+import config
+import ai_core
+import ingestion_pipeline
+from vector_db_service import VectorDBService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help="Documents to ingest (any type ai_core parses).")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[64, 256, 1024])
+    parser.add_argument('--queue-size', type=int, default=config.INGESTION_PIPELINE_QUEUE_SIZE)
+    args = parser.parse_args()
+
+    vector_service = VectorDBService()
+    vector_service.setup_collection()
+    user_id = f"bench-{uuid.uuid4().hex[:8]}"
+    documents = []
+    for path in args.files:
+        name = os.path.basename(path)
+        chunks, _, _ = ai_core.process_document_for_qdrant(path, name, user_id, embed_chunks=False)
+        documents.append((name, chunks))
+    num_chunks = sum(len(chunks) for _, chunks in documents)
+    ai_core.generate_segment_embeddings(copy.deepcopy(documents[0][1][:8])) # warm-up
+    print(f"{len(documents)} document(s), {num_chunks} chunks, Qdrant {config.QDRANT_HOST}:{config.QDRANT_PORT}\n")
+    print("batch size | seconds | chunks/sec | embed busy / starved / blocked | upsert busy / starved / blocked")
+
+    try:
+        for batch_size in [0] + args.batch_sizes:
+            total = None
+            for name, chunks in documents:
+                _, stats = ingestion_pipeline.embed_and_upsert(copy.deepcopy(chunks), ai_core.generate_segment_embeddings,
+                                                               vector_service.add_processed_chunks,
+                                                               batch_size=batch_size, queue_size=args.queue_size)
+                total = ingestion_pipeline.merge_stats(total, stats)
+            summary = ingestion_pipeline.summarize_stats(total)
+            embed, upsert = summary['stages']['embed'], summary['stages']['upsert']
+            label = "all" if batch_size == 0 else str(batch_size)
+            print(f"{label:>10s} | {summary['wall_seconds']:7.1f} | {num_chunks / summary['wall_seconds']:10.1f} | "
+                  f"{embed['busy_seconds']:8.1f} / {embed['starved_seconds']:7.1f} / {embed['blocked_seconds']:7.1f} | "
+                  f"{upsert['busy_seconds']:8.1f} / {upsert['starved_seconds']:7.1f} / {upsert['blocked_seconds']:7.1f}")
+    finally:
+        for name, _ in documents:
+            vector_service.delete_document_vectors(user_id, name)
+
+
+if __name__ == '__main__':
+    main()
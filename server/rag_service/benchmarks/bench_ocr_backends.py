@@ -0,0 +1,90 @@
+# server/rag_service/benchmarks/bench_ocr_backends.py
+"""
+Compares the OCR backends (pytesseract subprocess per image vs. tesserocr in-process handle)
+on a fixed set of scanned pages: per-image latency, images/sec, and how closely the texts agree.
+
+Pages come from image files and/or PDFs (rendered with PyMuPDF at --dpi), converted to grayscale
+exactly as ai_core.perform_ocr_on_images does. Runs single-threaded so the per-image overhead is
+what's measured, not pool scheduling.
+
+    cd server/rag_service
+    python benchmarks/bench_ocr_backends.py scans/*.png path/to/scanned.pdf --max-pages 20 --repeat 2
+"""
+import os
+import sys
+import time
+import difflib
+import argparse
+import statistics
+
+RAG_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAG_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, RAG_SERVICE_DIR)
+
+import config
+import ocr_engine
+
+
+def _load_pages(paths, dpi, max_pages):
+    pages = []
+    for path in paths:
+        if path.lower().endswith('.pdf'):
+            with config.fitz.open(path) as doc:
+                for page in doc:
+                    pix = page.get_pixmap(dpi=dpi)
+                    pages.append(config.Image.frombytes("RGB", [pix.width, pix.height], pix.samples).convert('L'))
+        else:
+            pages.append(config.Image.open(path).convert('L'))
+    return pages[:max_pages] if max_pages else pages
+
+
+def _run_backend(backend, pages, repeat):
+    config.OCR_BACKEND = backend
+    ocr_engine.recognize_image(pages[0]) # first call pays for tesserocr's model load; not timed
+    latencies, texts = [], []
+    for _ in range(repeat):
+        texts = []
+        for page in pages:
+            start = time.perf_counter()
+            texts.append(ocr_engine.recognize_image(page))
+            latencies.append(time.perf_counter() - start)
+    return latencies, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help="Image files and/or PDFs.")
+    parser.add_argument('--dpi', type=int, default=200)
+    parser.add_argument('--max-pages', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    pages = _load_pages(args.inputs, args.dpi, args.max_pages)
+    if not pages:
+        raise SystemExit("No pages to OCR.")
+    backends = [name for name, available in (('pytesseract', config.PYTESSERACT_AVAILABLE),
+                                             ('tesserocr', config.TESSEROCR_AVAILABLE)) if available]
+    if not backends:
+        raise SystemExit("Neither pytesseract nor tesserocr is installed.")
+
+    results = {}
+    for backend in backends:
+        results[backend] = _run_backend(backend, pages, args.repeat)
+        print(f"{backend}: done", flush=True)
+
+    print(f"\n{len(pages)} page(s) x {args.repeat} run(s)")
+    print("backend     | images/sec | p50 s/image | p95 s/image | total s")
+    for backend, (latencies, _) in results.items():
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        print(f"{backend:11s} | {len(latencies) / sum(latencies):10.2f} | {statistics.median(latencies):11.3f} | "
+              f"{p95:11.3f} | {sum(latencies):7.1f}")
+    if len(results) == 2:
+        reference, candidate = results['pytesseract'][1], results['tesserocr'][1]
+        ratios = [difflib.SequenceMatcher(None, " ".join(a.split()), " ".join(b.split())).ratio()
+                  for a, b in zip(reference, candidate)]
+        print(f"text similarity (tesserocr vs pytesseract): mean {statistics.mean(ratios):.4f}, min {min(ratios):.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# server/rag_service/benchmarks/bench_pdf_extraction.py
+"""
+Times ai_core._extract_pdf_elements on one PDF as PDF_EXTRACTION_WORKERS goes from 1 to N,
+and checks that text, tables, images and the scanned heuristic match the serial (1 worker) run.
+
+    cd server/rag_service
+    python benchmarks/bench_pdf_extraction.py path/to/textbook.pdf --max-workers 8 --repeat 2
+"""
+import os
+import sys
+import time
+import argparse
+
+RAG_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAG_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, RAG_SERVICE_DIR)
+
+import config
+import ai_core
+import pdf_extraction
+
+
+def _comparable(result):
+    tables = []
+    for table in result['tables']:
+        if hasattr(table, 'values'): # DataFrame
+            tables.append((list(map(str, table.columns)), table.astype(str).values.tolist()))
+        else:
+            tables.append((None, table))
+    images = [(img.size, img.mode) for img in result['images']]
+    return result['text_content'], tables, images, result['is_scanned_heuristic']
+
+
+def _timed_extract(pdf_path, workers, repeat):
+    config.PDF_EXTRACTION_WORKERS = workers
+    config.PDF_PARALLEL_MIN_PAGES = 1 # always take the pool path when workers > 1
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = ai_core._extract_pdf_elements(pdf_path)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per worker count (best time is reported).")
+    args = parser.parse_args()
+
+    num_pages = pdf_extraction.count_pages(args.pdf)
+    worker_counts = sorted({1, *[w for w in (2, 4, 8, 16, 32) if w <= args.max_workers], args.max_workers})
+
+    baseline_seconds, baseline = _timed_extract(args.pdf, 1, args.repeat)
+    reference = _comparable(baseline)
+    rows = [(1, baseline_seconds, True)]
+    for workers in worker_counts[1:]:
+        seconds, result = _timed_extract(args.pdf, workers, args.repeat)
+        rows.append((workers, seconds, _comparable(result) == reference))
+        print(f"workers={workers}: {seconds:.2f}s", flush=True)
+
+    print(f"\n{os.path.basename(args.pdf)}: {num_pages} pages, {len(baseline['tables'])} tables, {len(baseline['images'])} images")
+    print("workers | seconds | pages/sec | speedup | identical to serial")
+    for workers, seconds, identical in rows:
+        print(f"{workers:7d} | {seconds:7.2f} | {num_pages / seconds:9.1f} | {baseline_seconds / seconds:6.2f}x | {identical}")
+    if not all(identical for _, _, identical in rows):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# server/rag_service/benchmarks/bench_query_throughput.py
+"""
+Measures /query throughput of the pre-fork serving mode as the number of workers grows.
+
+For each worker count it starts `gunicorn -c gunicorn.conf.py app:app` on a scratch port,
+waits for /ready, drives /query from concurrent client threads for a fixed duration and
+reports requests/sec and latency percentiles. Qdrant (and Neo4j, if --use-kg) must be running,
+and the target document must already be ingested.
+
+    cd server/rag_service
+    python benchmarks/bench_query_throughput.py --workers 1,2,4,8 --user-id <id> --document <name>
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import threading
+import statistics
+
+import requests
+
+RAG_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_QUERIES = [
+    "what is recursion",
+    "explain the difference between a stack and a queue",
+    "how does gradient descent work",
+    "define time complexity",
+    "what are the main causes of the french revolution",
+    "summarize the key points of chapter two",
+]
+
+
+def _wait_until_ready(base_url: str, timeout_s: float) -> None:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/ready", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    raise TimeoutError(f"Service at {base_url} did not become ready within {timeout_s}s")
+
+
+def _drive_load(base_url: str, payload_base: dict, concurrency: int, duration_s: float):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    stop_at = time.time() + duration_s
+
+    def client(idx: int):
+        nonlocal errors
+        session = requests.Session()
+        i = idx
+        while time.time() < stop_at:
+            payload = dict(payload_base, query=DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)])
+            i += 1
+            start = time.perf_counter()
+            try:
+                ok = session.post(f"{base_url}/query", json=payload, timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return latencies, errors
+
+
+def _percentile(values, pct):
+    if not values: return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help="Comma-separated worker counts to test.")
+    parser.add_argument('--threads', type=int, default=4, help="gthread threads per worker.")
+    parser.add_argument('--concurrency', type=int, default=16, help="Concurrent client threads.")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds of load per worker count.")
+    parser.add_argument('--port', type=int, default=2101)
+    parser.add_argument('--user-id', required=True)
+    parser.add_argument('--document', default=None, help="documentContextName to filter on.")
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--use-kg', action='store_true')
+    parser.add_argument('--ready-timeout', type=float, default=600.0)
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    payload_base = {"user_id": args.user_id, "k": args.k, "use_kg_critical_thinking": args.use_kg}
+    if args.document:
+        payload_base["documentContextName"] = args.document
+
+    rows = []
+    for n_workers in [int(w) for w in args.workers.split(',') if w.strip()]:
+        env = dict(os.environ, RAG_WORKERS=str(n_workers), RAG_WORKER_THREADS=str(args.threads),
+                   API_PORT=str(args.port), RAG_SERVICE_ROLE='query')
+        proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                                cwd=RAG_SERVICE_DIR, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_until_ready(base_url, args.ready_timeout)
+            _drive_load(base_url, payload_base, min(args.concurrency, 4), 3.0) # warm caches/connections
+            latencies, errors = _drive_load(base_url, payload_base, args.concurrency, args.duration)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=60)
+
+        rps = len(latencies) / args.duration
+        rows.append((n_workers, rps, _percentile(latencies, 50) * 1000, _percentile(latencies, 99) * 1000,
+                     statistics.mean(latencies) * 1000 if latencies else float('nan'), errors))
+        print(f"workers={n_workers}: {rps:.1f} req/s", flush=True)
+
+    baseline = rows[0][1] if rows and rows[0][1] else None
+    print("\nworkers | req/s   | speedup | p50 ms  | p99 ms  | mean ms | errors")
+    for n_workers, rps, p50, p99, mean, errors in rows:
+        speedup = f"{rps / baseline:.2f}x" if baseline else "n/a"
+        print(f"{n_workers:7d} | {rps:7.1f} | {speedup:>7} | {p50:7.1f} | {p99:7.1f} | {mean:7.1f} | {errors}")
+
+
+if __name__ == '__main__':
+    main()
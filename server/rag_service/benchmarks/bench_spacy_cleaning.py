@@ -0,0 +1,93 @@
+# server/rag_service/benchmarks/bench_spacy_cleaning.py
+"""
+Throughput (characters/sec) of ai_core.clean_and_normalize_text_content as SPACY_N_PROCESS goes
+from 1 to N, and a check that every process count produces the same lemmatized text. With --ner
+the fused clean_and_analyze_text_content pass (lemmas + entities) is measured instead.
+
+The corpus is a text file (e.g. text extracted from a textbook) repeated until it reaches --chars,
+or a synthetic paragraph corpus when no file is given. Use more than 1,000,000 characters to see
+that nothing is truncated any more.
+
+    cd server/rag_service
+    python benchmarks/bench_spacy_cleaning.py --corpus extracted_textbook.txt --chars 3000000 --max-processes 8
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+RAG_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAG_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, RAG_SERVICE_DIR)
+
+import ai_core
+import model_registry
+
+WORDS = ("the students reviewed recursion stacks and queues before the lecture on gradient descent while "
+         "photosynthesis converts light into chemical energy the market reached an equilibrium price "
+         "compilers translate syntax into semantics transactions keep the database index consistent").split()
+
+
+def _synthetic_corpus(num_chars: int, seed: int = 11) -> str:
+    rng = random.Random(seed)
+    paragraphs, total = [], 0
+    while total < num_chars:
+        sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+                     for _ in range(rng.randint(2, 8))]
+        paragraphs.append(" ".join(sentences))
+        total += len(paragraphs[-1]) + 2
+    return "\n\n".join(paragraphs)[:num_chars]
+
+
+def _file_corpus(path: str, num_chars: int) -> str:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read()
+    repeats = max(1, -(-num_chars // max(1, len(text))))
+    return "\n\n".join([text] * repeats)[:num_chars]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help="Text file to use (repeated up to --chars).")
+    parser.add_argument('--chars', type=int, default=2_000_000)
+    parser.add_argument('--max-processes', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--batch-size', type=int, default=ai_core.SPACY_BATCH_SIZE)
+    parser.add_argument('--segment-chars', type=int, default=ai_core.SPACY_SEGMENT_CHARS)
+    parser.add_argument('--ner', action='store_true', help="Also extract entities (MAX_TEXT_LENGTH_FOR_NER budget).")
+    args = parser.parse_args()
+
+    text = _file_corpus(args.corpus, args.chars) if args.corpus else _synthetic_corpus(args.chars)
+    if model_registry.get_model('spacy') is None:
+        raise SystemExit("spaCy model could not be loaded.")
+    ai_core.SPACY_BATCH_SIZE = args.batch_size
+    ai_core.SPACY_SEGMENT_CHARS = args.segment_chars
+    ai_core.SPACY_PARALLEL_MIN_CHARS = 0 # always honour SPACY_N_PROCESS
+
+    process_counts = sorted({1, *[n for n in (2, 4, 8, 16) if n <= args.max_processes], args.max_processes})
+    rows, reference = [], None
+    for n_process in process_counts:
+        ai_core.SPACY_N_PROCESS = n_process
+        start = time.perf_counter()
+        if args.ner:
+            cleaned = ai_core.clean_and_analyze_text_content(text, "benchmark")
+        else:
+            cleaned = ai_core.clean_and_normalize_text_content(text, "benchmark")
+        seconds = time.perf_counter() - start
+        reference = cleaned if reference is None else reference
+        rows.append((n_process, seconds, cleaned == reference))
+        print(f"n_process={n_process}: {seconds:.1f}s", flush=True)
+
+    lemma_text = reference[0] if args.ner else reference
+    print(f"\n{len(text):,} input chars -> {len(lemma_text):,} lemmatized chars "
+          f"(batch_size={args.batch_size}, segment_chars={args.segment_chars})")
+    print("n_process | seconds | chars/sec | speedup | identical to n_process=1")
+    baseline = rows[0][1]
+    for n_process, seconds, identical in rows:
+        print(f"{n_process:9d} | {seconds:7.1f} | {len(text) / seconds:9,.0f} | {baseline / seconds:6.2f}x | {identical}")
+    if not all(identical for _, _, identical in rows):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
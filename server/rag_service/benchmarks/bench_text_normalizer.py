@@ -0,0 +1,148 @@
+# server/rag_service/benchmarks/bench_text_normalizer.py
+"""
+Speed and golden-output parity of text_normalizer against the chain of re.sub calls it replaced in
+ai_core.clean_and_analyze_text_content and reconstruct_document_layout (kept below as reference_*).
+
+Parity is checked on GOLDEN_CASES (markup, URLs, e-mails, entities, hyphenation and whitespace
+edge cases, including constructs that overlap), on --fuzz random snippets, and on the corpus.
+Exits with status 1 on any difference.
+
+The corpus is a text file (e.g. text extracted from a textbook) repeated until it reaches --chars,
+or a synthetic corpus with a sprinkling of markup, URLs and hyphenated line breaks.
+
+    cd server/rag_service
+    python benchmarks/bench_text_normalizer.py --corpus extracted_textbook.txt --chars 5000000
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import statistics
+
+RAG_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAG_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, RAG_SERVICE_DIR)
+
+import text_normalizer
+
+
+def reference_clean_paragraphs(text):
+    text = re.sub(r'<script[^>]*>.*?</script>|<style[^>]*>.*?</style>', ' ', text, flags=re.I | re.S)
+    text = re.sub(r'<[^>]+>', ' ', text)
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\S*@\S*\s?', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\s*&\w+;\s*', ' ', text)
+    paragraphs = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = re.sub(r'[\n\r\t]+', ' ', paragraph)
+        paragraph = re.sub(r'\s+', ' ', paragraph).strip()
+        paragraph = re.sub(r'[^a-zA-Z0-9\s.,!?-]', '', paragraph).strip()
+        if paragraph:
+            paragraphs.append(paragraph)
+    return paragraphs
+
+
+def reference_layout(text):
+    text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', text)
+    return re.sub(r'\s{2,}', ' ', text).strip()
+
+
+def normalizer_layout(text):
+    return text_normalizer.collapse_whitespace(text_normalizer.join_hyphenated_line_breaks(text))
+
+
+GOLDEN_CASES = [
+    "",
+    "Plain text.\n\nSecond paragraph!",
+    "A <b>bold</b> claim <script type='x'>var a = 1 < 2;</script> after <STYLE>p {}</style> end",
+    "<a <script>x</script> b> tag around a script",
+    "if a < b and c > d then <i>x</i>",
+    "see http://example.com/<b>path</b> and www.site.org, https://x.y/z?q=1",
+    "xhttp://a@b glued url with an e-mail inside",
+    "mail me: first.last@uni.edu   now, or @handle, or trailing@",
+    "café &amp; crème &nbsp;  spaced &lt;entities&gt;; & alone",
+    "tabs\tand\r\nwindows\r\n\r\nline breaks   nbsp \x1c separators em",
+    "copyright © 2024 — all rights\n \n\t\nreserved €5",
+    "hyphen-\nated and chain-\n  ed-\nwords, not- here, under_score-\n\tnext",
+    "a-\nb-\nc-\nd",
+    "   leading and trailing   \n\n\n   ",
+    "table | row |\n| --- |\n\n\n[START OF TABLE 1]\n  spaced     out  ",
+]
+
+
+def _fuzz_cases(count, seed=13):
+    alphabet = ["a", "B", "word", "_", "é", " ", "  ", "\n", "\n\n", "\r", "\t", " ", "-", "<", ">",
+                "<b>", "<script>", "</script>", "<style x>", "</style>", "http", "https://x.y", "www", "@",
+                "a@b", "&amp;", "&", ";", ".", "!", "©", "3"]
+    rng = random.Random(seed)
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 60))) for _ in range(count)]
+
+
+def _synthetic_corpus(num_chars, seed=3):
+    words = ("the students reviewed recursion stacks and queues before the lecture on gradient descent "
+             "photosynthesis converts light into chemical energy equilibrium price compilers translate "
+             "syntax into semantics transactions keep the database index consistent").split()
+    extras = ["http://example.edu/notes", "prof@uni.edu", "&amp;", "<b>", "</b>", "©", "x < y", "hy-\nphen"]
+    rng = random.Random(seed)
+    paragraphs, total = [], 0
+    while total < num_chars:
+        tokens = [rng.choice(extras) if rng.random() < 0.01 else rng.choice(words)
+                  for _ in range(rng.randint(20, 200))]
+        lines = [" ".join(tokens[i:i + 12]) for i in range(0, len(tokens), 12)]
+        paragraphs.append("\n".join(lines) + ".")
+        total += len(paragraphs[-1]) + 2
+    return "\n\n".join(paragraphs)[:num_chars]
+
+
+def _file_corpus(path, num_chars):
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read()
+    repeats = max(1, -(-num_chars // max(1, len(text))))
+    return "\n\n".join([text] * repeats)[:num_chars]
+
+
+def _time(function, text, repeats):
+    seconds, result = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(text)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help="Text file to use (repeated up to --chars).")
+    parser.add_argument('--chars', type=int, default=5_000_000)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--fuzz', type=int, default=20000, help="Random snippets to compare (0 to skip).")
+    args = parser.parse_args()
+
+    mismatches = 0
+    for case in GOLDEN_CASES + _fuzz_cases(args.fuzz):
+        if text_normalizer.clean_paragraphs(case) != reference_clean_paragraphs(case) or \
+           normalizer_layout(case) != reference_layout(case):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH on {case!r}")
+    print(f"golden + fuzz cases: {len(GOLDEN_CASES) + args.fuzz}, mismatches: {mismatches}")
+
+    text = _file_corpus(args.corpus, args.chars) if args.corpus else _synthetic_corpus(args.chars)
+    print(f"\n{len(text):,} chars, median of {args.repeats}")
+    print("stage          | re.sub chain | text_normalizer | speedup | identical")
+    for stage, reference, normalizer in (("cleaning", reference_clean_paragraphs, text_normalizer.clean_paragraphs),
+                                         ("layout", reference_layout, normalizer_layout)):
+        reference_seconds, expected = _time(reference, text, args.repeats)
+        normalizer_seconds, actual = _time(normalizer, text, args.repeats)
+        identical = expected == actual
+        mismatches += not identical
+        print(f"{stage:14s} | {reference_seconds:11.3f}s | {normalizer_seconds:14.3f}s | "
+              f"{reference_seconds / normalizer_seconds:6.2f}x | {identical}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# server/rag_service/benchmarks/bench_text_splitter.py
+"""
+Throughput (MB/sec) of text_splitter.RecursiveTextSplitter against LangChain's
+RecursiveCharacterTextSplitter with ai_core's chunking settings, and a check that both produce
+the same chunks. LangChain is only needed for the comparison (pip install langchain-text-splitters);
+without it only the native splitter is timed.
+
+The corpus is a text file (e.g. text extracted from a textbook) repeated until it reaches --chars,
+or a synthetic corpus of paragraphs, lines and sentences when no file is given.
+
+    cd server/rag_service
+    python benchmarks/bench_text_splitter.py --corpus extracted_textbook.txt --chars 5000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+RAG_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAG_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, RAG_SERVICE_DIR)
+
+import config
+import text_splitter
+
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""] # as in ai_core.chunk_document_into_segments
+WORDS = ("the students reviewed recursion stacks and queues before the lecture on gradient descent while "
+         "photosynthesis converts light into chemical energy the market reached an equilibrium price "
+         "compilers translate syntax into semantics transactions keep the database index consistent").split()
+
+
+def _synthetic_corpus(num_chars: int, seed: int = 5) -> str:
+    rng = random.Random(seed)
+    paragraphs, total = [], 0
+    while total < num_chars:
+        lines = []
+        for _ in range(rng.randint(1, 6)):
+            sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30))).capitalize()
+                         for _ in range(rng.randint(1, 6))]
+            lines.append(". ".join(sentences) + ".")
+        if rng.random() < 0.02: # a long run without separators (tables, URLs, OCR noise)
+            lines.append("x" * rng.randint(600, 3000))
+        paragraphs.append("\n".join(lines))
+        total += len(paragraphs[-1]) + 2
+    return "\n\n".join(paragraphs)[:num_chars]
+
+
+def _file_corpus(path: str, num_chars: int) -> str:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read()
+    repeats = max(1, -(-num_chars // max(1, len(text))))
+    return "\n\n".join([text] * repeats)[:num_chars]
+
+
+def _time(split, text: str, repeats: int):
+    seconds, chunks = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = split(text)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds), chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help="Text file to use (repeated up to --chars).")
+    parser.add_argument('--chars', type=int, default=5_000_000)
+    parser.add_argument('--chunk-size', type=int, default=config.AI_CORE_CHUNK_SIZE)
+    parser.add_argument('--chunk-overlap', type=int, default=config.AI_CORE_CHUNK_OVERLAP)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    text = _file_corpus(args.corpus, args.chars) if args.corpus else _synthetic_corpus(args.chars)
+    megabytes = len(text.encode('utf-8')) / 1e6
+    native = text_splitter.RecursiveTextSplitter(args.chunk_size, args.chunk_overlap, SEPARATORS)
+    rows = [("native (offsets)", *_time(native.split_offsets, text, args.repeats)),
+            ("native (strings)", *_time(native.split_text, text, args.repeats))]
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        langchain = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                                                   length_function=len, separators=SEPARATORS, keep_separator=True)
+        rows.append(("langchain", *_time(langchain.split_text, text, args.repeats)))
+    except ImportError:
+        langchain = None
+        print("langchain-text-splitters not installed; timing the native splitter only.")
+
+    print(f"\n{megabytes:.1f} MB, chunk_size={args.chunk_size}, chunk_overlap={args.chunk_overlap}, "
+          f"median of {args.repeats}")
+    print("splitter          | seconds |   MB/sec | chunks")
+    for name, seconds, chunks in rows:
+        print(f"{name:17s} | {seconds:7.2f} | {megabytes / seconds:8.1f} | {len(chunks):,}")
+
+    if langchain is not None:
+        identical = rows[1][2] == rows[2][2]
+        print(f"\nspeedup (strings vs langchain): {rows[2][1] / rows[1][1]:.2f}x; identical chunks: {identical}")
+        if not identical:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -100,6 +100,8 @@ NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
 QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
 QDRANT_PORT = int(os.getenv("QDRANT_PORT", 7000))
 QDRANT_COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME", "my_qdrant_rag_collection")
+# One record per document (entities, parser metadata, ...); chunk payloads reference it by doc_id.
+QDRANT_DOCUMENTS_COLLECTION_NAME = os.getenv("QDRANT_DOCUMENTS_COLLECTION_NAME", f"{QDRANT_COLLECTION_NAME}_documents")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", None)
 QDRANT_URL = os.getenv("QDRANT_URL", None)
 
@@ -123,16 +125,174 @@ QUERY_VECTOR_DIMENSION = int(os.getenv("QUERY_VECTOR_DIMENSION", _MODEL_TO_DIM_M
 if QUERY_VECTOR_DIMENSION != QDRANT_COLLECTION_VECTOR_DIM:
     logger.warning(f"[Config Warning] Query vector dim ({QUERY_VECTOR_DIMENSION}) != Qdrant dim ({QDRANT_COLLECTION_VECTOR_DIM})")
 
+# --- Embedding Backend Configuration ---
+# 'torch' runs SentenceTransformer.encode in fp32; 'onnx' runs an int8-quantized ONNX export
+# through ONNX Runtime on CPU (see onnx_encoder.py; exported on first load if missing).
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', os.path.join(os.path.dirname(__file__), 'onnx_models'))
+ONNX_QUANTIZE = os.getenv('ONNX_QUANTIZE', 'true').lower() == 'true'
+# What produced a vector: the backend and, for ONNX, its precision (int8 and fp32 vectors differ slightly).
+# Part of every key or fingerprint that stands for an embedding.
+EMBEDDING_VARIANT = f"onnx-{'int8' if ONNX_QUANTIZE else 'fp32'}" if EMBEDDING_BACKEND == 'onnx' else EMBEDDING_BACKEND
+ONNX_INTRA_OP_THREADS = int(os.getenv('ONNX_INTRA_OP_THREADS', 0)) # 0 = let ONNX Runtime decide
+
+# --- Query Embedding Micro-batching ---
+# Concurrent /query calls wait up to QUERY_EMBED_MAX_WAIT_MS for others to join their batch,
+# then all of them are encoded in one forward pass (see embedding_batcher.py). A query with no other
+# one in flight (e.g. under `python app.py`, which is not threaded) is encoded at once, without waiting.
+QUERY_EMBED_BATCHING = os.getenv('QUERY_EMBED_BATCHING', 'true').lower() == 'true'
+QUERY_EMBED_MAX_BATCH_SIZE = int(os.getenv('QUERY_EMBED_MAX_BATCH_SIZE', 32))
+QUERY_EMBED_MAX_WAIT_MS = float(os.getenv('QUERY_EMBED_MAX_WAIT_MS', 5))
+
+# --- Query Embedding Cache ---
+# In-process LRU of query vectors, optionally backed by Redis (REDIS_URL, shared with the Node server).
+QUERY_EMBED_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_EMBED_CACHE_MAX_ENTRIES', 10000)) # 0 disables the cache
+QUERY_EMBED_CACHE_CASEFOLD = os.getenv('QUERY_EMBED_CACHE_CASEFOLD', 'false').lower() == 'true' # only for uncased models
+QUERY_EMBED_CACHE_SHARED = os.getenv('QUERY_EMBED_CACHE_SHARED', 'true').lower() == 'true'
+QUERY_EMBED_CACHE_REDIS_TTL = int(os.getenv('QUERY_EMBED_CACHE_REDIS_TTL', 7 * 24 * 3600))
+REDIS_URL = os.getenv('REDIS_URL', None)
+
+# --- Local Cache Storage ---
+CACHE_DIR = os.getenv('RAG_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'cache'))
+
+# --- Document Embedding Cache ---
+# Content-addressed chunk embeddings (float16, SQLite) reused across re-uploads and shared sections.
+EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', os.path.join(CACHE_DIR, 'embedding_cache.sqlite3'))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 200000)) # ~400 MB at 1024 dims
+
+# --- Document Embedding Batching ---
+# Chunks are sorted by token length and batched so that batch size x longest chunk (the padded
+# tensor) stays within EMBEDDING_BATCH_TOKEN_BUDGET tokens: long chunks go in small batches, short ones in large.
+EMBEDDING_TOKEN_BATCHING = os.getenv('EMBEDDING_TOKEN_BATCHING', 'true').lower() == 'true'
+EMBEDDING_BATCH_TOKEN_BUDGET = int(os.getenv('EMBEDDING_BATCH_TOKEN_BUDGET', 8192))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv('EMBEDDING_MAX_BATCH_SIZE', 128))
+
+# --- Multi-process Embedding Pool ---
+# Each ingestion worker can own EMBEDDING_POOL_WORKERS encoder processes (each loads its own copy of the
+# document model) with EMBEDDING_POOL_THREADS_PER_WORKER threads each (0 = cpu_count divided by
+# EMBEDDING_POOL_WORKERS * INGESTION_WORKERS). Used for documents with at least EMBEDDING_POOL_MIN_CHUNKS chunks.
+EMBEDDING_POOL_WORKERS = int(os.getenv('EMBEDDING_POOL_WORKERS', 0)) # 0 = embed in the worker process itself
+EMBEDDING_POOL_THREADS_PER_WORKER = int(os.getenv('EMBEDDING_POOL_THREADS_PER_WORKER', 0))
+EMBEDDING_POOL_MIN_CHUNKS = int(os.getenv('EMBEDDING_POOL_MIN_CHUNKS', 256))
+
+# --- Pipelined Embed / Upsert ---
+# Ingestion embeds INGESTION_PIPELINE_BATCH_CHUNKS chunks at a time and upserts each batch while the next
+# one embeds; at most INGESTION_PIPELINE_QUEUE_SIZE embedded batches wait for Qdrant. Keep the batch at or
+# above EMBEDDING_POOL_MIN_CHUNKS when the embedding pool is on, or batches will not reach the pool.
+# With EMBEDDING_TOKEN_BATCHING, batches are cut from the document's chunks ordered by length, so the
+# token-budget batches inside each one stay tight. Streamed documents are ordered per page window only.
+INGESTION_PIPELINE_BATCH_CHUNKS = int(os.getenv('INGESTION_PIPELINE_BATCH_CHUNKS', 256)) # 0 = embed everything, then upsert
+INGESTION_PIPELINE_QUEUE_SIZE = int(os.getenv('INGESTION_PIPELINE_QUEUE_SIZE', 2))
+
+# --- /query Retrieval Result Cache ---
+# Per-worker LRU of /query responses; keys include per-document version counters (shared via SQLite)
+# that document/KG writes bump, so stale context is never served.
+RETRIEVAL_CACHE_ENABLED = os.getenv('RETRIEVAL_CACHE_ENABLED', 'true').lower() == 'true'
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv('RETRIEVAL_CACHE_MAX_ENTRIES', 2048))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv('RETRIEVAL_CACHE_TTL_SECONDS', 600))
+RETRIEVAL_CACHE_VERSION_DB = os.getenv('RETRIEVAL_CACHE_VERSION_DB', os.path.join(CACHE_DIR, 'document_versions.sqlite3'))
+
+# --- Asynchronous Ingestion Jobs ---
+# POST /jobs/add_document queues work in SQLite; INGESTION_WORKERS processes drain it (see ingestion_jobs.py).
+INGESTION_WORKERS = int(os.getenv('INGESTION_WORKERS', 1)) # 0 = don't start a pool with the API
+INGESTION_JOB_DB = os.getenv('INGESTION_JOB_DB', os.path.join(CACHE_DIR, 'ingestion_jobs.sqlite3'))
+INGESTION_JOB_POLL_SECONDS = float(os.getenv('INGESTION_JOB_POLL_SECONDS', 1.0))
+INGESTION_JOB_HEARTBEAT_SECONDS = float(os.getenv('INGESTION_JOB_HEARTBEAT_SECONDS', 10))
+INGESTION_JOB_STALE_SECONDS = float(os.getenv('INGESTION_JOB_STALE_SECONDS', 120)) # no heartbeat for this long = worker died
+INGESTION_JOB_MAX_ATTEMPTS = int(os.getenv('INGESTION_JOB_MAX_ATTEMPTS', 2))
+
+# --- Content-Addressed Ingestion Store ---
+# Processed chunks, embeddings and analysis text keyed by sha256(file) + pipeline settings, so duplicate
+# uploads skip parse/OCR/NER/chunk/embed. Bump INGESTION_PIPELINE_VERSION when ai_core output changes.
+INGESTION_STORE_ENABLED = os.getenv('INGESTION_STORE_ENABLED', 'true').lower() == 'true'
+INGESTION_STORE_PATH = os.getenv('INGESTION_STORE_PATH', os.path.join(CACHE_DIR, 'ingestion_store.sqlite3'))
+INGESTION_STORE_MAX_DOCUMENTS = int(os.getenv('INGESTION_STORE_MAX_DOCUMENTS', 2000))
+INGESTION_PIPELINE_VERSION = os.getenv('INGESTION_PIPELINE_VERSION', '6') # 2: chunk_fingerprint; 3: segmented spaCy; 4: fused lemma+NER; 5: compact payloads; 6: chunk offsets
+
+# --- PDF Extraction ---
+# PDFs with at least PDF_PARALLEL_MIN_PAGES pages are split into contiguous ranges of up to PDF_RANGE_PAGES
+# pages and extracted by PDF_EXTRACTION_WORKERS processes (0 = one per CPU core, 1 = serial), with at most
+# PDF_RANGES_IN_FLIGHT_PER_WORKER ranges per process submitted or waiting to be consumed at a time.
+PDF_EXTRACTION_WORKERS = int(os.getenv('PDF_EXTRACTION_WORKERS', 4))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 24))
+PDF_RANGE_PAGES = int(os.getenv('PDF_RANGE_PAGES', 16))
+PDF_RANGES_IN_FLIGHT_PER_WORKER = int(os.getenv('PDF_RANGES_IN_FLIGHT_PER_WORKER', 2))
+
+# --- Streaming Ingestion ---
+# Process PDFs/PPTX STREAMING_PAGE_WINDOW pages at a time (OCR -> clean -> chunk -> embed -> upsert),
+# bounding peak memory by the window instead of the document. Requests can also ask for it with "streaming": true.
+STREAMING_INGESTION = os.getenv('STREAMING_INGESTION', 'false').lower() == 'true'
+STREAMING_PAGE_WINDOW = int(os.getenv('STREAMING_PAGE_WINDOW', 8))
+
+# --- OCR ---
+# perform_ocr_on_images OCRs images in a pool of OCR_WORKERS processes (0 = one per CPU core);
+# tesseract is killed if a single image takes longer than OCR_IMAGE_TIMEOUT_SECONDS.
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', 4))
+OCR_IMAGE_TIMEOUT_SECONDS = float(os.getenv('OCR_IMAGE_TIMEOUT_SECONDS', 120))
+# 'pytesseract' spawns the tesseract binary per image; 'tesserocr' keeps an in-process API handle per worker
+# and is installed separately: pip install -r requirements-tesserocr.txt
+OCR_BACKEND = os.getenv('OCR_BACKEND', 'pytesseract').lower()
+OCR_LANGUAGE = os.getenv('OCR_LANGUAGE', 'eng') # used by the tesserocr backend
+TESSDATA_PATH = os.getenv('TESSDATA_PATH', None) # tessdata dir for tesserocr; None = its compiled-in default
+
 # --- AI Core & Search Configuration ---
 AI_CORE_CHUNK_SIZE = int(os.getenv("AI_CORE_CHUNK_SIZE", 512))
 AI_CORE_CHUNK_OVERLAP = int(os.getenv("AI_CORE_CHUNK_OVERLAP", 100))
+# 'chars' sizes chunks with AI_CORE_CHUNK_SIZE/OVERLAP in characters; 'tokens' with AI_CORE_CHUNK_TOKENS/
+# OVERLAP_TOKENS counted by the document embedding model's tokenizer (mxbai-embed-large truncates at 512,
+# special tokens included, so the default leaves a small margin).
+AI_CORE_CHUNK_UNIT = os.getenv("AI_CORE_CHUNK_UNIT", "chars").lower()
+AI_CORE_CHUNK_TOKENS = int(os.getenv("AI_CORE_CHUNK_TOKENS", 500))
+AI_CORE_CHUNK_OVERLAP_TOKENS = int(os.getenv("AI_CORE_CHUNK_OVERLAP_TOKENS", 64))
 MAX_TEXT_LENGTH_FOR_NER = int(os.getenv("MAX_TEXT_LENGTH_FOR_NER", 500000))
+# Cleaning lemmatizes paragraphs packed into SPACY_SEGMENT_CHARS segments via nlp.pipe; texts of at least
+# SPACY_PARALLEL_MIN_CHARS use SPACY_N_PROCESS processes (each loads its own copy of the spaCy model).
+SPACY_SEGMENT_CHARS = int(os.getenv("SPACY_SEGMENT_CHARS", 20000))
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", 16))
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", 1))
+SPACY_PARALLEL_MIN_CHARS = int(os.getenv("SPACY_PARALLEL_MIN_CHARS", 200000))
 QDRANT_DEFAULT_SEARCH_K = int(os.getenv("QDRANT_DEFAULT_SEARCH_K", 5))
 QDRANT_SEARCH_MIN_RELEVANCE_SCORE = float(os.getenv("QDRANT_SEARCH_MIN_RELEVANCE_SCORE", 0.1))
 
 # --- SpaCy Configuration ---
 SPACY_MODEL_NAME = os.getenv('SPACY_MODEL_NAME', 'en_core_web_sm')
 
+# --- Whisper Configuration ---
+WHISPER_MODEL_NAME = os.getenv('WHISPER_MODEL_NAME', 'base')
+
+# --- Serving Configuration (gunicorn pre-fork mode, see gunicorn.conf.py) ---
+# RAG_SERVICE_ROLE decides which endpoints this deployment serves:
+#   'all'       - every endpoint (default, same as `python app.py`)
+#   'query'     - retrieval and lightweight endpoints; ingestion endpoints answer 421
+#   'ingestion' - only the document/media ingestion endpoints (plus probes and metrics)
+RAG_SERVICE_ROLE = os.getenv('RAG_SERVICE_ROLE', 'all').lower()
+RAG_WORKERS = int(os.getenv('RAG_WORKERS', 2))
+RAG_WORKER_THREADS = int(os.getenv('RAG_WORKER_THREADS', 4))
+RAG_WORKER_TIMEOUT = int(os.getenv('RAG_WORKER_TIMEOUT', 900 if RAG_SERVICE_ROLE != 'query' else 120))
+RAG_GRACEFUL_TIMEOUT = int(os.getenv('RAG_GRACEFUL_TIMEOUT', 60))
+RAG_MAX_REQUESTS = int(os.getenv('RAG_MAX_REQUESTS', 0)) # 0 disables periodic worker recycling
+# Intra-op threads per worker for torch; defaults to an even share of the machine's cores.
+TORCH_THREADS_PER_WORKER = int(os.getenv('TORCH_THREADS_PER_WORKER', max(1, (os.cpu_count() or 1) // max(1, RAG_WORKERS))))
+
+# --- Model Registry Configuration ---
+# Models are loaded lazily on first use (see model_registry.py). List the ones this
+# deployment should load at startup instead, e.g. "embedding" for a query-only pod or
+# "spacy,embedding,whisper" for an ingestion pod. Known names: spacy, embedding, whisper, tts.
+# When unset, query and ingestion roles preload the models their endpoints need.
+_ROLE_DEFAULT_PRELOAD = {'query': 'embedding', 'ingestion': 'spacy,embedding'}
+PRELOAD_MODELS = [m.strip() for m in os.getenv('PRELOAD_MODELS', _ROLE_DEFAULT_PRELOAD.get(RAG_SERVICE_ROLE, '')).split(',') if m.strip()]
+# A model that failed to load (download error, brief OOM) is tried again after MODEL_LOAD_RETRY_SECONDS,
+# doubling with each further failure up to MODEL_LOAD_RETRY_MAX_SECONDS.
+MODEL_LOAD_RETRY_SECONDS = float(os.getenv('MODEL_LOAD_RETRY_SECONDS', 30))
+MODEL_LOAD_RETRY_MAX_SECONDS = float(os.getenv('MODEL_LOAD_RETRY_MAX_SECONDS', 600))
+
+# --- Warm-up & Readiness Configuration ---
+# WARMUP_MODE: 'background' (load + dummy inference in a thread after startup), 'blocking', or 'off'.
+WARMUP_MODE = os.getenv('WARMUP_MODE', 'background').lower()
+# Models that must be loaded and warmed before /ready reports 200. Defaults to the preloaded models.
+READINESS_MODELS = [m.strip() for m in os.getenv('READINESS_MODELS', ','.join(PRELOAD_MODELS)).split(',') if m.strip()]
+
 # --- API Port Configuration ---
 API_PORT = int(os.getenv('API_PORT', 2001))
 
@@ -184,17 +344,30 @@ try:
     if TESSERACT_CMD: pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
 except ImportError: PYTESSERACT_AVAILABLE, pytesseract, TESSERACT_ERROR = False, None, Exception
 
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError: TESSEROCR_AVAILABLE, tesserocr = False, None
+OCR_AVAILABLE = TESSEROCR_AVAILABLE if OCR_BACKEND == 'tesserocr' else PYTESSERACT_AVAILABLE
+
 try:
     import PyPDF2
     PYPDF2_AVAILABLE = True
 except ImportError: PYPDF2_AVAILABLE, PyPDF2 = False, None
 
-try:
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-    LANGCHAIN_SPLITTER_AVAILABLE = True
-except ImportError: LANGCHAIN_SPLITTER_AVAILABLE, RecursiveCharacterTextSplitter = False, None
 
 
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE, onnxruntime = False, None
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE, redis = False, None
 
 try:
     import yt_dlp
@@ -225,32 +398,3 @@ try:
     FFMPEG_PYTHON_AVAILABLE = True
 except ImportError:
     FFMPEG_PYTHON_AVAILABLE, ffmpeg = False, None
-
-
-    
-# ─── Optional: Preload SpaCy & Embedding Model ───────
-nlp_spacy_core, SPACY_MODEL_LOADED = None, False
-try:
-    import spacy
-    nlp_spacy_core = spacy.load(SPACY_MODEL_NAME)
-    SPACY_MODEL_LOADED = True
-except Exception as e:
-    logger.warning(f"Failed to load SpaCy model '{SPACY_MODEL_NAME}': {e}")
-
-document_embedding_model, EMBEDDING_MODEL_LOADED = None, False
-try:
-    from sentence_transformers import SentenceTransformer
-    document_embedding_model = SentenceTransformer(DOCUMENT_EMBEDDING_MODEL_NAME)
-    EMBEDDING_MODEL_LOADED = True
-except Exception as e:
-    logger.warning(f"Failed to load Sentence Transformer model '{DOCUMENT_EMBEDDING_MODEL_NAME}': {e}")
-
-whisper_model, WHISPER_MODEL_LOADED = None, False
-try:
-    import whisper
-    # Using 'base' model is a good balance. Could be configured via .env in the future.
-    whisper_model = whisper.load_model("base")
-    WHISPER_MODEL_LOADED = True
-    logger.info("Successfully pre-loaded Whisper 'base' model.")
-except Exception as e:
-    logger.warning(f"Failed to pre-load Whisper model: {e}. Transcription will fail.")
\ No newline at end of file
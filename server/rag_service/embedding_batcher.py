@@ -0,0 +1,126 @@
+# server/rag_service/embedding_batcher.py
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, List, Optional, Tuple
+
+from prometheus_client import Histogram
+
+import config
+
+logger = logging.getLogger(__name__)
+
+QUERY_EMBED_QUEUE_WAIT_SECONDS = Histogram(
+    'rag_query_embedding_queue_wait_seconds',
+    'Time a query spent waiting in the embedding batcher before its batch was encoded.',
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+QUERY_EMBED_BATCH_SIZE = Histogram(
+    'rag_query_embedding_batch_size',
+    'Number of queries encoded together in one forward pass.',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+# (query text, future for the caller, enqueue timestamp)
+_PendingQuery = Tuple[str, Future, float]
+
+
+class QueryEmbeddingBatcher:
+    """
+    Collects concurrent single-query encode calls for up to max_wait_ms (or until max_batch_size
+    queries are waiting) and encodes them in one forward pass. Each caller gets back its own vector.
+    A query with no other query in flight (always the case under a non-threaded server) is encoded
+    right away on the caller's thread, and a batch is dispatched as soon as every query in flight has joined it.
+    """
+
+    def __init__(self, encoder: Any, max_batch_size: int = 32, max_wait_ms: float = 5.0, enabled: bool = True):
+        self.encoder = encoder
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max(0.0, max_wait_ms) / 1000.0
+        self.enabled = enabled and self.max_batch_size > 1
+        self._start_lock = threading.Lock()
+        self._queue: Optional["queue.Queue[_PendingQuery]"] = None
+        self._worker: Optional[threading.Thread] = None
+        self._owner_pid: Optional[int] = None
+        self._in_flight = 0 # encode() calls that have not returned yet
+        self._direct = 0 # of those, the ones encoding on their own thread (they never join a batch)
+        self._in_flight_lock = threading.Lock()
+
+    def _ensure_worker(self) -> "queue.Queue[_PendingQuery]":
+        # Threads don't survive fork, so a pre-forked worker starts its own batcher thread on first use.
+        if self._owner_pid == os.getpid() and self._worker is not None and self._worker.is_alive():
+            return self._queue
+        with self._start_lock:
+            if self._owner_pid != os.getpid() or self._worker is None or not self._worker.is_alive():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, args=(self._queue,),
+                                                name="query-embedding-batcher", daemon=True)
+                self._owner_pid = os.getpid()
+                self._worker.start()
+                logger.info(f"Query embedding batcher started (max batch {self.max_batch_size}, "
+                            f"max wait {self.max_wait_seconds * 1000:.1f} ms).")
+        return self._queue
+
+    def encode(self, text: str):
+        """Encodes one query. Blocks until the batch containing it has been encoded."""
+        if not self.enabled:
+            return self.encoder.encode(text)
+        with self._in_flight_lock:
+            self._in_flight += 1
+            alone = self._in_flight == 1
+            self._direct += alone
+        try:
+            if alone: # nobody to batch with: skip the wait and the hop to the batcher thread
+                QUERY_EMBED_QUEUE_WAIT_SECONDS.observe(0.0)
+                QUERY_EMBED_BATCH_SIZE.observe(1)
+                return self.encoder.encode(text)
+            pending_queue = self._ensure_worker()
+            future: Future = Future()
+            pending_queue.put((text, future, time.perf_counter()))
+            return future.result()
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+                self._direct -= alone
+
+    def _collect_batch(self, pending_queue: "queue.Queue[_PendingQuery]") -> List[_PendingQuery]:
+        batch = [pending_queue.get()]
+        deadline = time.perf_counter() + self.max_wait_seconds
+        # Stop early once every query in flight is in the batch: nobody else is coming.
+        while len(batch) < self.max_batch_size and len(batch) < self._in_flight - self._direct:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(pending_queue.get(timeout=remaining) if remaining > 0 else pending_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, pending_queue: "queue.Queue[_PendingQuery]") -> None:
+        while True:
+            batch = self._collect_batch(pending_queue)
+            dispatched_at = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                QUERY_EMBED_QUEUE_WAIT_SECONDS.observe(dispatched_at - enqueued_at)
+            QUERY_EMBED_BATCH_SIZE.observe(len(batch))
+
+            try:
+                vectors = self.encoder.encode([text for text, _, _ in batch], batch_size=len(batch))
+            except Exception as e:
+                logger.error(f"Query embedding batcher: encode failed for a batch of {len(batch)}: {e}", exc_info=True)
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+
+def create_query_batcher(encoder: Any) -> QueryEmbeddingBatcher:
+    return QueryEmbeddingBatcher(
+        encoder,
+        max_batch_size=config.QUERY_EMBED_MAX_BATCH_SIZE,
+        max_wait_ms=config.QUERY_EMBED_MAX_WAIT_MS,
+        enabled=config.QUERY_EMBED_BATCHING,
+    )
@@ -0,0 +1,171 @@
+# server/rag_service/embedding_cache.py
+"""
+Disk-backed, content-addressed cache of document chunk embeddings.
+
+Entries are keyed by sha256(model name | EMBEDDING_VARIANT | whitespace-normalized chunk text) and stored
+as float16 blobs in a SQLite database (WAL mode, so several worker processes can share it).
+When the table grows past EMBEDDING_CACHE_MAX_ENTRIES the least recently used entries are evicted.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from prometheus_client import Counter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_HITS = Counter('rag_embedding_cache_hits_total', 'Chunk embeddings served from the embedding cache.')
+EMBEDDING_CACHE_MISSES = Counter('rag_embedding_cache_misses_total', 'Chunk embeddings that had to be computed.')
+EMBEDDING_CACHE_EVICTIONS = Counter('rag_embedding_cache_evictions_total', 'Entries evicted from the embedding cache.')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access);
+"""
+
+# SQLite's default limit on bound parameters is 999 on older builds.
+_SQL_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    # Backend and precision are part of the key: int8 ONNX vectors are close to, but not the same as, fp32 ones.
+    material = f"{model_name}|{config.EMBEDDING_VARIANT}|{normalize_text(text)}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, db_path: str, max_entries: int):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock() # hits/misses are updated from ingestion threads and pipeline stages
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread (and per process: connections must not cross a fork).
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Returns one float32 vector (or None on a miss) per text, in order."""
+        keys = [cache_key(model_name, t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        conn = self._connection()
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), _SQL_BATCH):
+            batch = unique_keys[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(f"SELECT key, dim, vector FROM embeddings WHERE key IN ({placeholders})", batch).fetchall()
+            for key, dim, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float16)
+                if vector.shape[0] == dim:
+                    found[key] = vector.astype(np.float32)
+
+        if found:
+            now = time.time()
+            hit_keys = list(found)
+            with self._write_lock, conn:
+                for start in range(0, len(hit_keys), _SQL_BATCH):
+                    batch = hit_keys[start:start + _SQL_BATCH]
+                    conn.execute(f"UPDATE embeddings SET last_access = ? WHERE key IN ({','.join('?' * len(batch))})",
+                                 [now, *batch])
+
+        results = [found.get(k) for k in keys]
+        n_hits = sum(1 for r in results if r is not None)
+        with self._stats_lock:
+            self.hits += n_hits
+            self.misses += len(results) - n_hits
+        EMBEDDING_CACHE_HITS.inc(n_hits)
+        EMBEDDING_CACHE_MISSES.inc(len(results) - n_hits)
+        return results
+
+    def put_many(self, model_name: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            vector_f16 = np.asarray(vector, dtype=np.float16)
+            rows.append((cache_key(model_name, text), model_name, int(vector_f16.shape[0]), vector_f16.tobytes(), now))
+        if not rows:
+            return
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings (key, model, dim, vector, last_access) "
+                             "VALUES (?, ?, ?, ?, ?)", rows)
+        self._trim(conn)
+
+    def _trim(self, conn: sqlite3.Connection) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._write_lock, conn:
+            count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow <= 0:
+                return
+            # Evict a little extra so we don't trim on every insert once the cache is full.
+            to_evict = overflow + max(1, self.max_entries // 20)
+            conn.execute("DELETE FROM embeddings WHERE key IN "
+                         "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)", (to_evict,))
+        EMBEDDING_CACHE_EVICTIONS.inc(to_evict)
+        logger.info(f"Embedding cache: evicted {to_evict} least recently used entries (limit {self.max_entries}).")
+
+    def stats(self) -> Dict[str, float]:
+        entries = self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': (hits / lookups) if lookups else 0.0,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """The process-wide cache, or None when EMBEDDING_CACHE_ENABLED is off or the DB can't be opened."""
+    global _cache
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = EmbeddingCache(config.EMBEDDING_CACHE_PATH, config.EMBEDDING_CACHE_MAX_ENTRIES)
+                    logger.info(f"Embedding cache opened at {config.EMBEDDING_CACHE_PATH} "
+                                f"(max {config.EMBEDDING_CACHE_MAX_ENTRIES} entries).")
+                except sqlite3.Error as e:
+                    logger.error(f"Embedding cache unavailable ({config.EMBEDDING_CACHE_PATH}): {e}")
+                    return None
+    return _cache
@@ -0,0 +1,136 @@
+# server/rag_service/embedding_pool.py
+"""
+Multi-process document embedding for large documents, owned by an ingestion worker process.
+
+One encode() call runs in one process and tops out at that process's intra-op threads. The pool
+starts EMBEDDING_POOL_WORKERS processes (spawn: torch and OpenMP state must not be forked), each
+with its own copy of the document embedding model and a fixed thread count
+(EMBEDDING_POOL_THREADS_PER_WORKER, default cpu_count // all pool processes on the host), so N workers use N disjoint
+slices of the cores instead of N x all cores. Batches (planned by
+embedding_service.token_budget_batches) are handed out to whichever worker is free and the
+vectors are put back in input order.
+
+ingestion_jobs.ingestion_worker_main starts the pool when EMBEDDING_POOL_WORKERS > 0 and stops it
+on exit; ai_core.generate_segment_embeddings uses it for at least EMBEDDING_POOL_MIN_CHUNKS chunks.
+Like sentence-transformers' start_multi_process_pool, but sharded by batch and restarted if a
+worker dies.
+"""
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, List, Optional
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_worker_model: Any = None
+
+
+def _init_pool_worker(model_name: str, num_threads: int) -> None:
+    global _worker_model
+    for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[variable] = str(num_threads)
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false' # one batch at a time per process; no tokenizer threads
+    config.ONNX_INTRA_OP_THREADS = num_threads # read by onnx_encoder.load_onnx_encoder
+    if config.EMBEDDING_BACKEND != 'onnx':
+        import torch
+        torch.set_num_threads(num_threads)
+    import model_registry
+    _worker_model = model_registry.load_embedding_model(model_name)
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False), dtype=np.float32)
+
+
+class EmbeddingPool:
+    def __init__(self, model_name: str, num_workers: int, threads_per_worker: int):
+        self.model_name = model_name
+        self.num_workers = max(1, num_workers)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.num_workers, initializer=_init_pool_worker,
+                                                     initargs=(self.model_name, self.threads_per_worker),
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def start(self) -> None:
+        """Starts the worker processes and loads the model in each (otherwise done by the first encode)."""
+        executor = self._get_executor()
+        for future in [executor.submit(_encode_batch, ["warm-up"]) for _ in range(self.num_workers)]:
+            future.result()
+        logger.info(f"Embedding pool: {self.num_workers} process(es) x {self.threads_per_worker} thread(s) "
+                    f"loaded {self.model_name}.")
+
+    def encode(self, texts: List[str], batches: List[List[int]]) -> np.ndarray:
+        """Encodes texts in the given batches (lists of indices into texts) across the pool; rows follow texts."""
+        start = time.perf_counter()
+        executor = self._get_executor()
+        futures = [executor.submit(_encode_batch, [texts[i] for i in batch]) for batch in batches]
+        embeddings: Optional[np.ndarray] = None
+        try:
+            for batch, future in zip(batches, futures):
+                vectors = future.result()
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                embeddings[batch] = vectors
+        except BrokenProcessPool:
+            logger.error("Embedding pool: a worker process died; the pool will be restarted for the next document.")
+            self.close(wait=False)
+            raise
+        elapsed = time.perf_counter() - start
+        logger.info(f"Embedding pool: {len(texts)} texts in {len(batches)} batches in {elapsed:.1f}s "
+                    f"({len(texts) / elapsed if elapsed else 0:.1f} texts/sec, {self.num_workers} process(es)).")
+        return embeddings
+
+    def close(self, wait: bool = True) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+
+_pool: Optional[EmbeddingPool] = None
+
+
+def start_embedding_pool() -> Optional[EmbeddingPool]:
+    """Called by the process that owns the pool (an ingestion worker); no-op when EMBEDDING_POOL_WORKERS <= 0."""
+    global _pool
+    if config.EMBEDDING_POOL_WORKERS <= 0 or _pool is not None:
+        return _pool
+    # Default: split the cores between every pool process of every ingestion worker on this host.
+    processes = config.EMBEDDING_POOL_WORKERS * max(1, config.INGESTION_WORKERS)
+    threads = config.EMBEDDING_POOL_THREADS_PER_WORKER or max(1, (os.cpu_count() or 1) // processes)
+    pool = EmbeddingPool(config.DOCUMENT_EMBEDDING_MODEL_NAME, config.EMBEDDING_POOL_WORKERS, threads)
+    try:
+        pool.start()
+    except Exception as e:
+        logger.error(f"Embedding pool could not start; embedding in-process instead: {e}", exc_info=True)
+        pool.close(wait=False)
+        return None
+    _pool = pool
+    return _pool
+
+
+def get_embedding_pool() -> Optional[EmbeddingPool]:
+    """The pool started in this process, or None (API processes never start one)."""
+    return _pool
+
+
+def stop_embedding_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
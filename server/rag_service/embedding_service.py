@@ -0,0 +1,142 @@
+# server/rag_service/embedding_service.py
+import copy
+import logging
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+import config
+import model_registry
+
+logger = logging.getLogger(__name__)
+
+
+class SharedEncoder:
+    """
+    Process-wide handle for one embedding model. Every caller that asks for the same model name
+    gets the same handle, so ai_core (documents) and VectorDBService (queries) share one set of weights.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.registry_key = model_registry.embedding_model_key(model_name)
+        model_registry.register_model(
+            self.registry_key,
+            lambda: model_registry.load_embedding_model(model_name)
+        )
+        # Serializes forward passes so concurrent request threads don't fight over the intra-op thread pool.
+        self._encode_lock = threading.Lock()
+        self._thread_tokenizers = threading.local()
+
+    def _get_model(self) -> Optional[Any]:
+        return model_registry.get_model(self.registry_key)
+
+    def is_available(self) -> bool:
+        return self._get_model() is not None
+
+    def get_sentence_embedding_dimension(self) -> Optional[int]:
+        model = self._get_model()
+        return model.get_sentence_embedding_dimension() if model is not None else None
+
+    def get_tokenizer(self) -> Optional[Any]:
+        """
+        This thread's copy of the model's (Hugging Face) tokenizer, loading the model if needed; None
+        if unavailable. A fast tokenizer keeps its truncation/padding settings on the shared Rust object
+        and raises "Already borrowed" when two threads call it at once, and encode() uses the model's
+        own tokenizer under _encode_lock, so callers outside the lock tokenize with a private copy.
+        """
+        model = self._get_model()
+        tokenizer = getattr(model, 'tokenizer', None) if model is not None else None
+        if tokenizer is None:
+            return None
+        local = self._thread_tokenizers
+        if getattr(local, 'source', None) is not tokenizer: # first use in this thread, or the model was reloaded
+            with self._encode_lock: # the original is only used under the lock; don't copy it mid-call
+                local.tokenizer = copy.deepcopy(tokenizer)
+            local.source = tokenizer
+        return local.tokenizer
+
+    def encode(self, texts: Union[str, List[str]], **encode_kwargs):
+        """Same contract as SentenceTransformer.encode: a str returns one vector, a list returns a 2-D array."""
+        model = self._get_model()
+        if model is None:
+            raise RuntimeError(f"Embedding model '{self.model_name}' is not available.")
+        with self._encode_lock:
+            return model.encode(texts, **encode_kwargs)
+
+    def token_lengths(self, texts: Sequence[str]) -> Optional[List[int]]:
+        """Tokens per text as the model sees them (special tokens included, capped at max_seq_length); None without a fast tokenizer."""
+        model = self._get_model()
+        tokenizer = self.get_tokenizer() # this thread's copy: truncation=True would otherwise race encode()
+        if not getattr(tokenizer, 'is_fast', False):
+            return None
+        encoded = tokenizer(list(texts), truncation=True, max_length=getattr(model, 'max_seq_length', None) or 512,
+                            return_attention_mask=False, return_token_type_ids=False)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def encode_in_token_batches(self, texts: List[str], token_budget: int, max_batch_size: int,
+                                pool: Optional[Any] = None, **encode_kwargs) -> np.ndarray:
+        """
+        Like encode(texts), with batches planned by token_budget_batches: texts of similar token
+        length go together and short texts fill large batches, so little compute goes to padding.
+        With pool (an embedding_pool.EmbeddingPool) the batches are spread over its processes.
+        Returns vectors in the order of texts. Falls back to encode() without a fast tokenizer.
+        """
+        lengths = self.token_lengths(texts) if texts else None
+        if lengths is None:
+            return self.encode(texts, **encode_kwargs)
+        batches = token_budget_batches(lengths, token_budget, max_batch_size)
+        if pool is not None:
+            try:
+                return pool.encode(texts, batches)
+            except BrokenProcessPool:
+                logger.warning(f"Embedding pool failed; encoding {len(texts)} texts in-process instead.")
+        embeddings: Optional[np.ndarray] = None
+        for batch in batches:
+            vectors = self.encode([texts[i] for i in batch], batch_size=len(batch), **encode_kwargs)
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype=vectors.dtype)
+            embeddings[batch] = vectors
+        return embeddings
+
+
+def token_budget_batches(lengths: Sequence[int], token_budget: int, max_batch_size: int) -> List[List[int]]:
+    """
+    Groups text indices into batches, longest texts first, so that each batch's padded size
+    (number of texts x its longest text) stays within token_budget and holds at most
+    max_batch_size texts. A single text longer than the budget gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for index in order:
+        # Sorted longest first, so current[0] sets the padded length of the batch.
+        if current and (len(current) >= max_batch_size or (len(current) + 1) * lengths[current[0]] > token_budget):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+_encoders: Dict[str, SharedEncoder] = {}
+_encoders_lock = threading.Lock()
+
+def get_encoder(model_name: str) -> SharedEncoder:
+    """Returns the shared encoder for model_name, creating the handle (not the model) on first call."""
+    encoder = _encoders.get(model_name)
+    if encoder is not None:
+        return encoder
+    with _encoders_lock:
+        if model_name not in _encoders:
+            _encoders[model_name] = SharedEncoder(model_name)
+        return _encoders[model_name]
+
+def get_document_encoder() -> SharedEncoder:
+    return get_encoder(config.DOCUMENT_EMBEDDING_MODEL_NAME)
+
+def get_query_encoder() -> SharedEncoder:
+    return get_encoder(config.QUERY_EMBEDDING_MODEL_NAME)
@@ -0,0 +1,88 @@
+# server/rag_service/gunicorn.conf.py
+#
+# Production serving mode for the RAG service: N pre-forked worker processes.
+#
+#   cd server/rag_service
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# The app (and the models in PRELOAD_MODELS) is loaded once in the master process and then
+# forked, so model weights are shared copy-on-write between workers. Each worker then warms
+# its models in the background and reports /ready once done.
+#
+# Roles: run one gunicorn per role on different ports, e.g.
+#   RAG_SERVICE_ROLE=query     RAG_WORKERS=8 API_PORT=2001 gunicorn -c gunicorn.conf.py app:app
+#   RAG_SERVICE_ROLE=ingestion RAG_WORKERS=2 API_PORT=2002 gunicorn -c gunicorn.conf.py app:app
+#
+# Graceful reload: `kill -HUP <master pid>` starts fresh workers and lets the old ones finish
+# their in-flight requests (up to RAG_GRACEFUL_TIMEOUT). Because the app is preloaded, code
+# changes need `kill -USR2 <master pid>` (new master) followed by `kill -QUIT <old master pid>`.
+#
+# Metrics: set PROMETHEUS_MULTIPROC_DIR to an empty, writable directory so /metrics aggregates
+# every worker instead of reporting whichever worker happened to answer.
+import os
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+# The master only loads weights (see when_ready); inference-based warm-up happens per worker
+# after fork, because running torch/OpenMP kernels before fork can deadlock the children.
+# Must be set before config is imported, since config reads it once.
+os.environ["WARMUP_MODE"] = "off"
+
+import config
+
+bind = f"0.0.0.0:{config.API_PORT}"
+workers = config.RAG_WORKERS
+# Threads let one worker overlap I/O-bound requests (Qdrant, Neo4j, LLM calls).
+worker_class = "gthread"
+threads = config.RAG_WORKER_THREADS
+timeout = config.RAG_WORKER_TIMEOUT
+graceful_timeout = config.RAG_GRACEFUL_TIMEOUT
+max_requests = config.RAG_MAX_REQUESTS
+max_requests_jitter = max(1, config.RAG_MAX_REQUESTS // 10) if config.RAG_MAX_REQUESTS else 0
+
+# Load the app in the master before forking so model memory is shared copy-on-write.
+preload_app = True
+
+accesslog = None
+errorlog = "-"
+loglevel = config.LOGGING_LEVEL_NAME.lower()
+
+
+def when_ready(server):
+    import model_registry
+    results = model_registry.preload_models(config.PRELOAD_MODELS)
+    server.log.info(f"RAG master preloaded models before fork: {results} (role: {config.RAG_SERVICE_ROLE}, workers: {workers})")
+
+    # The ingestion job pool runs in its own supervisor process, not in the request workers.
+    import ingestion_jobs
+    server.ingestion_supervisor = ingestion_jobs.start_supervisor_process()
+    if server.ingestion_supervisor:
+        server.log.info(f"Started ingestion job supervisor (pid {server.ingestion_supervisor.pid}, "
+                        f"{config.INGESTION_WORKERS} worker(s)).")
+
+
+def post_fork(server, worker):
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(config.TORCH_THREADS_PER_WORKER)
+
+    import app as rag_app
+    import warmup
+    rag_app.reinitialize_after_fork()
+    warmup.start_warmup(mode="background")
+    server.log.info(f"RAG worker {worker.pid} started (role: {config.RAG_SERVICE_ROLE}, torch threads: {config.TORCH_THREADS_PER_WORKER}).")
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_flask_exporter.multiprocess import GunicornInternalPrometheusMetrics
+        GunicornInternalPrometheusMetrics.mark_process_dead_on_child_exit(worker.pid)
+
+
+def on_exit(server):
+    supervisor = getattr(server, "ingestion_supervisor", None)
+    if supervisor is not None:
+        supervisor.terminate()
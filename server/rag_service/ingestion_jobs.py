@@ -0,0 +1,605 @@
+# server/rag_service/ingestion_jobs.py
+"""
+Asynchronous ingestion jobs for /add_document.
+
+POST /jobs/add_document stores a job in a SQLite-backed queue and returns its id at once.
+A pool of ingestion worker processes (INGESTION_WORKERS) drains the queue, runs the same
+pipeline as /add_document and records per-stage progress; callers poll GET /jobs/<id>.
+
+The pool runs in its own supervisor process, `python ingestion_jobs.py --workers N`, which
+`python app.py` and the gunicorn master (see gunicorn.conf.py) launch automatically when the
+role serves ingestion and INGESTION_WORKERS > 0. It can also be run on its own.
+
+Jobs whose worker stops heart-beating (crash, OOM kill) are put back in the queue, up to
+INGESTION_JOB_MAX_ATTEMPTS attempts.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED = 'queued', 'running', 'completed', 'failed'
+
+# A run owns its job while the row still carries its worker pid and attempt number. A worker that
+# misses heartbeats loses the job to requeue_stale (and possibly to another worker); its later
+# writes then match no row and are dropped.
+_OWNED_BY = "id = ? AND status = ? AND worker_pid = ? AND attempts = ?"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    stage TEXT,
+    stages TEXT NOT NULL DEFAULT '[]',
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at);
+"""
+
+
+class JobStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        self._connection().execute(
+            "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, JOB_QUEUED, json.dumps(payload), time.time())
+        )
+        return job_id
+
+    def claim_next(self, worker_pid: int) -> Optional[Dict[str, Any]]:
+        """Atomically moves the oldest queued job to 'running' and returns it."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (JOB_QUEUED,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute("UPDATE jobs SET status = ?, attempts = attempts + 1, worker_pid = ?, started_at = ?, "
+                         "heartbeat_at = ?, stage = NULL, stages = '[]', error = NULL WHERE id = ?",
+                         (JOB_RUNNING, worker_pid, now, now, row['id']))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job.update(status=JOB_RUNNING, worker_pid=worker_pid, attempts=row['attempts'] + 1)
+        return job
+
+    # heartbeat / update_progress / complete / fail return False when the run no longer owns the job.
+
+    def heartbeat(self, job_id: str, worker_pid: int, attempt: int) -> bool:
+        return self._connection().execute(f"UPDATE jobs SET heartbeat_at = ? WHERE {_OWNED_BY}",
+                                          (time.time(), job_id, JOB_RUNNING, worker_pid, attempt)).rowcount > 0
+
+    def update_progress(self, job_id: str, worker_pid: int, attempt: int, stage: str, stages: List[Dict[str, Any]]) -> bool:
+        return self._connection().execute(
+            f"UPDATE jobs SET stage = ?, stages = ?, heartbeat_at = ? WHERE {_OWNED_BY}",
+            (stage, json.dumps(stages), time.time(), job_id, JOB_RUNNING, worker_pid, attempt)
+        ).rowcount > 0
+
+    def complete(self, job_id: str, worker_pid: int, attempt: int, result: Dict[str, Any], stages: List[Dict[str, Any]]) -> bool:
+        return self._connection().execute(
+            f"UPDATE jobs SET status = ?, result = ?, stages = ?, stage = NULL, finished_at = ? WHERE {_OWNED_BY}",
+            (JOB_COMPLETED, json.dumps(result), json.dumps(stages), time.time(), job_id, JOB_RUNNING, worker_pid, attempt)
+        ).rowcount > 0
+
+    def fail(self, job_id: str, worker_pid: int, attempt: int, error: str, stages: List[Dict[str, Any]]) -> bool:
+        return self._connection().execute(
+            f"UPDATE jobs SET status = ?, error = ?, stages = ?, finished_at = ? WHERE {_OWNED_BY}",
+            (JOB_FAILED, error, json.dumps(stages), time.time(), job_id, JOB_RUNNING, worker_pid, attempt)
+        ).rowcount > 0
+
+    def requeue_stale(self, stale_after_seconds: float, max_attempts: int) -> int:
+        """Re-queues running jobs whose worker stopped heart-beating; fails them after max_attempts."""
+        conn = self._connection()
+        cutoff = time.time() - stale_after_seconds
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            failed = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                (JOB_FAILED, "Ingestion worker stopped responding.", time.time(), JOB_RUNNING, cutoff, max_attempts)
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE jobs SET status = ?, worker_pid = NULL WHERE status = ? AND heartbeat_at < ?",
+                (JOB_QUEUED, JOB_RUNNING, cutoff)
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if failed or requeued:
+            logger.warning(f"Ingestion jobs: re-queued {requeued} and failed {failed} job(s) from unresponsive workers.")
+        return requeued
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job.pop('payload', None)
+        job['stages'] = json.loads(job['stages'] or '[]')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStore(config.INGESTION_JOB_DB)
+    return _store
+
+
+class StageTracker:
+    """
+    Collects per-stage timings as the pipeline reports them and persists them on the job.
+    Once the run has lost the job (a heartbeat or progress write matched no row), the next stage
+    raises ai_core.ProcessingCancelled so the document is not processed twice.
+    """
+
+    def __init__(self, store: JobStore, job: Dict[str, Any]):
+        self.store = store
+        self.job_id = job['id']
+        self.worker_pid = job['worker_pid']
+        self.attempt = job['attempts']
+        self.stages: List[Dict[str, Any]] = []
+        self.lost_ownership = False
+
+    def _close_current(self, status: str) -> None:
+        if self.stages and self.stages[-1]['status'] == 'running':
+            current = self.stages[-1]
+            current['status'] = status
+            current['finished_at'] = time.time()
+            current['duration_seconds'] = round(current['finished_at'] - current['started_at'], 3)
+
+    def __call__(self, stage: str, details: Optional[Dict[str, Any]] = None) -> None:
+        self._close_current('completed')
+        self.stages.append({'name': stage, 'status': 'running', 'started_at': time.time(), **(details or {})})
+        if self.lost_ownership or not self.store.update_progress(self.job_id, self.worker_pid, self.attempt,
+                                                                 stage, self.stages):
+            import ai_core
+            self.lost_ownership = True
+            raise ai_core.ProcessingCancelled(f"Ingestion job {self.job_id} was taken over by another run.")
+
+    def heartbeat(self) -> None:
+        if not self.store.heartbeat(self.job_id, self.worker_pid, self.attempt):
+            self.lost_ownership = True
+
+    def finish(self, succeeded: bool) -> List[Dict[str, Any]]:
+        self._close_current('completed' if succeeded else 'failed')
+        return self.stages
+
+
+# --- Shared pipeline for /add_document and its jobs ---
+
+def run_add_document(vector_service: Any, user_id: str, original_name: str, file_path: Optional[str] = None,
+                     text_content_override: Optional[str] = None,
+                     progress_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                     streaming: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Parses, chunks, embeds and upserts one document. Returns the /add_document response body.
+    streaming (default STREAMING_INGESTION) upserts page window by page window to bound memory.
+    Embedding and upserting overlap batch by batch (ingestion_pipeline); 'pipeline_stats' in the result
+    holds each stage's busy/idle time.
+    Content already in the ingestion store (same bytes, same pipeline settings) skips straight to upsert.
+    """
+    import ai_core
+    import retrieval_cache
+    import ingestion_store
+    import ingestion_pipeline
+
+    store = ingestion_store.get_ingestion_store()
+    store_key = None
+    source_exists = bool(file_path and os.path.exists(file_path))
+    if store is not None and (text_content_override or source_exists):
+        try:
+            store_key = ingestion_store.content_key(original_name, file_path=file_path,
+                                                    text_content=text_content_override or None)
+            cached = store.get(store_key)
+        except (OSError, sqlite3.Error, ValueError) as e:
+            logger.warning(f"Ingestion store lookup failed for '{original_name}', processing normally: {e}")
+            store_key, cached = None, None
+        if cached is not None:
+            return _add_stored_document(vector_service, user_id, original_name, file_path, text_content_override,
+                                        cached, progress_callback)
+
+    streaming = config.STREAMING_INGESTION if streaming is None else streaming
+    if streaming and not text_content_override and file_path and os.path.exists(file_path):
+        logger.info(f"Adding document '{original_name}' (streaming from file_path), user '{user_id}'.")
+        pipeline_stats: List[Dict[str, Any]] = []
+        # Windows are upserted as they are processed. If a later one fails, delete the points this run
+        # created (not ones that were already stored under the same deterministic id).
+        previous_ids = {record['id'] for record in vector_service.get_document_chunk_fingerprints(user_id, original_name)}
+        written_ids: List[str] = []
+
+        def upsert_window_chunks(chunks: List[Dict[str, Any]]) -> int:
+            written_ids.extend(chunk['id'] for chunk in chunks) # before the call: a failed upsert may be partial
+            return vector_service.add_processed_chunks(chunks)
+
+        try:
+            num_added, raw_text, kg_chunks = ai_core.process_document_for_qdrant_streaming(
+                file_path=file_path, original_name=original_name, user_id=user_id,
+                upsert_chunks=upsert_window_chunks,
+                document_record_callback=vector_service.upsert_document_record,
+                progress_callback=progress_callback,
+                pipeline_stats_callback=pipeline_stats.append
+            )
+        except ai_core.ProcessingCancelled:
+            raise # another run owns the job now and may be writing the same points
+        except Exception:
+            partial_ids = [point_id for point_id in dict.fromkeys(written_ids) if point_id not in previous_ids]
+            if partial_ids:
+                logger.warning(f"Streaming '{original_name}' failed; deleting the {len(partial_ids)} points it had upserted.")
+                try:
+                    vector_service.delete_points(partial_ids)
+                except Exception as e_cleanup:
+                    logger.error(f"Could not delete partial points of '{original_name}': {e_cleanup}")
+            raise
+        retrieval_cache.invalidate_document(user_id, original_name)
+        return {
+            "message": "Document processed.",
+            "status": "added_to_qdrant" if num_added > 0 else "processed_no_content",
+            "filename": original_name,
+            "num_chunks_added_to_qdrant": num_added,
+            "raw_text_for_analysis": raw_text or "",
+            "chunks_with_metadata": kg_chunks,
+            "ingestion_cache_hit": False,
+            "pipeline_stats": pipeline_stats[-1] if pipeline_stats else None
+        }
+
+    document_records: List[Dict[str, Any]] = []
+    if text_content_override:
+        logger.info(f"Adding document '{original_name}' (from text_content_override), user '{user_id}'.")
+        # Pass a dummy file_path as it's required by the signature, actual file is not read.
+        processed_chunks, raw_text, kg_chunks = ai_core.process_document_for_qdrant(
+            file_path="", original_name=original_name, user_id=user_id,
+            text_content_override=text_content_override, progress_callback=progress_callback,
+            embed_chunks=False, document_record_callback=document_records.append
+        )
+    elif file_path and os.path.exists(file_path):
+        logger.info(f"Adding document '{original_name}' (from file_path), user '{user_id}'.")
+        processed_chunks, raw_text, kg_chunks = ai_core.process_document_for_qdrant(
+            file_path=file_path, original_name=original_name, user_id=user_id, progress_callback=progress_callback,
+            embed_chunks=False, document_record_callback=document_records.append
+        )
+    else:
+        raise ValueError("Neither 'file_path' (and file exists) nor 'text_content_override' provided.")
+
+    num_added, status, pipeline_stats = 0, "processed_no_content", None
+    if processed_chunks:
+        # Batch N is embedded while batch N-1 is upserted; embeddings are filled into processed_chunks.
+        if progress_callback: progress_callback('embed_upsert', {'num_chunks': len(processed_chunks)})
+        num_added, stats = ingestion_pipeline.embed_and_upsert(
+            processed_chunks, ai_core.generate_segment_embeddings, vector_service.add_processed_chunks)
+        pipeline_stats = ingestion_pipeline.log_stats(stats, original_name)
+        if num_added > 0: status = "added_to_qdrant"
+        if document_records:
+            vector_service.upsert_document_record(document_records[-1])
+        if store_key is not None and document_records:
+            try:
+                if store.put(store_key, original_name, processed_chunks, document_records[-1], raw_text):
+                    logger.info(f"Ingestion store: saved '{original_name}' ({len(processed_chunks)} chunks).")
+            except sqlite3.Error as e:
+                logger.warning(f"Ingestion store: could not save '{original_name}': {e}")
+    retrieval_cache.invalidate_document(user_id, original_name)
+
+    return {
+        "message": "Document processed.",
+        "status": status,
+        "filename": original_name,
+        "num_chunks_added_to_qdrant": num_added,
+        "raw_text_for_analysis": raw_text or "",
+        "chunks_with_metadata": kg_chunks,
+        "ingestion_cache_hit": False,
+        "pipeline_stats": pipeline_stats
+    }
+
+
+def _add_stored_document(vector_service: Any, user_id: str, original_name: str, file_path: Optional[str],
+                         text_content_override: Optional[str], cached: Tuple[List[Dict[str, Any]], Dict[str, Any], str, str],
+                         progress_callback: Optional[Callable[[str, Dict[str, Any]], None]]) -> Dict[str, Any]:
+    """Duplicate upload: restamp the stored chunks and document record for this user and file, then upsert them."""
+    import ingestion_store
+    import retrieval_cache
+
+    chunks, document_record, raw_text, source_name = cached
+    path_on_server = f"virtual://{original_name}" if text_content_override else file_path
+    ingestion_store.restamp_document(chunks, document_record, source_name, user_id, original_name, path_on_server)
+    logger.info(f"Adding document '{original_name}' for user '{user_id}' from the ingestion store "
+                f"({len(chunks)} chunks, first processed as '{source_name}').")
+    kg_chunks = [{'id': c['id'], 'text_content': c['text_content'], 'metadata': dict(c['metadata'])} for c in chunks]
+
+    if progress_callback: progress_callback('upsert', {'num_chunks': len(chunks), 'ingestion_cache_hit': True})
+    num_added = vector_service.add_processed_chunks(chunks)
+    vector_service.upsert_document_record(document_record)
+    retrieval_cache.invalidate_document(user_id, original_name)
+    return {
+        "message": "Document processed.",
+        "status": "added_to_qdrant" if num_added > 0 else "processed_no_content",
+        "filename": original_name,
+        "num_chunks_added_to_qdrant": num_added,
+        "raw_text_for_analysis": raw_text or "",
+        "chunks_with_metadata": kg_chunks,
+        "ingestion_cache_hit": True
+    }
+
+
+# Payload fields that change when an unchanged chunk moves within its document.
+_CHUNK_POSITION_FIELDS = ('chunk_index', 'chunk_start_char', 'chunk_end_char')
+
+
+def run_update_document(vector_service: Any, user_id: str, original_name: str, file_path: Optional[str] = None,
+                        text_content_override: Optional[str] = None,
+                        progress_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Re-ingests a changed document, touching only what changed: chunks whose fingerprint is already
+    stored keep their point (and vector), new or edited chunks are embedded and upserted, and points
+    whose chunk disappeared are deleted. Points stored before chunk fingerprints existed count as changed.
+    """
+    import ai_core
+    import retrieval_cache
+
+    if not text_content_override and not (file_path and os.path.exists(file_path)):
+        raise ValueError("Neither 'file_path' (and file exists) nor 'text_content_override' provided.")
+    logger.info(f"Updating document '{original_name}', user '{user_id}'.")
+    document_records: List[Dict[str, Any]] = []
+    chunks, raw_text, kg_chunks = ai_core.process_document_for_qdrant(
+        file_path=file_path or "", original_name=original_name, user_id=user_id,
+        text_content_override=text_content_override, progress_callback=progress_callback, embed_chunks=False,
+        document_record_callback=document_records.append
+    )
+    existing = vector_service.get_document_chunk_fingerprints(user_id, original_name)
+    previous_record = vector_service.get_document_record(user_id, original_name) if existing else None
+
+    stored_by_fingerprint: Dict[str, List[Dict[str, Any]]] = {}
+    for record in existing:
+        if record['chunk_fingerprint']:
+            stored_by_fingerprint.setdefault(record['chunk_fingerprint'], []).append(record)
+    kept_ids: Dict[str, str] = {} # new chunk id -> existing point id
+    moved: Dict[str, Dict[str, Any]] = {}
+    changed_chunks = []
+    for chunk in chunks:
+        metadata = chunk['metadata']
+        candidates = stored_by_fingerprint.get(metadata['chunk_fingerprint'])
+        if not candidates:
+            changed_chunks.append(chunk)
+            continue
+        record = candidates.pop(0)
+        kept_ids[chunk['id']] = record['id']
+        chunk['id'] = metadata['chunk_id'] = record['id']
+        if any(record[field] != metadata[field] for field in _CHUNK_POSITION_FIELDS):
+            moved[record['id']] = {field: metadata[field] for field in (*_CHUNK_POSITION_FIELDS, 'chunk_reference_name')}
+    for kg_chunk in kg_chunks:
+        if kg_chunk['id'] in kept_ids:
+            kg_chunk['id'] = kg_chunk['metadata']['chunk_id'] = kept_ids[kg_chunk['id']]
+    kept_point_ids = set(kept_ids.values())
+    stale_ids = [record['id'] for record in existing if record['id'] not in kept_point_ids]
+
+    num_added = 0
+    if changed_chunks:
+        if progress_callback: progress_callback('embed', {'num_chunks': len(changed_chunks)})
+        ai_core.generate_segment_embeddings(changed_chunks)
+        if any(not chunk.get('embedding') for chunk in changed_chunks):
+            # Leave the stored version intact rather than replacing part of it.
+            raise RuntimeError(f"Embedding failed for some changed chunks of '{original_name}'; update aborted.")
+        if progress_callback: progress_callback('upsert', {'num_chunks': len(changed_chunks)})
+        num_added = vector_service.add_processed_chunks(changed_chunks)
+    if document_records:
+        vector_service.upsert_document_record(document_records[-1])
+    elif previous_record is not None: # the document no longer produces any chunks
+        vector_service.delete_document_record(user_id, original_name)
+    if kept_ids:
+        # Unchanged chunks keep their vectors; only moved ones (and a changed title) are rewritten.
+        vector_service.set_chunk_payloads(moved)
+        new_title = chunks[0]['metadata'].get('title')
+        if previous_record is None or previous_record.get('title') != new_title:
+            vector_service.update_document_payload(user_id, original_name, {'title': new_title})
+    vector_service.delete_points(stale_ids)
+    retrieval_cache.invalidate_document(user_id, original_name)
+
+    logger.info(f"Updated '{original_name}' for user '{user_id}': {len(kept_ids)} chunks unchanged "
+                f"({len(moved)} moved), {num_added} embedded, {len(stale_ids)} deleted.")
+    return {
+        "message": "Document updated.",
+        "status": "updated" if chunks else "processed_no_content",
+        "filename": original_name,
+        "num_chunks_unchanged": len(kept_ids),
+        "num_chunks_moved": len(moved),
+        "num_chunks_added_to_qdrant": num_added,
+        "num_chunks_deleted": len(stale_ids),
+        "raw_text_for_analysis": raw_text or "",
+        "chunks_with_metadata": kg_chunks
+    }
+
+
+def submit_add_document_job(payload: Dict[str, Any]) -> str:
+    return get_job_store().submit('add_document', payload)
+
+
+# --- Worker processes ---
+
+def _heartbeat_loop(tracker: StageTracker, stop: threading.Event) -> None:
+    while not tracker.lost_ownership and not stop.wait(config.INGESTION_JOB_HEARTBEAT_SECONDS):
+        try: tracker.heartbeat()
+        except sqlite3.Error as e: logger.warning(f"Ingestion job {tracker.job_id}: heartbeat failed: {e}")
+
+
+def _run_job(store: JobStore, vector_service: Any, job: Dict[str, Any]) -> None:
+    job_id, payload = job['id'], job['payload']
+    tracker = StageTracker(store, job)
+    owner = (tracker.worker_pid, tracker.attempt)
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat_loop, args=(tracker, stop_heartbeat), daemon=True)
+    heartbeat.start()
+    start = time.perf_counter()
+    try:
+        result = run_add_document(vector_service, payload['user_id'], payload['original_name'],
+                                  file_path=payload.get('file_path'),
+                                  text_content_override=payload.get('text_content_override'),
+                                  progress_callback=tracker, streaming=payload.get('streaming'))
+        if store.complete(job_id, *owner, result, tracker.finish(succeeded=True)):
+            logger.info(f"Ingestion job {job_id} ('{payload['original_name']}') completed in {time.perf_counter() - start:.1f}s.")
+        else:
+            logger.warning(f"Ingestion job {job_id} ('{payload['original_name']}') finished after another run took it over; "
+                           f"result discarded.")
+    except Exception as e:
+        if tracker.lost_ownership:
+            logger.warning(f"Ingestion job {job_id} ('{payload.get('original_name')}') stopped: {e}")
+        else:
+            logger.error(f"Ingestion job {job_id} ('{payload.get('original_name')}') failed: {e}", exc_info=True)
+        if not store.fail(job_id, *owner, str(e), tracker.finish(succeeded=False)) and not tracker.lost_ownership:
+            logger.warning(f"Ingestion job {job_id}: failure not recorded, another run owns the job now.")
+    finally:
+        stop_heartbeat.set()
+
+
+def ingestion_worker_main(stop_event: Any) -> None:
+    """Entry point of one ingestion worker process (started with the 'spawn' method)."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # the supervisor handles Ctrl+C and tells us via stop_event
+    import embedding_pool
+    from vector_db_service import VectorDBService
+
+    store = get_job_store()
+    vector_service = VectorDBService()
+    vector_service.setup_collection()
+    embedding_pool.start_embedding_pool() # no-op unless EMBEDDING_POOL_WORKERS > 0
+    logger.info(f"Ingestion worker {os.getpid()} ready.")
+
+    last_stale_check = 0.0
+    try:
+        while not stop_event.is_set():
+            if time.monotonic() - last_stale_check > config.INGESTION_JOB_HEARTBEAT_SECONDS:
+                store.requeue_stale(config.INGESTION_JOB_STALE_SECONDS, config.INGESTION_JOB_MAX_ATTEMPTS)
+                last_stale_check = time.monotonic()
+            job = store.claim_next(os.getpid())
+            if job is None:
+                stop_event.wait(config.INGESTION_JOB_POLL_SECONDS)
+                continue
+            _run_job(store, vector_service, job)
+    finally:
+        embedding_pool.stop_embedding_pool()
+    logger.info(f"Ingestion worker {os.getpid()} stopping.")
+
+
+class IngestionWorkerPool:
+    """Starts and supervises the ingestion worker processes; dead workers are replaced."""
+
+    def __init__(self, num_workers: int):
+        self.num_workers = num_workers
+        # 'spawn' gives each worker a clean interpreter (no inherited locks, threads or sockets).
+        self._ctx = multiprocessing.get_context('spawn')
+        self._stop_event = self._ctx.Event()
+        self._processes: List[multiprocessing.Process] = []
+        self._monitor: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        # Non-daemonic, so a worker may itself start helper processes (e.g. OCR or embedding pools).
+        process = self._ctx.Process(target=ingestion_worker_main, args=(self._stop_event,),
+                                    name=f"ingestion-worker-{index}", daemon=False)
+        process.start()
+        return process
+
+    def start(self) -> None:
+        get_job_store() # create the schema before workers race for it
+        self._processes = [self._spawn(i) for i in range(self.num_workers)]
+        self._monitor = threading.Thread(target=self._supervise, name="ingestion-pool-monitor", daemon=True)
+        self._monitor.start()
+        logger.info(f"Ingestion worker pool started with {self.num_workers} process(es).")
+
+    def _supervise(self) -> None:
+        while not self._stopping.wait(5.0):
+            for i, process in enumerate(self._processes):
+                if not process.is_alive():
+                    logger.error(f"Ingestion worker {process.pid} exited with code {process.exitcode}; restarting it.")
+                    self._processes[i] = self._spawn(i)
+
+    def stop(self, timeout: float = 30.0) -> None:
+        self._stopping.set()
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"Ingestion worker {process.pid} did not stop in time; terminating (its job will be re-queued).")
+                process.terminate()
+                process.join(5)
+        logger.info("Ingestion worker pool stopped.")
+
+
+def ingestion_pool_enabled() -> bool:
+    return config.INGESTION_WORKERS > 0 and config.RAG_SERVICE_ROLE in ('all', 'ingestion')
+
+
+def start_supervisor_process() -> Optional[Any]:
+    """
+    Launches `python ingestion_jobs.py` as a separate process. Kept out of the API process so
+    spawned workers re-import this module as their main module, not app.py.
+    """
+    import subprocess
+    if not ingestion_pool_enabled():
+        return None
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), '--workers', str(config.INGESTION_WORKERS)],
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the ingestion job worker pool.")
+    parser.add_argument('--workers', type=int, default=config.INGESTION_WORKERS)
+    args = parser.parse_args()
+
+    pool = IngestionWorkerPool(max(1, args.workers))
+    shutdown = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: shutdown.set())
+    signal.signal(signal.SIGINT, lambda *_: shutdown.set())
+    pool.start()
+    while not shutdown.wait(1.0):
+        pass
+    pool.stop(timeout=config.RAG_GRACEFUL_TIMEOUT)
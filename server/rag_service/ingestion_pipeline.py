@@ -0,0 +1,181 @@
+# server/rag_service/ingestion_pipeline.py
+"""
+Pipelined embed -> upsert for ingestion.
+
+Embedding all chunks and then upserting them in one blocking call leaves the network idle while
+the CPU embeds and the CPU idle while Qdrant indexes. run_pipeline runs each stage in its own
+thread, connected by bounded queues (INGESTION_PIPELINE_QUEUE_SIZE batches), so batch N is
+embedded while batch N-1 is being upserted, and a slow stage holds back the one before it
+instead of letting batches pile up in memory.
+
+Every stage records how long it was busy, waiting for input (starved) and waiting for room in
+the next queue (blocked). The stage that is busy for most of the wall time is the bottleneck;
+the figures go to Prometheus, the log and the /add_document result ('pipeline_stats').
+"""
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_STAGE_BUSY_SECONDS = Counter('rag_ingestion_stage_busy_seconds_total',
+                                      'Time ingestion pipeline stages spent working, by stage.', ['stage'])
+PIPELINE_STAGE_IDLE_SECONDS = Counter('rag_ingestion_stage_idle_seconds_total',
+                                      'Time ingestion pipeline stages spent waiting, by stage and reason '
+                                      '(input: nothing to do; output: next stage\'s queue full).', ['stage', 'reason'])
+PIPELINE_BATCHES = Counter('rag_ingestion_stage_batches_total', 'Batches processed by ingestion pipeline stages.', ['stage'])
+
+# (stage name, function applied to each batch; its return value goes to the next stage)
+Stage = Tuple[str, Callable[[Any], Any]]
+
+_END = object() # end of input, passed down the queues
+_POLL_SECONDS = 0.1 # how often a waiting stage checks whether another stage failed
+
+
+def _new_stage_stats() -> Dict[str, float]:
+    return {'batches': 0, 'busy_seconds': 0.0, 'starved_seconds': 0.0, 'blocked_seconds': 0.0}
+
+
+def run_pipeline(batches: Iterable[Any], stages: Sequence[Stage], queue_size: int = 2) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    Feeds batches through stages, each in its own thread. Returns the last stage's outputs (in
+    batch order) and the run's stats: wall_seconds plus busy/starved/blocked seconds per stage.
+    If a stage raises, the other stages stop and the exception is re-raised here.
+    """
+    names = [name for name, _ in stages]
+    stats = {name: _new_stage_stats() for name in names}
+    queues: List["queue.Queue[Any]"] = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+    outputs: List[Any] = []
+    errors: List[BaseException] = []
+    failed = threading.Event()
+
+    def put(target: "queue.Queue[Any]", item: Any) -> bool:
+        while not failed.is_set():
+            try:
+                target.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(source: "queue.Queue[Any]") -> Any:
+        while not failed.is_set():
+            try:
+                return source.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _END
+
+    def run_stage(index: int) -> None:
+        name, function = stages[index]
+        stage_stats = stats[name]
+        outbox = queues[index + 1] if index + 1 < len(stages) else None
+        try:
+            while True:
+                waited = time.perf_counter()
+                batch = get(queues[index])
+                stage_stats['starved_seconds'] += time.perf_counter() - waited
+                if batch is _END:
+                    break
+                started = time.perf_counter()
+                result = function(batch)
+                stage_stats['busy_seconds'] += time.perf_counter() - started
+                stage_stats['batches'] += 1
+                if outbox is None:
+                    outputs.append(result)
+                    continue
+                waited = time.perf_counter()
+                put(outbox, result)
+                stage_stats['blocked_seconds'] += time.perf_counter() - waited
+        except BaseException as e:
+            errors.append(e)
+            failed.set()
+        finally:
+            if outbox is not None:
+                put(outbox, _END)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run_stage, args=(index,), name=f"ingestion-{name}", daemon=True)
+               for index, name in enumerate(names)]
+    for thread in threads:
+        thread.start()
+    try:
+        for batch in batches:
+            if not put(queues[0], batch):
+                break
+    finally:
+        put(queues[0], _END)
+        for thread in threads:
+            thread.join()
+    wall_seconds = time.perf_counter() - start
+
+    for name, stage_stats in stats.items():
+        PIPELINE_STAGE_BUSY_SECONDS.labels(stage=name).inc(stage_stats['busy_seconds'])
+        PIPELINE_STAGE_IDLE_SECONDS.labels(stage=name, reason='input').inc(stage_stats['starved_seconds'])
+        PIPELINE_STAGE_IDLE_SECONDS.labels(stage=name, reason='output').inc(stage_stats['blocked_seconds'])
+        PIPELINE_BATCHES.labels(stage=name).inc(stage_stats['batches'])
+    if errors:
+        raise errors[0]
+    return outputs, {'wall_seconds': wall_seconds, 'stages': stats}
+
+
+def merge_stats(total: Optional[Dict[str, Any]], run: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds one run's stats to a running total (e.g. across the page windows of a streamed document)."""
+    if total is None:
+        return {'wall_seconds': run['wall_seconds'], 'stages': {name: dict(s) for name, s in run['stages'].items()}}
+    total['wall_seconds'] += run['wall_seconds']
+    for name, stage_stats in run['stages'].items():
+        totals = total['stages'].setdefault(name, _new_stage_stats())
+        for key, value in stage_stats.items():
+            totals[key] += value
+    return total
+
+
+def summarize_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Rounded copy of stats with each stage's utilization (busy / wall time) and the bottleneck stage."""
+    wall_seconds = stats['wall_seconds']
+    stages = {}
+    for name, stage_stats in stats['stages'].items():
+        stages[name] = {key: round(value, 3) if isinstance(value, float) else value for key, value in stage_stats.items()}
+        stages[name]['utilization'] = round(stage_stats['busy_seconds'] / wall_seconds, 3) if wall_seconds else 0.0
+    bottleneck = max(stages, key=lambda name: stages[name]['busy_seconds']) if stages else None
+    return {'wall_seconds': round(wall_seconds, 3), 'bottleneck': bottleneck, 'stages': stages}
+
+
+def log_stats(stats: Dict[str, Any], document_name: str) -> Dict[str, Any]:
+    summary = summarize_stats(stats)
+    per_stage = ", ".join(f"{name} busy {s['busy_seconds']:.1f}s ({s['utilization']:.0%}), starved "
+                          f"{s['starved_seconds']:.1f}s, blocked {s['blocked_seconds']:.1f}s"
+                          for name, s in summary['stages'].items())
+    logger.info(f"Ingestion pipeline for '{document_name}': {summary['wall_seconds']:.1f}s; {per_stage}; "
+                f"bottleneck: {summary['bottleneck']}.")
+    return summary
+
+
+def embed_and_upsert(chunks: List[Dict[str, Any]], embed: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+                     upsert: Callable[[List[Dict[str, Any]]], int], batch_size: Optional[int] = None,
+                     queue_size: Optional[int] = None) -> Tuple[int, Dict[str, Any]]:
+    """
+    Embeds chunks batch_size at a time (INGESTION_PIPELINE_BATCH_CHUNKS by default; 0 = all at once)
+    and upserts each embedded batch while the next one is embedding. embed fills in chunk['embedding']
+    in place, as ai_core.generate_segment_embeddings does. Returns (number upserted, stats).
+
+    With EMBEDDING_TOKEN_BATCHING the batches are cut from the chunks ordered longest first (by
+    characters), so the token-length sort inside each embed call sees chunks of similar length
+    across the whole list rather than only within its slice. chunks itself keeps its order.
+    """
+    batch_size = config.INGESTION_PIPELINE_BATCH_CHUNKS if batch_size is None else batch_size
+    queue_size = config.INGESTION_PIPELINE_QUEUE_SIZE if queue_size is None else queue_size
+    batch_size = batch_size if batch_size > 0 else max(1, len(chunks))
+    ordered = chunks
+    if config.EMBEDDING_TOKEN_BATCHING and batch_size < len(chunks):
+        ordered = sorted(chunks, key=lambda chunk: len(chunk.get('text_content') or ''), reverse=True)
+    batches = (ordered[i:i + batch_size] for i in range(0, len(ordered), batch_size))
+    upserted, stats = run_pipeline(batches, [('embed', embed), ('upsert', upsert)], queue_size)
+    return sum(upserted), stats
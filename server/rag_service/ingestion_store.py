@@ -0,0 +1,222 @@
+# server/rag_service/ingestion_store.py
+"""
+Content-addressed store of fully processed documents, used by ingestion_jobs.run_add_document.
+
+When the same file is uploaded many times (one course PDF, hundreds of students), only the first
+upload runs parse -> OCR -> clean -> NER -> chunk -> embed. The result (chunk texts and payloads,
+the document record, embeddings and the analysis text) is stored under sha256(file bytes) plus a
+fingerprint of every setting that changes the output (INGESTION_PIPELINE_VERSION, models and
+embedding backend/precision, chunking, OCR backend, language and tessdata, file extension). Later uploads of the same bytes are restamped with the uploader's user id, file name,
+path and fresh point ids, then upserted directly.
+
+Bump INGESTION_PIPELINE_VERSION whenever ai_core changes what it produces for the same input.
+"""
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+INGESTION_STORE_LOOKUPS = Counter('rag_ingestion_store_lookups_total',
+                                  'Ingestion store lookups by result (hit, miss).', ['result'])
+INGESTION_STORE_EVICTIONS = Counter('rag_ingestion_store_evictions_total', 'Documents evicted from the ingestion store.')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    key TEXT PRIMARY KEY,
+    source_name TEXT NOT NULL,
+    num_chunks INTEGER NOT NULL,
+    dim INTEGER NOT NULL,
+    record BLOB NOT NULL,
+    vectors BLOB NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_last_access ON documents(last_access);
+"""
+
+_HASH_BLOCK_BYTES = 1 << 20
+
+def pipeline_fingerprint(original_name: str) -> str:
+    """Everything besides the bytes that decides what ai_core produces for a document."""
+    return "|".join(str(part) for part in (
+        config.INGESTION_PIPELINE_VERSION,
+        os.path.splitext(original_name)[1].lower(), # the extension picks the parser
+        config.DOCUMENT_EMBEDDING_MODEL_NAME, config.EMBEDDING_VARIANT, # backend and ONNX precision
+        config.AI_CORE_CHUNK_UNIT, config.AI_CORE_CHUNK_SIZE, config.AI_CORE_CHUNK_OVERLAP,
+        config.AI_CORE_CHUNK_TOKENS, config.AI_CORE_CHUNK_OVERLAP_TOKENS,
+        config.SPACY_MODEL_NAME, config.MAX_TEXT_LENGTH_FOR_NER,
+        config.OCR_BACKEND, config.OCR_LANGUAGE, config.TESSDATA_PATH,
+    ))
+
+
+def content_key(original_name: str, file_path: Optional[str] = None, text_content: Optional[str] = None) -> str:
+    digest = hashlib.sha256()
+    if text_content is not None:
+        digest.update(b"text\x00" + text_content.encode('utf-8'))
+    else:
+        digest.update(b"file\x00")
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_BYTES), b""):
+                digest.update(block)
+    digest.update(b"\x00" + pipeline_fingerprint(original_name).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _reference_base_name(original_name: str) -> str:
+    # Same rule as ai_core.chunk_document_into_segments.
+    return re.sub(r'[^a-zA-Z0-9_-]', '_', os.path.splitext(original_name)[0])
+
+
+def restamp_document(chunks: List[Dict[str, Any]], document_record: Dict[str, Any], source_name: str,
+                     user_id: str, original_name: str, file_path_on_server: str) -> None:
+    """Rewrites the per-upload fields of a stored document and gives every chunk its point id for the new document (in place)."""
+    import ai_core # heavy; only needed on a hit
+
+    doc_id = ai_core.document_id(user_id, original_name)
+    per_upload = {'doc_id': doc_id, 'user_id': user_id, 'original_name': original_name, 'file_name': original_name}
+    title = original_name if document_record.get('title') == source_name else document_record.get('title') # defaulted to the file name
+
+    document_record.update(per_upload, title=title, file_path_on_server=file_path_on_server)
+    if os.path.exists(file_path_on_server) and config.PANDAS_AVAILABLE:
+        for field, timestamp in (('creation_date_os', os.path.getctime), ('modification_date_os', os.path.getmtime)):
+            if field in document_record:
+                document_record[field] = config.pd.Timestamp(timestamp(file_path_on_server), unit='s').isoformat()
+
+    reference_base = _reference_base_name(original_name)
+    fingerprint_counts: Dict[str, int] = {}
+    for chunk in chunks:
+        metadata = chunk['metadata']
+        fingerprint = metadata.get('chunk_fingerprint') or ai_core.chunk_fingerprint(chunk['text_content'])
+        occurrence = fingerprint_counts.get(fingerprint, 0)
+        fingerprint_counts[fingerprint] = occurrence + 1
+        point_id = ai_core.chunk_point_id(doc_id, fingerprint, occurrence)
+        chunk['id'] = point_id
+        metadata.update(per_upload, title=title, chunk_id=point_id,
+                        chunk_reference_name=f"{reference_base}_chunk_{metadata.get('chunk_index', 0):04d}")
+
+
+class IngestionStore:
+    def __init__(self, db_path: str, max_documents: int):
+        self.db_path = db_path
+        self.max_documents = max_documents
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, Any], str, str]]:
+        """Returns (chunks with embeddings, document record, analysis text, name it was stored under), or None."""
+        conn = self._connection()
+        row = conn.execute("SELECT source_name, num_chunks, dim, record, vectors FROM documents WHERE key = ?",
+                           (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            INGESTION_STORE_LOOKUPS.labels(result='miss').inc()
+            return None
+        source_name, num_chunks, dim, record_blob, vectors_blob = row
+        record = json.loads(zlib.decompress(record_blob).decode('utf-8'))
+        vectors = np.frombuffer(vectors_blob, dtype=np.float32).reshape(num_chunks, dim)
+        chunks = record['chunks']
+        for chunk, vector in zip(chunks, vectors):
+            chunk['embedding'] = vector.tolist()
+        with self._write_lock, conn:
+            conn.execute("UPDATE documents SET last_access = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        INGESTION_STORE_LOOKUPS.labels(result='hit').inc()
+        return chunks, record['document'], record['raw_text'], source_name
+
+    def put(self, key: str, source_name: str, chunks: List[Dict[str, Any]], document_record: Dict[str, Any],
+            raw_text: Optional[str]) -> bool:
+        """Stores a processed document. Refuses partial results (any chunk without an embedding)."""
+        if not chunks or any(not chunk.get('embedding') for chunk in chunks):
+            return False
+        vectors = np.asarray([chunk['embedding'] for chunk in chunks], dtype=np.float32)
+        record = {
+            'chunks': [{'id': c['id'], 'text_content': c['text_content'], 'metadata': c['metadata']} for c in chunks],
+            'document': document_record,
+            'raw_text': raw_text or "",
+        }
+        record_blob = zlib.compress(json.dumps(record, default=str).encode('utf-8'), 6)
+        vectors_blob = vectors.tobytes()
+        now = time.time()
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.execute("INSERT OR REPLACE INTO documents (key, source_name, num_chunks, dim, record, vectors, "
+                         "size_bytes, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (key, source_name, len(chunks), int(vectors.shape[1]), record_blob, vectors_blob,
+                          len(record_blob) + len(vectors_blob), now, now))
+        self._trim(conn)
+        return True
+
+    def _trim(self, conn: sqlite3.Connection) -> None:
+        if self.max_documents <= 0:
+            return
+        with self._write_lock, conn:
+            overflow = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] - self.max_documents
+            if overflow <= 0:
+                return
+            conn.execute("DELETE FROM documents WHERE key IN "
+                         "(SELECT key FROM documents ORDER BY last_access ASC LIMIT ?)", (overflow,))
+        INGESTION_STORE_EVICTIONS.inc(overflow)
+        logger.info(f"Ingestion store: evicted {overflow} least recently used documents (limit {self.max_documents}).")
+
+    def stats(self) -> Dict[str, Any]:
+        documents, size_bytes = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM documents").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'documents': documents,
+            'max_documents': self.max_documents,
+            'size_bytes': size_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+_store: Optional[IngestionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_ingestion_store() -> Optional[IngestionStore]:
+    """The process-wide store, or None when INGESTION_STORE_ENABLED is off or the DB can't be opened."""
+    global _store
+    if not config.INGESTION_STORE_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = IngestionStore(config.INGESTION_STORE_PATH, config.INGESTION_STORE_MAX_DOCUMENTS)
+                    logger.info(f"Ingestion store opened at {config.INGESTION_STORE_PATH} "
+                                f"(max {config.INGESTION_STORE_MAX_DOCUMENTS} documents).")
+                except sqlite3.Error as e:
+                    logger.error(f"Ingestion store unavailable ({config.INGESTION_STORE_PATH}): {e}")
+                    return None
+    return _store
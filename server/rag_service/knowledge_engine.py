@@ -13,6 +13,7 @@ from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 
 # --- THIS IS THE FIX: Import the central config ---
 import config
+import model_registry
 # --- END OF FIX ---
 
 logger = logging.getLogger(__name__)
@@ -21,7 +22,8 @@ logger = logging.getLogger(__name__)
 # --- YouTube Processing ---
 def _extract_youtube_text(url: str) -> Tuple[Optional[str], Optional[str]]:
     # --- FIX: Reference config for availability and library objects ---
-    if not config.YTDLP_AVAILABLE or not config.WHISPER_MODEL_LOADED:
+    whisper_model = model_registry.get_model('whisper') if config.YTDLP_AVAILABLE else None
+    if whisper_model is None:
         raise ImportError("YouTube processing requires 'yt-dlp' and the Whisper model to be loaded.")
     # --- END FIX ---
     
@@ -45,7 +47,7 @@ def _extract_youtube_text(url: str) -> Tuple[Optional[str], Optional[str]]:
             audio_file_path = os.path.join(temp_dir, 'audio.wav')
 
         logger.info(f"Transcribing audio for '{video_title}' with Whisper...")
-        result = config.whisper_model.transcribe(audio_file_path, fp16=False)
+        result = whisper_model.transcribe(audio_file_path, fp16=False)
         transcribed_text = result['text']
         
         logger.info(f"Transcription complete for '{video_title}'. Text length: {len(transcribed_text)}")
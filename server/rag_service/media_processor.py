@@ -7,6 +7,8 @@ from typing import Optional
 
 # --- Tool Imports are now centralized ---
 import config
+import model_registry
+import ocr_engine
 
 logger = logging.getLogger(__name__)
 
@@ -15,12 +17,13 @@ if config.PYTESSERACT_AVAILABLE and config.TESSERACT_CMD:
 
 def process_uploaded_audio(file_path: str) -> Optional[str]:
     """Transcribes audio content from a given file path."""
-    if not config.WHISPER_MODEL_LOADED:
+    whisper_model = model_registry.get_model('whisper')
+    if whisper_model is None:
         raise ImportError("Audio processing requires the Whisper model to be loaded.")
     
     logger.info(f"Transcribing audio file: {os.path.basename(file_path)}")
     try:
-        result = config.whisper_model.transcribe(file_path, fp16=False)
+        result = whisper_model.transcribe(file_path, fp16=False)
         transcribed_text = result['text']
         logger.info(f"Transcription complete for audio file. Text length: {len(transcribed_text)}")
         return transcribed_text
@@ -62,14 +65,14 @@ def process_uploaded_video(file_path: str) -> Optional[str]:
 
 def process_uploaded_image(file_path: str) -> Optional[str]:
     """Performs OCR on an image file to extract text."""
-    if not config.PYTESSERACT_AVAILABLE:
-        raise ImportError("Image processing requires 'pytesseract' and 'Pillow'.")
+    if not config.OCR_AVAILABLE:
+        raise ImportError("Image processing requires 'pytesseract' (or 'tesserocr' with OCR_BACKEND=tesserocr) and 'Pillow'.")
     
-    logger.info(f"Performing OCR on image file: {os.path.basename(file_path)}")
+    logger.info(f"Performing OCR on image file: {os.path.basename(file_path)} (backend: {config.OCR_BACKEND})")
     try:
         img = config.Image.open(file_path)
         processed_img = img.convert('L')
-        text = config.pytesseract.image_to_string(processed_img)
+        text = ocr_engine.recognize_image(processed_img)
         logger.info(f"OCR complete for image file. Text length: {len(text)}")
         return text
     except config.TESSERACT_ERROR:
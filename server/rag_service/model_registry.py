@@ -0,0 +1,216 @@
+# server/rag_service/model_registry.py
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """Returns the resident set size of this process, or None if it cannot be determined."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        pass
+    try:
+        import resource
+        # ru_maxrss is a high-water mark (KB on Linux, bytes on macOS); good enough as a fallback.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    """
+    Loads heavy models (spaCy, embeddings, Whisper, TTS) on first use instead of at import time.
+    Each model is loaded at most once per process; concurrent callers block until it is ready.
+    A failed load is kept for stats() and retried after a backoff (MODEL_LOAD_RETRY_SECONDS, doubling
+    up to MODEL_LOAD_RETRY_MAX_SECONDS), or right away by preload() / get(retry_failed=True).
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._failures: Dict[str, int] = {} # consecutive failed loads
+        self._retry_at: Dict[str, float] = {} # monotonic time before which a failed load is not retried
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        # A single load lock keeps loads serialized so per-model RSS deltas are attributable.
+        self._load_lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        if name in self._loaders:
+            logger.debug(f"ModelRegistry: Loader for '{name}' already registered. Keeping the existing one.")
+            return
+        self._loaders[name] = loader
+        self._stats[name] = {"status": "not_loaded", "load_time_seconds": None, "rss_delta_bytes": None}
+
+    def names(self) -> List[str]:
+        return list(self._loaders.keys())
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._loaders
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def _backing_off(self, name: str, retry_failed: bool) -> bool:
+        return name in self._errors and not retry_failed and time.monotonic() < self._retry_at.get(name, 0.0)
+
+    def get(self, name: str, retry_failed: bool = False) -> Optional[Any]:
+        """
+        Returns the model, loading it on first use. Returns None if it is unknown or failed to load;
+        a failed model is loaded again once its backoff has passed, or now with retry_failed.
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._loaders:
+            logger.error(f"ModelRegistry: No loader registered for model '{name}'.")
+            return None
+        if self._backing_off(name, retry_failed):
+            return None
+
+        with self._load_lock:
+            # Another thread may have finished (or failed) loading while we waited for the lock.
+            if name in self._models:
+                return self._models[name]
+            if self._backing_off(name, retry_failed):
+                return None
+
+            self._stats[name]["status"] = "loading"
+            logger.info(f"ModelRegistry: Loading model '{name}'...")
+            rss_before = _current_rss_bytes()
+            start = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+                if model is None:
+                    raise RuntimeError("loader returned None")
+            except Exception as e:
+                failures = self._failures.get(name, 0) + 1
+                backoff = min(config.MODEL_LOAD_RETRY_MAX_SECONDS, config.MODEL_LOAD_RETRY_SECONDS * 2 ** (failures - 1))
+                self._errors[name] = str(e)
+                self._failures[name] = failures
+                self._retry_at[name] = time.monotonic() + backoff
+                self._stats[name].update({"status": "failed", "error": str(e), "failed_attempts": failures})
+                logger.warning(f"ModelRegistry: Failed to load model '{name}' (attempt {failures}, retrying after {backoff:.0f}s): {e}")
+                return None
+
+            load_time = time.perf_counter() - start
+            rss_after = _current_rss_bytes()
+            rss_delta = (rss_after - rss_before) if (rss_before is not None and rss_after is not None) else None
+            self._models[name] = model
+            self._errors.pop(name, None)
+            self._retry_at.pop(name, None)
+            self._failures.pop(name, None)
+            self._stats[name].pop("error", None)
+            self._stats[name].update({
+                "status": "loaded",
+                "load_time_seconds": round(load_time, 3),
+                "rss_delta_bytes": rss_delta,
+                "loaded_at": time.time(),
+            })
+            rss_msg = f"{rss_delta / (1024 * 1024):.1f} MiB" if rss_delta is not None else "unknown"
+            logger.info(f"ModelRegistry: Model '{name}' loaded in {load_time:.2f}s (RSS delta: {rss_msg}).")
+            return model
+
+    def preload(self, names: Iterable[str]) -> Dict[str, bool]:
+        """Eagerly loads the given models, retrying failed ones now. Returns a map of model name -> loaded successfully."""
+        results = {}
+        for name in names:
+            results[name] = self.get(name, retry_failed=True) is not None
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        rss_now = _current_rss_bytes()
+        return {
+            "process_id": os.getpid(),
+            "process_rss_bytes": rss_now,
+            "models": {name: dict(entry) for name, entry in self._stats.items()},
+        }
+
+
+# ─── Built-in model loaders ───────────────────────────
+def _load_spacy_model():
+    import spacy
+    return spacy.load(config.SPACY_MODEL_NAME)
+
+def embedding_model_key(model_name: str) -> str:
+    """Registry key for a sentence-transformers model. Keyed by model name so identical models are shared."""
+    return f"embedding:{model_name}"
+
+def load_sentence_transformer(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def load_embedding_model(model_name: str):
+    """Loads model_name with the configured EMBEDDING_BACKEND ('torch' or 'onnx')."""
+    if config.EMBEDDING_BACKEND == 'onnx':
+        import onnx_encoder
+        return onnx_encoder.load_onnx_encoder(model_name)
+    return load_sentence_transformer(model_name)
+
+def _load_whisper_model():
+    if not config.WHISPER_AVAILABLE:
+        raise ImportError("openai-whisper is not installed.")
+    return config.whisper.load_model(config.WHISPER_MODEL_NAME)
+
+def _load_tts_model():
+    import tts_service
+    return tts_service.load_tts_model()
+
+
+_registry = ModelRegistry()
+_registry.register('spacy', _load_spacy_model)
+# Document and query models share one entry when they have the same name (the default).
+for _embedding_model_name in (config.DOCUMENT_EMBEDDING_MODEL_NAME, config.QUERY_EMBEDDING_MODEL_NAME):
+    _registry.register(embedding_model_key(_embedding_model_name),
+                       lambda name=_embedding_model_name: load_embedding_model(name))
+_registry.register('whisper', _load_whisper_model)
+_registry.register('tts', _load_tts_model)
+
+# Convenience names accepted by PRELOAD_MODELS that expand to several registry entries.
+_MODEL_GROUPS = {
+    'embedding': lambda: list(dict.fromkeys([
+        embedding_model_key(config.DOCUMENT_EMBEDDING_MODEL_NAME),
+        embedding_model_key(config.QUERY_EMBEDDING_MODEL_NAME),
+    ])),
+}
+
+def expand_model_names(names: Iterable[str]) -> List[str]:
+    expanded = []
+    for name in names:
+        for resolved in (_MODEL_GROUPS[name]() if name in _MODEL_GROUPS else [name]):
+            if resolved not in expanded:
+                expanded.append(resolved)
+    return expanded
+
+
+def register_model(name: str, loader: Callable[[], Any]) -> None:
+    _registry.register(name, loader)
+
+def get_model(name: str, retry_failed: bool = False) -> Optional[Any]:
+    return _registry.get(name, retry_failed=retry_failed)
+
+def is_model_loaded(name: str) -> bool:
+    return _registry.is_loaded(name)
+
+def preload_models(names: Iterable[str]) -> Dict[str, bool]:
+    names = expand_model_names(names)
+    if not names:
+        logger.info("ModelRegistry: No models configured for preloading. All models will load on first use.")
+        return {}
+    logger.info(f"ModelRegistry: Preloading models: {names}")
+    return _registry.preload(names)
+
+def get_model_stats() -> Dict[str, Any]:
+    return _registry.stats()
+
+def registered_model_names() -> List[str]:
+    return _registry.names()
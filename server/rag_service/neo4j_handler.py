@@ -40,6 +40,11 @@ def get_driver_instance():
 def close_driver():
     global _neo4j_driver
     if _neo4j_driver: _neo4j_driver.close(); _neo4j_driver = None
+def reset_driver_after_fork():
+    # The inherited driver's sockets belong to the parent process; drop it without closing them.
+    # A fresh driver is created lazily by get_driver_instance() in this process.
+    global _neo4j_driver
+    _neo4j_driver = None
 def check_neo4j_connectivity():
     try: get_driver_instance().verify_connectivity(); return True, "connected"
     except Exception as e: return False, f"disconnected: {e}"
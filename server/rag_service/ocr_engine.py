@@ -0,0 +1,143 @@
+# server/rag_service/ocr_engine.py
+"""
+Bounded process-pool OCR for ai_core.perform_ocr_on_images.
+
+Images are OCR'd by OCR_WORKERS processes (each with OMP_THREAD_LIMIT=1, so N workers use
+about N cores instead of N x all cores), with a per-image timeout, and results come back in
+input order. The pool is created lazily per process (forkserver, see worker_pools) and reused
+across documents; the recognition code it runs lives in ocr_worker.
+
+OCR_BACKEND selects how each image is recognized:
+  - 'pytesseract': writes a temp file and runs the tesseract binary per image (default);
+  - 'tesserocr': a persistent in-process Tesseract API handle per worker thread, fed the
+    image buffer directly (no temp files, no process spawn, models loaded once).
+"""
+import os
+import math
+import time
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+import config
+import ocr_worker
+import worker_pools
+
+logger = logging.getLogger(__name__)
+
+OCR_IMAGES_TOTAL = Counter('rag_ocr_images_total', 'Images OCR\'d, by outcome (ok, empty, timeout, error).', ['outcome'])
+OCR_IMAGE_SECONDS = Histogram('rag_ocr_image_seconds', 'Wall time to OCR one image inside a worker.',
+                              buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120))
+OCR_IMAGES_PER_SECOND = Gauge('rag_ocr_images_per_second', 'Throughput of the most recent OCR batch.',
+                              multiprocess_mode='livemax')
+OCR_QUEUE_DEPTH = Gauge('rag_ocr_queue_depth', 'Images submitted to the OCR pool and not finished yet.',
+                        multiprocess_mode='livesum')
+
+OcrResult = ocr_worker.OcrResult
+
+
+def ocr_settings() -> Dict[str, Any]:
+    """The OCR settings from config, handed to ocr_worker (pool processes don't read config)."""
+    return {'backend': config.OCR_BACKEND, 'language': config.OCR_LANGUAGE,
+            'tessdata_path': config.TESSDATA_PATH, 'tesseract_cmd': config.TESSERACT_CMD}
+
+
+def recognize_image(image: Any, timeout_seconds: Optional[float] = None) -> str:
+    """OCRs one preprocessed PIL image with the configured OCR_BACKEND, in this process. Raises on failure."""
+    timeout_seconds = config.OCR_IMAGE_TIMEOUT_SECONDS if timeout_seconds is None else timeout_seconds
+    return ocr_worker.recognize(image, timeout_seconds, ocr_settings())
+
+
+class OcrEngine:
+    def __init__(self, num_workers: int, timeout_seconds: float):
+        self.num_workers = max(1, num_workers)
+        self.timeout_seconds = timeout_seconds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_pid: Optional[int] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                # Not fork: this process has torch loaded and other threads running (see worker_pools).
+                self._pool = ProcessPoolExecutor(max_workers=self.num_workers, initializer=ocr_worker.init_worker,
+                                                 initargs=(ocr_settings(),), mp_context=worker_pools.pool_context())
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _reset_pool(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def ocr_images(self, images: List[Any]) -> List[OcrResult]:
+        """OCRs already preprocessed (e.g. grayscale) PIL images; returns one result per image, in order."""
+        if not images:
+            return []
+        start = time.perf_counter()
+        if self.num_workers == 1 or len(images) == 1:
+            # One image at a time: let tesseract use its default threading.
+            results = [ocr_worker.ocr_image(image, self.timeout_seconds, ocr_settings()) for image in images]
+        else:
+            results = self._ocr_in_pool(images)
+        elapsed = time.perf_counter() - start
+
+        for text, error, seconds in results:
+            OCR_IMAGE_SECONDS.observe(seconds)
+            if error:
+                OCR_IMAGES_TOTAL.labels(outcome='timeout' if error.startswith('timeout') else 'error').inc()
+            else:
+                OCR_IMAGES_TOTAL.labels(outcome='ok' if text and text.strip() else 'empty').inc()
+        if elapsed > 0:
+            OCR_IMAGES_PER_SECOND.set(len(images) / elapsed)
+        logger.info(f"OCR engine: {len(images)} image(s) in {elapsed:.1f}s "
+                    f"({len(images) / elapsed if elapsed else 0:.2f} images/sec, {min(self.num_workers, len(images))} worker(s)).")
+        return results
+
+    def _ocr_in_pool(self, images: List[Any]) -> List[OcrResult]:
+        pool = self._get_pool()
+        futures = [pool.submit(ocr_worker.ocr_image, image, self.timeout_seconds) for image in images]
+        OCR_QUEUE_DEPTH.inc(len(futures))
+        # One deadline for the whole batch: tesseract is killed at timeout_seconds per image, and
+        # num_workers images run at a time; the margin covers process start-up, queueing and pickling.
+        rounds = math.ceil(len(images) / min(self.num_workers, len(images)))
+        deadline = time.monotonic() + self.timeout_seconds * rounds + 30
+        results: List[OcrResult] = []
+        pool_broken = False
+        try:
+            for future in futures:
+                try:
+                    results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+                except FutureTimeoutError:
+                    future.cancel() # still queued: don't start it
+                    results.append((None, "timeout waiting for OCR worker", 0.0))
+                except BrokenProcessPool as e: # a worker was killed (e.g. OOM)
+                    results.append((None, f"{type(e).__name__}: {e}", 0.0))
+                    pool_broken = True
+                OCR_QUEUE_DEPTH.dec()
+        finally:
+            OCR_QUEUE_DEPTH.dec(len(futures) - len(results))
+        if pool_broken:
+            logger.error("OCR engine: a worker process died; the pool will be recreated for the next batch.")
+            self._reset_pool()
+        return results
+
+
+_engine: Optional[OcrEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_ocr_engine() -> OcrEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                num_workers = config.OCR_WORKERS if config.OCR_WORKERS > 0 else (os.cpu_count() or 1)
+                _engine = OcrEngine(num_workers, config.OCR_IMAGE_TIMEOUT_SECONDS)
+                logger.info(f"OCR engine: {num_workers} worker process(es), {config.OCR_IMAGE_TIMEOUT_SECONDS}s per image.")
+    return _engine
@@ -0,0 +1,87 @@
+# server/rag_service/ocr_worker.py
+"""
+Recognition side of ocr_engine, run in its pool processes (and in-process for single images).
+Imports only the OCR backends, so worker_pools can preload it in the forkserver; settings come
+from ocr_engine.ocr_settings() instead of config.
+"""
+import os
+import time
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# (text or None, error message or None, seconds spent)
+OcrResult = Tuple[Optional[str], Optional[str], float]
+
+# backend, language, tessdata_path, tesseract_cmd (see ocr_engine.ocr_settings)
+_settings: Dict[str, Any] = {'backend': 'pytesseract', 'language': 'eng', 'tessdata_path': None, 'tesseract_cmd': None}
+
+
+def init_worker(settings: Dict[str, Any]) -> None:
+    global _settings
+    # Inherited by the tesseract processes pytesseract starts; read by libtesseract on first
+    # use with tesserocr (the API handle is created lazily, after this runs).
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    _settings = dict(settings)
+
+
+_tesserocr_local = threading.local()
+
+
+def _get_tesserocr_api(settings: Dict[str, Any]) -> Any:
+    """One PyTessBaseAPI per thread (the handle is not thread-safe), created on first use."""
+    api = getattr(_tesserocr_local, 'api', None)
+    if api is None or getattr(_tesserocr_local, 'pid', None) != os.getpid():
+        kwargs = {'lang': settings['language']}
+        if settings.get('tessdata_path'):
+            kwargs['path'] = settings['tessdata_path']
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        _tesserocr_local.api, _tesserocr_local.pid = api, os.getpid()
+    return api
+
+
+def _recognize_with_tesserocr(image: Any, timeout_seconds: float, settings: Dict[str, Any]) -> str:
+    api = _get_tesserocr_api(settings)
+    try:
+        api.SetImage(image)
+        # Recognize() takes its timeout in milliseconds and returns False if it gave up.
+        if not api.Recognize(timeout=int(timeout_seconds * 1000)):
+            raise RuntimeError(f"Tesseract process timeout (tesserocr, {timeout_seconds}s)")
+        return api.GetUTF8Text()
+    finally:
+        api.Clear() # drops the image and results; the loaded models stay
+
+
+def recognize(image: Any, timeout_seconds: float, settings: Optional[Dict[str, Any]] = None) -> str:
+    """OCRs one preprocessed PIL image with settings['backend'] (default: the pool's settings). Raises on failure."""
+    settings = settings or _settings
+    if settings['backend'] == 'tesserocr':
+        if tesserocr is None:
+            raise ImportError("OCR_BACKEND=tesserocr requires the 'tesserocr' package (pip install -r requirements-tesserocr.txt).")
+        return _recognize_with_tesserocr(image, timeout_seconds, settings)
+    if settings.get('tesseract_cmd'):
+        pytesseract.pytesseract.tesseract_cmd = settings['tesseract_cmd']
+    return pytesseract.image_to_string(image, timeout=timeout_seconds)
+
+
+def ocr_image(image: Any, timeout_seconds: float, settings: Optional[Dict[str, Any]] = None) -> OcrResult:
+    start = time.perf_counter()
+    try:
+        text = recognize(image, timeout_seconds, settings)
+        return text, None, time.perf_counter() - start
+    except RuntimeError as e:
+        # pytesseract raises RuntimeError('Tesseract process timeout') after killing tesseract.
+        # _recognize_with_tesserocr raises the same message for consistency.
+        if 'timeout' in str(e).lower():
+            return None, f"timeout after {timeout_seconds}s", time.perf_counter() - start
+        return None, f"{type(e).__name__}: {e}", time.perf_counter() - start
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", time.perf_counter() - start
@@ -0,0 +1,237 @@
+# server/rag_service/onnx_encoder.py
+"""
+ONNX Runtime CPU backend for sentence embeddings (EMBEDDING_BACKEND=onnx).
+
+The sentence-transformers model is exported once to ONNX, dynamically quantized to int8,
+and saved under ONNX_MODEL_DIR together with its tokenizer and pooling settings. At runtime
+only onnxruntime and the (fast) tokenizer are needed; torch is not touched.
+
+    python onnx_encoder.py export  --model mixedbread-ai/mxbai-embed-large-v1
+    python onnx_encoder.py parity  --model mixedbread-ai/mxbai-embed-large-v1
+"""
+import os
+import json
+import fcntl
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+FP32_MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model_int8.onnx"
+ENCODER_CONFIG_FILE = "encoder_config.json"
+
+
+def model_export_dir(model_name: str) -> str:
+    return os.path.join(config.ONNX_MODEL_DIR, model_name.replace('/', '__'))
+
+
+class OnnxSentenceEncoder:
+    """Drop-in for the parts of SentenceTransformer the service uses: encode() and get_sentence_embedding_dimension()."""
+
+    def __init__(self, model_dir: str, intra_op_threads: int = 0, quantized: bool = True):
+        if not config.ONNXRUNTIME_AVAILABLE:
+            raise ImportError("EMBEDDING_BACKEND=onnx requires 'onnxruntime'.")
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, ENCODER_CONFIG_FILE), 'r', encoding='utf-8') as f:
+            self.encoder_config: Dict[str, Any] = json.load(f)
+
+        model_file = os.path.join(model_dir, INT8_MODEL_FILE if quantized else FP32_MODEL_FILE)
+        session_options = config.onnxruntime.SessionOptions()
+        session_options.graph_optimization_level = config.onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.intra_op_num_threads = intra_op_threads # 0 lets ORT use all physical cores
+        session_options.inter_op_num_threads = 1
+        self.session = config.onnxruntime.InferenceSession(model_file, sess_options=session_options,
+                                                           providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir, use_fast=True)
+        self.max_seq_length = int(self.encoder_config.get('max_seq_length', 512))
+        self.model_file = model_file
+        logger.info(f"ONNX encoder loaded from {model_file} (pooling: {self.encoder_config.get('pooling_mode')}, "
+                    f"intra-op threads: {intra_op_threads or 'auto'}).")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.encoder_config['embedding_dimension'])
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        mode = self.encoder_config.get('pooling_mode', 'mean')
+        if mode == 'cls':
+            return hidden[:, 0]
+        mask = attention_mask[..., None].astype(hidden.dtype)
+        if mode == 'max':
+            return np.where(mask > 0, hidden, -1e9).max(axis=1)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False, **unused_kwargs) -> np.ndarray:
+        single_input = isinstance(sentences, str)
+        texts = [sentences] if single_input else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Same trick as sentence-transformers: batch texts of similar length to cut padding.
+        order = np.argsort([-len(t) for t in texts], kind='stable')
+        embeddings = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            batch_idx = order[start:start + batch_size]
+            features = self.tokenizer([texts[i] for i in batch_idx], padding=True, truncation=True,
+                                      max_length=self.max_seq_length, return_tensors='np')
+            feeds = {name: features[name].astype(np.int64) for name in self.input_names if name in features}
+            hidden = self.session.run(None, feeds)[0]
+            embeddings[batch_idx] = self._pool(hidden, features['attention_mask'])
+
+        if normalize_embeddings or self.encoder_config.get('normalize'):
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings[0] if single_input else embeddings
+
+
+def export_onnx_model(model_name: str, output_dir: Optional[str] = None, quantize: bool = True, opset: int = 14) -> str:
+    """Exports model_name to ONNX (plus an int8 dynamically quantized copy). Needs torch and sentence-transformers."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    output_dir = output_dir or model_export_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    logger.info(f"Exporting '{model_name}' to ONNX in {output_dir}...")
+
+    st_model = SentenceTransformer(model_name, device='cpu')
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    pooling_mode = 'mean'
+    for module in st_model:
+        if isinstance(module, Pooling):
+            pooling_cfg = module.get_config_dict()
+            if pooling_cfg.get('pooling_mode_cls_token'): pooling_mode = 'cls'
+            elif pooling_cfg.get('pooling_mode_max_tokens'): pooling_mode = 'max'
+    normalize = any(isinstance(module, Normalize) for module in st_model)
+
+    class _LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            kwargs = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if token_type_ids is not None:
+                kwargs['token_type_ids'] = token_type_ids
+            return self.model(**kwargs).last_hidden_state
+
+    sample = tokenizer(["ONNX export sample sentence."], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+    fp32_path = os.path.join(output_dir, FP32_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(_LastHiddenState(transformer), tuple(sample[name] for name in input_names), fp32_path,
+                          input_names=input_names, output_names=['last_hidden_state'],
+                          dynamic_axes=dynamic_axes, opset_version=opset, do_constant_folding=True)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_MODEL_FILE), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, ENCODER_CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'model_name': model_name,
+            'pooling_mode': pooling_mode,
+            'normalize': normalize,
+            'max_seq_length': st_model.max_seq_length,
+            'embedding_dimension': st_model.get_sentence_embedding_dimension(),
+        }, f, indent=2)
+    logger.info(f"ONNX export complete for '{model_name}' (pooling: {pooling_mode}, quantized: {quantize}).")
+    return output_dir
+
+
+def ensure_onnx_export(model_name: str, quantize: bool, force: bool = False) -> str:
+    """
+    Exports model_name into model_export_dir unless a complete export is already there.
+    Several processes may start at once (ingestion workers, embedding pool workers): one exports
+    under an exclusive file lock, into a temporary directory that is then renamed into place, so
+    the others wait and never load a half-written model.
+    """
+    model_dir = model_export_dir(model_name)
+    model_file = os.path.join(model_dir, INT8_MODEL_FILE if quantize else FP32_MODEL_FILE)
+    if not force and os.path.exists(model_file) and os.path.exists(os.path.join(model_dir, ENCODER_CONFIG_FILE)):
+        return model_dir
+    os.makedirs(config.ONNX_MODEL_DIR, exist_ok=True)
+    with open(model_dir + ".lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if not force and os.path.exists(model_file) and os.path.exists(os.path.join(model_dir, ENCODER_CONFIG_FILE)):
+                return model_dir # exported by another process while we waited
+            staging_dir = tempfile.mkdtemp(prefix=os.path.basename(model_dir) + ".", dir=config.ONNX_MODEL_DIR)
+            try:
+                export_onnx_model(model_name, staging_dir, quantize=quantize)
+                if os.path.exists(model_dir):
+                    shutil.rmtree(model_dir) # an older or incomplete export
+                os.replace(staging_dir, model_dir)
+            except BaseException:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                raise
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return model_dir
+
+
+def load_onnx_encoder(model_name: str) -> OnnxSentenceEncoder:
+    """Loads the exported encoder for model_name, exporting it first if it isn't on disk yet."""
+    model_dir = model_export_dir(model_name)
+    if not os.path.exists(os.path.join(model_dir, INT8_MODEL_FILE if config.ONNX_QUANTIZE else FP32_MODEL_FILE)):
+        logger.warning(f"No ONNX export found for '{model_name}' in {model_dir}. Exporting now (one-off, slow).")
+        ensure_onnx_export(model_name, quantize=config.ONNX_QUANTIZE)
+    return OnnxSentenceEncoder(model_dir, intra_op_threads=config.ONNX_INTRA_OP_THREADS, quantized=config.ONNX_QUANTIZE)
+
+
+def parity_check(model_name: str, texts: List[str], quantized: bool = True) -> Dict[str, float]:
+    """Cosine similarity between the ONNX encoder and the fp32 PyTorch model on the same texts."""
+    from sentence_transformers import SentenceTransformer
+
+    reference = SentenceTransformer(model_name, device='cpu').encode(texts, convert_to_numpy=True)
+    candidate = OnnxSentenceEncoder(model_export_dir(model_name), config.ONNX_INTRA_OP_THREADS, quantized).encode(texts)
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = (reference * candidate).sum(axis=1)
+    return {
+        'num_texts': len(texts),
+        'min_cosine': float(cosines.min()),
+        'mean_cosine': float(cosines.mean()),
+        'p01_cosine': float(np.percentile(cosines, 1)),
+    }
+
+
+PARITY_SAMPLE_TEXTS = [
+    "Recursion is a method where the solution to a problem depends on solutions to smaller instances of the same problem.",
+    "The mitochondria is the powerhouse of the cell.",
+    "what is recursion",
+    "Gradient descent iteratively moves parameters in the direction of the negative gradient of the loss.",
+    "| Year | Revenue |\n| --- | --- |\n| 2021 | 4.2M |",
+    "The French Revolution began in 1789 and profoundly changed the political landscape of Europe.",
+    "Define time complexity and give an example of an O(n log n) algorithm.",
+    "photosynthesis convert light energy chemical energy store glucose",
+]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export or validate the ONNX embedding backend.")
+    parser.add_argument('command', choices=['export', 'parity'])
+    parser.add_argument('--model', default=config.DOCUMENT_EMBEDDING_MODEL_NAME)
+    parser.add_argument('--no-quantize', action='store_true')
+    parser.add_argument('--min-cosine', type=float, default=0.98, help="Parity threshold (exit code 1 below it).")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(ensure_onnx_export(args.model, quantize=not args.no_quantize, force=True))
+    else:
+        report = parity_check(args.model, PARITY_SAMPLE_TEXTS, quantized=not args.no_quantize)
+        print(json.dumps(report, indent=2))
+        raise SystemExit(0 if report['min_cosine'] >= args.min_cosine else 1)
@@ -0,0 +1,113 @@
+# server/rag_service/pdf_extraction.py
+"""
+Page-parallel pdfplumber extraction used by ai_core._extract_pdf_elements.
+
+Large PDFs are split into short contiguous page ranges (PDF_RANGE_PAGES); each process of a pool
+opens the PDF itself, runs extract_text / extract_tables on its range and sends back plain Python
+data (text and table rows). Only a couple of ranges per process are in flight, so a slow consumer
+(streaming ingestion OCRs and embeds as it goes) holds a few ranges in memory, not the document.
+iter_pdf_pages() yields the pages in order, so callers see exactly what a serial walk over
+pdf.pages would produce, including where an error is raised.
+
+The pool is created once per process (forkserver, see worker_pools) and reused across PDFs;
+the worker side lives in pdf_page_worker.
+"""
+import os
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Iterator, List, Optional, Tuple
+
+import config
+import worker_pools
+from pdf_page_worker import PageResult, extract_page, extract_page_range
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(num_workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_pid, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid() or _pool_workers != num_workers:
+            if _pool is not None and _pool_pid == os.getpid():
+                _pool.shutdown(wait=False) # resized (e.g. by the benchmark); running extractions finish
+            _pool = ProcessPoolExecutor(max_workers=num_workers, mp_context=worker_pools.pool_context())
+            _pool_pid, _pool_workers = os.getpid(), num_workers
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def count_pages(file_path: str) -> int:
+    with config.pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def page_ranges(num_pages: int, num_workers: int, max_range_pages: int) -> List[Tuple[int, int]]:
+    """Splits [0, num_pages) into contiguous ranges of at most max_range_pages pages, at least one per worker."""
+    range_pages = max(1, min(max_range_pages, -(-num_pages // max(1, num_workers))))
+    return [(start, min(start + range_pages, num_pages)) for start in range(0, num_pages, range_pages)]
+
+
+def _iter_serial(file_path: str) -> Iterator[PageResult]:
+    with config.pdfplumber.open(file_path) as pdf:
+        for page_index, page in enumerate(pdf.pages):
+            yield extract_page(page, page_index)
+
+
+def _iter_parallel(file_path: str, num_pages: int, num_workers: int) -> Iterator[PageResult]:
+    ranges = iter(page_ranges(num_pages, num_workers, config.PDF_RANGE_PAGES))
+    pool = _get_pool(num_workers)
+    pending: Deque[Future] = deque()
+    try:
+        while True:
+            # Keep PDF_RANGES_IN_FLIGHT_PER_WORKER ranges per process submitted; finished ones wait here.
+            while len(pending) < num_workers * max(1, config.PDF_RANGES_IN_FLIGHT_PER_WORKER):
+                page_range = next(ranges, None)
+                if page_range is None:
+                    break
+                pending.append(pool.submit(extract_page_range, file_path, *page_range))
+            if not pending:
+                return
+            pages, error = pending.popleft().result()
+            yield from pages
+            if error:
+                raise RuntimeError(f"pdfplumber failed in page-range worker: {error}")
+    except BrokenProcessPool:
+        logger.error("pdfplumber: a page-range worker died; the pool will be recreated for the next PDF.")
+        _reset_pool()
+        raise
+    finally:
+        for future in pending:
+            future.cancel() # the caller stopped early or a range failed: don't run the rest
+
+
+def iter_pdf_pages(file_path: str, num_workers: Optional[int] = None) -> Iterator[PageResult]:
+    """
+    Yields (page_index, text, tables) for every page in page order. Uses a process pool when
+    the PDF has at least PDF_PARALLEL_MIN_PAGES pages and more than one worker is configured.
+    """
+    num_workers = config.PDF_EXTRACTION_WORKERS if num_workers is None else num_workers
+    if num_workers <= 0:
+        num_workers = os.cpu_count() or 1
+    if num_workers > 1:
+        num_pages = count_pages(file_path)
+        if num_pages >= config.PDF_PARALLEL_MIN_PAGES:
+            logger.info(f"pdfplumber: extracting {num_pages} pages of {os.path.basename(file_path)} "
+                        f"with {min(num_workers, num_pages)} processes.")
+            yield from _iter_parallel(file_path, num_pages, num_workers)
+            return
+    yield from _iter_serial(file_path)
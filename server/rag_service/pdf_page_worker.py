@@ -0,0 +1,34 @@
+# server/rag_service/pdf_page_worker.py
+"""
+Pool-process side of pdf_extraction. Imports only pdfplumber, so worker_pools can preload it
+in the forkserver and page-range workers start without importing the app or config.
+"""
+from typing import Any, List, Optional, Tuple
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+# (0-based page index, raw extract_text() output, extract_tables() output)
+PageResult = Tuple[int, Optional[str], List[List[List[Any]]]]
+
+
+def extract_page(page: Any, page_index: int) -> PageResult:
+    page_text = page.extract_text(x_tolerance=1, y_tolerance=1.5, layout=False) # layout=False for more raw text
+    return page_index, page_text, page.extract_tables()
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> Tuple[List[PageResult], Optional[str]]:
+    """
+    Extracts pages [start, end). Returns the pages done and, if a page failed, the error so the
+    caller can raise it after yielding the pages before it.
+    """
+    pages: List[PageResult] = []
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            for page_index in range(start, end):
+                pages.append(extract_page(pdf.pages[page_index], page_index))
+    except Exception as e:
+        return pages, f"{type(e).__name__}: {e}"
+    return pages, None
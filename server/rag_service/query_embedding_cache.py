@@ -0,0 +1,155 @@
+# server/rag_service/query_embedding_cache.py
+"""
+Two-tier cache for query embeddings used by VectorDBService.search_documents.
+
+Tier 1 is a bounded in-process LRU. Tier 2 (optional) is Redis, shared by all workers and the
+Node server's Redis instance, enabled when REDIS_URL is set and the 'redis' package is installed.
+Keys are derived from the model name, embedding backend and the normalized query text.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+import config
+
+logger = logging.getLogger(__name__)
+
+QUERY_EMBED_CACHE_LOOKUPS = Counter(
+    'rag_query_embedding_cache_lookups_total',
+    'Query embedding cache lookups by result (local_hit, shared_hit, miss).',
+    ['result']
+)
+QUERY_EMBED_CACHE_HIT_RATIO = Gauge(
+    'rag_query_embedding_cache_hit_ratio',
+    'Fraction of query embedding lookups served from cache since this worker started.',
+    multiprocess_mode='livemax'
+)
+
+_REDIS_KEY_PREFIX = "rag:qemb:"
+
+
+def normalize_query(query: str) -> str:
+    normalized = " ".join(query.split())
+    return normalized.lower() if config.QUERY_EMBED_CACHE_CASEFOLD else normalized
+
+
+class QueryEmbeddingCache:
+    def __init__(self, model_name: str, max_entries: int, redis_client: Any = None, redis_ttl_seconds: int = 0):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.redis_client = redis_client
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _key(self, query: str) -> str:
+        material = f"{self.model_name}|{config.EMBEDDING_VARIANT}|{normalize_query(query)}"
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _record(self, result: str) -> None:
+        QUERY_EMBED_CACHE_LOOKUPS.labels(result=result).inc()
+        with self._lock:
+            hits, lookups = self.local_hits + self.shared_hits, self.local_hits + self.shared_hits + self.misses
+        if lookups:
+            QUERY_EMBED_CACHE_HIT_RATIO.set(hits / lookups)
+
+    def _remember(self, key: str, vector: np.ndarray, result: str) -> None:
+        """Stores vector and counts the lookup (shared_hit or miss) under the same lock as the LRU."""
+        with self._lock:
+            if result == 'shared_hit':
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _shared_get(self, key: str) -> Optional[np.ndarray]:
+        if self.redis_client is None:
+            return None
+        try:
+            blob = self.redis_client.get(_REDIS_KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"Query embedding cache: Redis lookup failed: {e}")
+            return None
+        return np.frombuffer(blob, dtype=np.float32).copy() if blob else None
+
+    def _shared_put(self, key: str, vector: np.ndarray) -> None:
+        if self.redis_client is None:
+            return
+        try:
+            self.redis_client.set(_REDIS_KEY_PREFIX + key, np.asarray(vector, dtype=np.float32).tobytes(),
+                                  ex=self.redis_ttl_seconds or None)
+        except Exception as e:
+            logger.warning(f"Query embedding cache: Redis store failed: {e}")
+
+    def get_or_compute(self, query: str, compute: Callable[[str], np.ndarray]) -> np.ndarray:
+        key = self._key(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.local_hits += 1
+        if vector is not None:
+            self._record('local_hit')
+            return vector
+
+        vector = self._shared_get(key)
+        if vector is not None:
+            self._remember(key, vector, 'shared_hit')
+            self._record('shared_hit')
+            return vector
+
+        vector = np.asarray(compute(query), dtype=np.float32)
+        self._remember(key, vector, 'miss')
+        self._record('miss')
+        self._shared_put(key, vector)
+        return vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, local_hits, shared_hits, misses = len(self._entries), self.local_hits, self.shared_hits, self.misses
+        lookups = local_hits + shared_hits + misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'shared_tier': self.redis_client is not None,
+            'local_hits': local_hits,
+            'shared_hits': shared_hits,
+            'misses': misses,
+            'hit_ratio': ((local_hits + shared_hits) / lookups) if lookups else 0.0,
+        }
+
+
+def _create_redis_client() -> Any:
+    if not config.REDIS_URL:
+        return None
+    if not config.REDIS_AVAILABLE:
+        logger.warning("REDIS_URL is set but the 'redis' package is not installed; query embedding cache stays in-process.")
+        return None
+    try:
+        # redis-py connects lazily and reconnects per command, so the client is safe to create before fork.
+        return config.redis.Redis.from_url(config.REDIS_URL, socket_timeout=0.05, socket_connect_timeout=0.2)
+    except Exception as e:
+        logger.warning(f"Could not create Redis client for the query embedding cache: {e}")
+        return None
+
+
+def create_query_embedding_cache(model_name: str) -> Optional[QueryEmbeddingCache]:
+    """Builds the cache from config, or returns None when QUERY_EMBED_CACHE_MAX_ENTRIES is 0."""
+    if config.QUERY_EMBED_CACHE_MAX_ENTRIES <= 0:
+        return None
+    redis_client = _create_redis_client() if config.QUERY_EMBED_CACHE_SHARED else None
+    logger.info(f"Query embedding cache: {config.QUERY_EMBED_CACHE_MAX_ENTRIES} local entries, "
+                f"shared Redis tier {'on' if redis_client is not None else 'off'}.")
+    return QueryEmbeddingCache(model_name, config.QUERY_EMBED_CACHE_MAX_ENTRIES,
+                               redis_client=redis_client, redis_ttl_seconds=config.QUERY_EMBED_CACHE_REDIS_TTL)
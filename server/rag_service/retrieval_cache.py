@@ -0,0 +1,191 @@
+# server/rag_service/retrieval_cache.py
+"""
+Result cache for /query, invalidated by per-document version counters.
+
+Every cache key embeds the current version of the scopes the result depends on:
+  - with a documentContextName: 'doc:<name>' (the vector filter is on file_name only)
+    and 'user_doc:<user>:<name>' (the KG lookup is per user and document);
+  - without one: 'global' (the vector search spans every document).
+Writes (/add_document, /delete_qdrant_document_data, /kg POST/DELETE) bump all three scopes,
+so an old entry can never be looked up again once its inputs changed. Version counters live in
+SQLite so every gunicorn worker sees the bump; the results themselves are cached per process.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_CACHE_LOOKUPS = Counter(
+    'rag_retrieval_cache_lookups_total',
+    '/query retrieval cache lookups by result (hit, miss, bypass).',
+    ['result']
+)
+RETRIEVAL_CACHE_INVALIDATIONS = Counter(
+    'rag_retrieval_cache_invalidations_total',
+    'Document version bumps that invalidated cached /query results.'
+)
+
+GLOBAL_SCOPE = "global"
+
+
+def _document_scope(document_name: str) -> str:
+    return f"doc:{document_name}"
+
+
+def _user_document_scope(user_id: str, document_name: str) -> str:
+    return f"user_doc:{user_id}:{document_name}"
+
+
+class DocumentVersionStore:
+    """Monotonic version counters per scope, shared by all processes through a SQLite (WAL) file."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS versions (scope TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get_versions(self, scopes: List[str]) -> Tuple[int, ...]:
+        rows = self._connection().execute(
+            f"SELECT scope, version FROM versions WHERE scope IN ({','.join('?' * len(scopes))})", scopes
+        ).fetchall()
+        found = dict(rows)
+        return tuple(found.get(scope, 0) for scope in scopes)
+
+    def bump(self, scopes: List[str]) -> None:
+        conn = self._connection()
+        with conn:
+            conn.executemany("INSERT INTO versions (scope, version) VALUES (?, 1) "
+                             "ON CONFLICT(scope) DO UPDATE SET version = version + 1", [(s,) for s in scopes])
+
+
+class RetrievalCache:
+    def __init__(self, version_store: DocumentVersionStore, max_entries: int, ttl_seconds: float):
+        self.version_store = version_store
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, user_id: str, document_name: Optional[str], query: str, k: Any, use_kg: bool) -> str:
+        if document_name:
+            scopes = [_document_scope(document_name), _user_document_scope(user_id, document_name)]
+        else:
+            scopes = [GLOBAL_SCOPE]
+        versions = self.version_store.get_versions(scopes)
+        material = "\x1f".join([str(user_id), document_name or "", " ".join(query.split()), str(k),
+                                "kg" if use_kg else "", *scopes, *map(str, versions)])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        RETRIEVAL_CACHE_LOOKUPS.labels(result='miss' if entry is None else 'hit').inc()
+        return None if entry is None else entry[1]
+
+    def put(self, key: str, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_document(self, user_id: str, document_name: str) -> None:
+        self.version_store.bump([GLOBAL_SCOPE, _document_scope(document_name),
+                                 _user_document_scope(user_id, document_name)])
+        RETRIEVAL_CACHE_INVALIDATIONS.inc()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+_cache: Optional[RetrievalCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache() -> Optional[RetrievalCache]:
+    """The process-wide cache, or None when RETRIEVAL_CACHE_ENABLED is off or the version store can't be opened."""
+    global _cache
+    if not config.RETRIEVAL_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    store = DocumentVersionStore(config.RETRIEVAL_CACHE_VERSION_DB)
+                except sqlite3.Error as e:
+                    logger.error(f"Retrieval cache disabled: cannot open version store {config.RETRIEVAL_CACHE_VERSION_DB}: {e}")
+                    return None
+                _cache = RetrievalCache(store, config.RETRIEVAL_CACHE_MAX_ENTRIES, config.RETRIEVAL_CACHE_TTL_SECONDS)
+                logger.info(f"Retrieval cache enabled ({config.RETRIEVAL_CACHE_MAX_ENTRIES} entries, "
+                            f"TTL {config.RETRIEVAL_CACHE_TTL_SECONDS}s).")
+    return _cache
+
+
+def lookup(user_id: str, document_name: Optional[str], query: str, k: Any, use_kg: bool) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """Returns (cache key, cached payload or None). The key is None when caching is unavailable."""
+    cache = get_retrieval_cache()
+    if cache is None:
+        return None, None
+    try:
+        key = cache.make_key(user_id, document_name, query, k, use_kg)
+    except sqlite3.Error as e:
+        # Without a trustworthy version we can't tell whether an entry is stale, so don't cache at all.
+        logger.warning(f"Retrieval cache bypassed, version lookup failed: {e}")
+        RETRIEVAL_CACHE_LOOKUPS.labels(result='bypass').inc()
+        return None, None
+    return key, cache.get(key)
+
+
+def store(key: Optional[str], payload: Dict[str, Any]) -> None:
+    cache = get_retrieval_cache()
+    if cache is not None and key is not None:
+        cache.put(key, payload)
+
+
+def invalidate_document(user_id: str, document_name: str) -> None:
+    cache = get_retrieval_cache()
+    if cache is None:
+        return
+    try:
+        cache.invalidate_document(user_id, document_name)
+    except sqlite3.Error as e:
+        logger.error(f"Retrieval cache: failed to invalidate '{document_name}' for user '{user_id}': {e}")
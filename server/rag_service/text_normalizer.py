@@ -0,0 +1,136 @@
+# server/rag_service/text_normalizer.py
+"""
+Precompiled text normalization for ai_core.clean_and_analyze_text_content and
+reconstruct_document_layout. Output is identical to the original chain of re.sub calls
+(benchmarks/bench_text_normalizer.py checks this against a copy of that chain).
+
+Each rule was a full pass (and a full copy) over multi-megabyte strings. Here:
+  - a rule is skipped when the text cannot match it (no '<', '@', '&', 'http' or 'www'),
+    checked with C-speed substring tests; extracted PDF text rarely contains HTML or URLs;
+  - e-mail, entity and hyphenation rules, whose patterns retried (and backtracked) from every
+    character ('\\S*@', '\\s*&', '(\\w+)-'), start from str.find / a literal match on their anchor
+    character instead and expand around it, producing the same matches;
+  - '[\\n\\r\\t]+' -> ' ', '\\s+' -> ' ' and strip() per paragraph are one str.split() / join;
+  - '\\s{2,}' is written '\\s\\s+', which the regex engine scans faster.
+
+The HTML/URL/e-mail/entity rules are not merged into one alternation: applied in sequence they
+see each other's output (a tag removed before a URL is cut at it), and one left-to-right scan
+would give different text for overlapping constructs.
+"""
+import re
+from typing import List
+
+_SCRIPT_OR_STYLE_START = re.compile(r'<(?:script|style)', re.I)
+_SCRIPT_OR_STYLE = re.compile(r'<script[^>]*>.*?</script>|<style[^>]*>.*?</style>', re.I | re.S)
+_HTML_TAG = re.compile(r'<[^>]+>')
+_URL = re.compile(r'(?:http|www)\S+') # 'https\S+' is covered by 'http\S+'
+_ENTITY_BODY = re.compile(r'\w+;')
+_WHITESPACE = re.compile(r'\s*')
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_DISALLOWED_CHARS = re.compile(r'[^a-zA-Z0-9\s.,!?-]+')
+_DASH_LINE_BREAK = re.compile(r'-\s*\n\s*')
+_WORD_RUN = re.compile(r'\w+')
+_WHITESPACE_RUN = re.compile(r'\s\s+')
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_' # what \w matches in a str pattern
+
+
+def _remove_emails(text: str) -> str:
+    """Same as re.sub(r'\\S*@\\S*\\s?', '', text): every non-space run containing '@' and one following whitespace character."""
+    parts: List[str] = []
+    done = 0
+    at = text.find('@')
+    while at != -1:
+        start = at
+        while start > done and not text[start - 1].isspace():
+            start -= 1
+        end = at + 1
+        while end < len(text) and not text[end].isspace():
+            end += 1
+        if end < len(text):
+            end += 1
+        parts.append(text[done:start])
+        done = end
+        at = text.find('@', done)
+    if not parts:
+        return text
+    parts.append(text[done:])
+    return "".join(parts)
+
+
+def _replace_html_entities(text: str) -> str:
+    """Same as re.sub(r'\\s*&\\w+;\\s*', ' ', text)."""
+    parts: List[str] = []
+    done = 0
+    amp = text.find('&')
+    while amp != -1:
+        body = _ENTITY_BODY.match(text, amp + 1)
+        if body is None:
+            amp = text.find('&', amp + 1)
+            continue
+        start = amp
+        while start > done and text[start - 1].isspace():
+            start -= 1
+        parts.append(text[done:start])
+        parts.append(' ')
+        done = _WHITESPACE.match(text, body.end()).end()
+        amp = text.find('&', done)
+    if not parts:
+        return text
+    parts.append(text[done:])
+    return "".join(parts)
+
+
+def strip_markup(text: str) -> str:
+    """Removes script/style blocks, HTML tags, URLs, e-mail addresses and HTML entities (in that order)."""
+    if '<' in text:
+        if _SCRIPT_OR_STYLE_START.search(text):
+            text = _SCRIPT_OR_STYLE.sub(' ', text)
+        text = _HTML_TAG.sub(' ', text)
+    if 'http' in text or 'www' in text:
+        text = _URL.sub('', text)
+    if '@' in text:
+        text = _remove_emails(text)
+    if '&' in text:
+        text = _replace_html_entities(text)
+    return text
+
+
+def clean_paragraphs(text: str) -> List[str]:
+    """
+    strip_markup, then per paragraph (split at blank lines): whitespace runs become one space,
+    characters outside [a-zA-Z0-9 .,!?-] are dropped, and the ends are stripped. Empty paragraphs
+    are left out; case is kept.
+    """
+    paragraphs = []
+    for paragraph in _PARAGRAPH_BREAK.split(strip_markup(text)):
+        paragraph = _DISALLOWED_CHARS.sub('', " ".join(paragraph.split())).strip()
+        if paragraph:
+            paragraphs.append(paragraph)
+    return paragraphs
+
+
+def join_hyphenated_line_breaks(text: str) -> str:
+    """'exam-\\n ple' -> 'example'. Same as re.sub(r'(\\w+)-\\s*\\n\\s*(\\w+)', r'\\1\\2', text)."""
+    parts: List[str] = []
+    done = 0
+    for line_break in _DASH_LINE_BREAK.finditer(text):
+        dash, after = line_break.start(), line_break.end()
+        # The regex needs a word before the dash that it has not consumed yet ('a-\\nb-\\nc' -> 'ab-\\nc'),
+        # and a word after the line break.
+        if dash <= done or not _is_word_char(text[dash - 1]) or after >= len(text) or not _is_word_char(text[after]):
+            continue
+        parts.append(text[done:dash])
+        done = _WORD_RUN.match(text, after).end()
+        parts.append(text[after:done])
+    if not parts:
+        return text
+    parts.append(text[done:])
+    return "".join(parts)
+
+
+def collapse_whitespace(text: str) -> str:
+    """Runs of two or more whitespace characters become one space; the ends are stripped."""
+    return _WHITESPACE_RUN.sub(' ', text).strip()
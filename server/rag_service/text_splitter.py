@@ -0,0 +1,187 @@
+# server/rag_service/text_splitter.py
+"""
+Recursive character splitter used by ai_core.chunk_document_into_segments (replaces LangChain's
+RecursiveCharacterTextSplitter, which pulled langchain into every ingestion process).
+
+Same separator semantics as RecursiveCharacterTextSplitter(keep_separator=True,
+strip_whitespace=True): a span is cut at the first separator in the list that occurs in it, each
+separator stays at the start of the piece that follows it, pieces shorter than chunk_size are
+merged up to chunk_size with chunk_overlap carried into the next chunk, and pieces that are still
+too long are cut with the next separator. For the same text and settings the chunks are identical.
+
+The splitter works on (start, end) character offsets into the original text: separators are found
+with str.find inside the span, pieces and merged chunks are index pairs, and no substring is built
+until split_text() slices the final chunks. Offsets let callers map a chunk back to its position
+(and so its page) in the document text.
+
+TokenTextSplitter measures the same pieces in tokens of an embedding model's fast tokenizer: the
+whole text is tokenized once, in batches of blocks, and the length of a span is the number of
+tokens that start inside it (two bisects over the token start offsets).
+"""
+import logging
+from bisect import bisect_left
+from collections import deque
+from typing import Any, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (start, end) character offsets into the text being split, end exclusive
+Span = Tuple[int, int]
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", ". ", " ", "")
+
+
+class RecursiveTextSplitter:
+    def __init__(self, chunk_size: int, chunk_overlap: int, separators: Optional[Sequence[str]] = None):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}.")
+        if chunk_overlap < 0 or chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be between 0 and chunk_size ({chunk_size}).")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators) if separators else DEFAULT_SEPARATORS
+
+    def span_length(self, text: str, start: int, end: int) -> int:
+        """Length of text[start:end] as compared against chunk_size and chunk_overlap."""
+        return end - start
+
+    def split_offsets(self, text: str) -> List[Span]:
+        """(start, end) offsets of every chunk, in order; text[start:end] is the chunk."""
+        spans: List[Span] = []
+        if text:
+            self._split_span(text, 0, len(text), 0, spans)
+        return spans
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def _split_span(self, text: str, start: int, end: int, level: int, out: List[Span]) -> None:
+        # The first separator (from `level` on) that occurs in the span; "" means single characters.
+        separator, next_level = self.separators[-1], None
+        for i in range(level, len(self.separators)):
+            candidate = self.separators[i]
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                next_level = i + 1 if i + 1 < len(self.separators) else None
+                break
+
+        good: List[Tuple[int, int, int]] = [] # consecutive pieces short enough to merge: (start, end, length)
+        for piece_start, piece_end in self._pieces(text, start, end, separator):
+            length = self.span_length(text, piece_start, piece_end)
+            if length < self.chunk_size:
+                good.append((piece_start, piece_end, length))
+                continue
+            if good:
+                self._merge(text, good, out)
+                good = []
+            if next_level is None:
+                out.append((piece_start, piece_end)) # nothing left to cut with; kept as is
+            else:
+                self._split_span(text, piece_start, piece_end, next_level, out)
+        if good:
+            self._merge(text, good, out)
+
+    @staticmethod
+    def _pieces(text: str, start: int, end: int, separator: str) -> List[Span]:
+        """Non-empty pieces of the span, each (after the first) starting with its separator."""
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+        pieces: List[Span] = []
+        piece_start, step = start, len(separator)
+        position = text.find(separator, start, end)
+        while position != -1:
+            if position > piece_start:
+                pieces.append((piece_start, position))
+            piece_start = position
+            position = text.find(separator, position + step, end)
+        if end > piece_start:
+            pieces.append((piece_start, end))
+        return pieces
+
+    def _merge(self, text: str, pieces: List[Tuple[int, int, int]], out: List[Span]) -> None:
+        """Packs consecutive pieces into chunks of at most chunk_size, overlapping by up to chunk_overlap."""
+        current: deque = deque()
+        total = 0
+        for piece in pieces:
+            length = piece[2]
+            if total + length > self.chunk_size:
+                if total > self.chunk_size:
+                    logger.warning(f"Created a chunk of size {total}, which is longer than the specified {self.chunk_size}")
+                if current:
+                    self._emit(text, current[0][0], current[-1][1], out)
+                    while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                        total -= current.popleft()[2]
+            current.append(piece)
+            total += length
+        if current:
+            self._emit(text, current[0][0], current[-1][1], out)
+
+    @staticmethod
+    def _emit(text: str, start: int, end: int, out: List[Span]) -> None:
+        # Pieces are contiguous, so the merged chunk is one span; strip it like str.strip() would.
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            out.append((start, end))
+
+
+class TokenTextSplitter(RecursiveTextSplitter):
+    """
+    chunk_size and chunk_overlap count tokens of `tokenizer` (a Hugging Face fast tokenizer, which
+    can report character offsets). Keeps per-call state: use one instance per thread.
+    """
+
+    def __init__(self, tokenizer: Any, chunk_size: int, chunk_overlap: int, separators: Optional[Sequence[str]] = None,
+                 block_chars: int = 8000, batch_size: int = 64):
+        super().__init__(chunk_size, chunk_overlap, separators)
+        if not getattr(tokenizer, 'is_fast', False):
+            raise ValueError("TokenTextSplitter needs a fast tokenizer (offset mappings).")
+        self.tokenizer = tokenizer
+        self.block_chars = block_chars
+        self.batch_size = batch_size
+        self._token_starts: List[int] = []
+
+    def split_offsets(self, text: str) -> List[Span]:
+        self._token_starts = self.token_start_offsets(text)
+        try:
+            return super().split_offsets(text)
+        finally:
+            self._token_starts = []
+
+    def span_length(self, text: str, start: int, end: int) -> int:
+        return bisect_left(self._token_starts, end) - bisect_left(self._token_starts, start)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.token_start_offsets(text))
+
+    def token_start_offsets(self, text: str) -> List[int]:
+        """Sorted character offset at which each token of text starts (special tokens excluded)."""
+        blocks = self._blocks(text)
+        starts: List[int] = []
+        for batch_start in range(0, len(blocks), self.batch_size):
+            batch = blocks[batch_start:batch_start + self.batch_size]
+            encoded = self.tokenizer([text[start:end] for start, end in batch], add_special_tokens=False,
+                                     return_offsets_mapping=True, return_attention_mask=False,
+                                     return_token_type_ids=False, verbose=False)
+            for (block_start, _), offsets in zip(batch, encoded['offset_mapping']):
+                starts.extend(block_start + token_start for token_start, token_end in offsets if token_end > token_start)
+        return starts
+
+    def _blocks(self, text: str) -> List[Span]:
+        """Cuts text into spans of about block_chars, at whitespace so no word is split between blocks."""
+        blocks: List[Span] = []
+        start = 0
+        while start < len(text):
+            end = min(len(text), start + self.block_chars)
+            if end < len(text):
+                cut = max(text.rfind(' ', start, end), text.rfind('\n', start, end))
+                if cut > start:
+                    end = cut
+            blocks.append((start, end))
+            start = end
+        return blocks
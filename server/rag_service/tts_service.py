@@ -1,34 +1,38 @@
 # server/rag_service/tts_service.py
-import torch
-from TTS.api import TTS
 import logging
 from pydub import AudioSegment
 import io
 import os
 
+import model_registry
+
 logger = logging.getLogger(__name__)
 
 # --- Model Configuration ---
 # Using the dedicated Indian English model.
 MODEL_NAME = "tts_models/en/ljspeech/vits--neon"
 
-tts_instance = None
+def load_tts_model():
+    """
+    Builds the Coqui TTS model. Called by the model registry on first use,
+    so torch and TTS are only imported by processes that actually synthesize speech.
+    """
+    import torch
+    from TTS.api import TTS
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    logger.info(f"Initializing Coqui TTS with Indian English model '{MODEL_NAME}' on device: {device}")
+    tts_model = TTS(MODEL_NAME).to(device)
+    logger.info("Coqui TTS Indian English model loaded successfully and is ready for synthesis.")
+    return tts_model
 
 def initialize_tts():
     """
-    Initializes the Coqui TTS model once at application startup.
+    Eagerly loads the Coqui TTS model through the model registry.
+    Only needed by deployments that want TTS ready before the first podcast request.
     """
-    global tts_instance
-    if tts_instance is None:
-        try:
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            logger.info(f"Initializing Coqui TTS with Indian English model '{MODEL_NAME}' on device: {device}")
-            
-            tts_instance = TTS(MODEL_NAME).to(device)
-            
-            logger.info("Coqui TTS Indian English model loaded successfully and is ready for synthesis.")
-        except Exception as e:
-            logger.critical(f"FATAL: Could not initialize Coqui TTS model. High-quality podcast generation will be unavailable. Error: {e}", exc_info=True)
+    if model_registry.get_model('tts') is None:
+        logger.critical("FATAL: Could not initialize Coqui TTS model. High-quality podcast generation will be unavailable.")
 
 def synthesize_speech(text: str, speaker: str) -> AudioSegment:
     """
@@ -42,6 +46,7 @@ def synthesize_speech(text: str, speaker: str) -> AudioSegment:
     Returns:
         AudioSegment: A pydub AudioSegment object of the synthesized speech.
     """
+    tts_instance = model_registry.get_model('tts')
     if tts_instance is None:
         raise RuntimeError("TTS service is not initialized. High-quality synthesis is unavailable.")
     
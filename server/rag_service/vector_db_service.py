@@ -3,12 +3,14 @@ import logging
 from typing import List, Dict, Tuple, Optional, Any
 
 from qdrant_client import QdrantClient, models
-from sentence_transformers import SentenceTransformer
 
 # Assuming vector_db_service.py and config.py are in the same package directory (e.g., rag_service/)
 # and you run your application as a module (e.g., python -m rag_service.main_app)
 # or have otherwise correctly set up the Python path.
 import config # Changed to relative import
+import embedding_service
+from embedding_batcher import create_query_batcher
+from query_embedding_cache import create_query_embedding_cache
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -34,49 +36,61 @@ class VectorDBService:
         self.vector_dim = config.QDRANT_COLLECTION_VECTOR_DIM
         logger.info(f"  Service expects Vector Dim for Qdrant collection: {self.vector_dim} (from document model config)")
 
+        self.client = self._create_client()
+
+        # The query encoder is shared with ai_core's document encoder when both use the same model,
+        # and the weights themselves are only loaded on the first search (see model_registry.py).
+        # Its output dimension MUST match self.vector_dim (QDRANT_COLLECTION_VECTOR_DIM).
+        self.encoder = embedding_service.get_query_encoder()
+        # Concurrent searches share forward passes instead of encoding one query at a time.
+        self.query_batcher = create_query_batcher(self.encoder)
+        self.query_embedding_cache = create_query_embedding_cache(self.encoder.model_name)
+        self._encoder_dim_verified = False
+
+        self.collection_name = config.QDRANT_COLLECTION_NAME
+        self.documents_collection_name = config.QDRANT_DOCUMENTS_COLLECTION_NAME
+        # No ThreadPoolExecutor needed here if document encoding is external
+
+    def _create_client(self) -> QdrantClient:
         if config.QDRANT_URL:
-            self.client = QdrantClient(
+            return QdrantClient(
                 url=config.QDRANT_URL,
                 api_key=config.QDRANT_API_KEY,
                 timeout=30
             )
-        else:
-            self.client = QdrantClient(
-                host=config.QDRANT_HOST,
-                port=config.QDRANT_PORT,
-                api_key=config.QDRANT_API_KEY,
-                timeout=30
-            )
-
-        try:
-            # This model is for encoding search queries.
-            # Its output dimension MUST match self.vector_dim (QDRANT_COLLECTION_VECTOR_DIM).
-            logger.info(f"  Loading query embedding model: '{config.QUERY_EMBEDDING_MODEL_NAME}'")
-            self.model = SentenceTransformer(config.QUERY_EMBEDDING_MODEL_NAME)
-            model_embedding_dim = self.model.get_sentence_embedding_dimension()
-            logger.info(f"  Query model loaded. Output dimension: {model_embedding_dim}")
-
-            if model_embedding_dim != self.vector_dim:
-                error_msg = (
-                    f"CRITICAL DIMENSION MISMATCH: Query model '{config.QUERY_EMBEDDING_MODEL_NAME}' "
-                    f"outputs embeddings of dimension {model_embedding_dim}, but the Qdrant collection "
-                    f"is configured for dimension {self.vector_dim} (derived from document model: "
-                    f"'{config.DOCUMENT_EMBEDDING_MODEL_NAME}'). Search functionality will fail. "
-                    "Ensure query and document models produce compatible embedding dimensions, "
-                    "or environment variables for dimensions are correctly set."
-                )
-                logger.error(error_msg)
-                raise ValueError(error_msg) # Critical error, stop initialization
-            else:
-                logger.info(f"  Query model output dimension ({model_embedding_dim}) matches "
-                            f"Qdrant collection dimension ({self.vector_dim}).")
-
-        except Exception as e:
-            logger.error(f"Error initializing SentenceTransformer model '{config.QUERY_EMBEDDING_MODEL_NAME}' for query encoding: {e}", exc_info=True)
-            raise # Re-raise to prevent service startup with a non-functional query encoder
+        return QdrantClient(
+            host=config.QDRANT_HOST,
+            port=config.QDRANT_PORT,
+            api_key=config.QDRANT_API_KEY,
+            timeout=30
+        )
 
-        self.collection_name = config.QDRANT_COLLECTION_NAME
-        # No ThreadPoolExecutor needed here if document encoding is external
+    def reconnect(self):
+        """Replaces the Qdrant client with a fresh one (e.g. in a worker process after fork)."""
+        logger.info("VectorDBService: Re-creating Qdrant client.")
+        self.client = self._create_client()
+
+    def _verify_query_encoder(self):
+        """Checks the loaded query model's real output dimension once, on first use."""
+        if self._encoder_dim_verified:
+            return
+        model_embedding_dim = self.encoder.get_sentence_embedding_dimension()
+        if model_embedding_dim is None:
+            raise RuntimeError(f"Query embedding model '{config.QUERY_EMBEDDING_MODEL_NAME}' could not be loaded.")
+        if model_embedding_dim != self.vector_dim:
+            error_msg = (
+                f"CRITICAL DIMENSION MISMATCH: Query model '{config.QUERY_EMBEDDING_MODEL_NAME}' "
+                f"outputs embeddings of dimension {model_embedding_dim}, but the Qdrant collection "
+                f"is configured for dimension {self.vector_dim} (derived from document model: "
+                f"'{config.DOCUMENT_EMBEDDING_MODEL_NAME}'). Search functionality will fail. "
+                "Ensure query and document models produce compatible embedding dimensions, "
+                "or environment variables for dimensions are correctly set."
+            )
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        logger.info(f"Query model output dimension ({model_embedding_dim}) matches "
+                    f"Qdrant collection dimension ({self.vector_dim}).")
+        self._encoder_dim_verified = True
 
     def _recreate_qdrant_collection(self):
         logger.info(f"Attempting to (re)create collection '{self.collection_name}' with vector size {self.vector_dim}.")
@@ -93,7 +107,32 @@ class VectorDBService:
             logger.error(f"Failed to (re)create collection '{self.collection_name}': {e_recreate}", exc_info=True)
             raise
 
+    def _setup_documents_collection(self):
+        """Payload-only document records; the 1-dim vector is a placeholder Qdrant requires."""
+        try:
+            self.client.get_collection(collection_name=self.documents_collection_name)
+        except Exception:
+            logger.info(f"Creating document record collection '{self.documents_collection_name}'.")
+            self.client.create_collection(
+                collection_name=self.documents_collection_name,
+                vectors_config=models.VectorParams(size=1, distance=models.Distance.DOT),
+            )
+
+    def _create_payload_indexes(self):
+        # Keyword indexes on the compact chunk payload fields that searches and deletes filter on.
+        for field_name in ('user_id', 'file_name', 'doc_id'):
+            try:
+                self.client.create_payload_index(collection_name=self.collection_name, field_name=field_name,
+                                                 field_schema=models.PayloadSchemaType.KEYWORD)
+            except Exception as e:
+                logger.warning(f"Could not create payload index on '{field_name}': {e}")
+
     def setup_collection(self):
+        self._setup_chunk_collection()
+        self._create_payload_indexes()
+        self._setup_documents_collection()
+
+    def _setup_chunk_collection(self):
         try:
             collection_info = self.client.get_collection(collection_name=self.collection_name)
             logger.info(f"Collection '{self.collection_name}' already exists.")
@@ -206,7 +245,11 @@ class VectorDBService:
             logger.info("No filter applied for search.")
 
         try:
-            query_embedding = self.model.encode(query).tolist()
+            self._verify_query_encoder()
+            if self.query_embedding_cache is not None:
+                query_embedding = self.query_embedding_cache.get_or_compute(query, self.query_batcher.encode).tolist()
+            else:
+                query_embedding = self.query_batcher.encode(query).tolist()
             logger.debug(f"Generated query_embedding (length: {len(query_embedding)}, first 5 dims: {query_embedding[:5]})")
 
             search_results = self.client.search(
@@ -279,6 +322,95 @@ class VectorDBService:
     
     # Add this method to the VectorDBService class in vector_db_service.py
 
+    def _document_filter(self, user_id: str, document_name: str) -> models.Filter:
+        return models.Filter(
+            must=[
+                models.FieldCondition(key="user_id", match=models.MatchValue(value=user_id)),
+                models.FieldCondition(key="file_name", match=models.MatchValue(value=document_name))
+            ]
+        )
+
+    def update_document_payload(self, user_id: str, document_name: str, payload_updates: Dict[str, Any]) -> None:
+        """Sets payload fields on every chunk of one user's document."""
+        self.client.set_payload(
+            collection_name=self.collection_name,
+            payload=payload_updates,
+            points=models.FilterSelector(filter=self._document_filter(user_id, document_name)),
+            wait=True
+        )
+        logger.info(f"Updated payload fields {sorted(payload_updates)} for document '{document_name}', user '{user_id}'.")
+
+    def upsert_document_record(self, document_record: Dict[str, Any]) -> None:
+        """Stores a document's metadata record once (point id = its doc_id), replacing any previous version."""
+        self.client.upsert(
+            collection_name=self.documents_collection_name,
+            points=[models.PointStruct(id=document_record['doc_id'], vector=[1.0], payload=document_record)],
+            wait=True
+        )
+        logger.info(f"Stored document record for '{document_record.get('file_name')}', user '{document_record.get('user_id')}'.")
+
+    def delete_document_record(self, user_id: str, document_name: str) -> None:
+        self.client.delete(
+            collection_name=self.documents_collection_name,
+            points_selector=models.FilterSelector(filter=self._document_filter(user_id, document_name)),
+            wait=True
+        )
+
+    def get_document_record(self, user_id: str, document_name: str) -> Optional[Dict[str, Any]]:
+        points, _ = self.client.scroll(
+            collection_name=self.documents_collection_name,
+            scroll_filter=self._document_filter(user_id, document_name),
+            limit=1,
+            with_payload=True,
+            with_vectors=False
+        )
+        return points[0].payload if points else None
+
+    def get_document_chunk_fingerprints(self, user_id: str, document_name: str) -> List[Dict[str, Any]]:
+        """id, chunk_fingerprint and position fields of every stored chunk of one user's document (no vectors or text)."""
+        qdrant_filter = self._document_filter(user_id, document_name)
+        records, offset = [], None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=qdrant_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=['chunk_fingerprint', 'chunk_index', 'chunk_start_char', 'chunk_end_char'],
+                with_vectors=False
+            )
+            for point in points:
+                payload = point.payload or {}
+                records.append({'id': str(point.id), 'chunk_fingerprint': payload.get('chunk_fingerprint'),
+                                'chunk_index': payload.get('chunk_index'),
+                                'chunk_start_char': payload.get('chunk_start_char'),
+                                'chunk_end_char': payload.get('chunk_end_char')})
+            if offset is None:
+                return records
+
+    def set_chunk_payloads(self, payloads_by_id: Dict[str, Dict[str, Any]]) -> None:
+        """Sets payload fields point by point in one batched request; vectors are left as they are."""
+        if not payloads_by_id:
+            return
+        self.client.batch_update_points(
+            collection_name=self.collection_name,
+            update_operations=[
+                models.SetPayloadOperation(set_payload=models.SetPayload(payload=payload, points=[point_id]))
+                for point_id, payload in payloads_by_id.items()
+            ],
+            wait=True
+        )
+
+    def delete_points(self, point_ids: List[str]) -> None:
+        if not point_ids:
+            return
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.PointIdsList(points=point_ids),
+            wait=True
+        )
+        logger.info(f"Deleted {len(point_ids)} points from Qdrant collection '{self.collection_name}'.")
+
     def delete_document_vectors(self, user_id: str, document_name: str) -> Dict[str, Any]:
         logger.info(f"Attempting to delete vectors for document: '{document_name}', user: '{user_id}' from Qdrant collection '{self.collection_name}'.")
         
@@ -316,6 +448,11 @@ class VectorDBService:
             
             # Check the status of the delete operation
             # delete_result should be an UpdateResult object
+            try:
+                self.delete_document_record(user_id, document_name)
+            except Exception as e_record:
+                logger.warning(f"Could not delete document record for '{document_name}', user '{user_id}': {e_record}")
+
             if delete_result.status == models.UpdateStatus.COMPLETED or delete_result.status == models.UpdateStatus.ACKNOWLEDGED:
                 # The actual number of deleted points isn't directly returned by filter-based delete.
                 # We can infer it was successful if no error.
@@ -0,0 +1,172 @@
+# server/rag_service/warmup.py
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import config
+import model_registry
+import embedding_service
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEXTS = [
+    "Warm-up.",
+    "This is a warm-up sentence used to run a first forward pass through the model before real traffic arrives.",
+    " ".join(["Longer warm-up input so the kernels for bigger sequence lengths are compiled as well."] * 8),
+]
+
+# --- Per-model warm-up routines (run once, after the model has loaded) ---
+def _warm_embedding(encoder: embedding_service.SharedEncoder) -> None:
+    # Encode a few different lengths and batch sizes so the common shapes are compiled up front.
+    # Goes through the shared encoder's lock: in background mode live requests may already be encoding.
+    encoder.encode(WARMUP_TEXTS[0])
+    encoder.encode(WARMUP_TEXTS, batch_size=len(WARMUP_TEXTS))
+
+def _warm_spacy(nlp: Any) -> None:
+    nlp(WARMUP_TEXTS[1])
+    nlp(WARMUP_TEXTS[1], disable=['parser', 'ner'])
+
+def _warm_whisper(model: Any) -> None:
+    import numpy as np
+    # One second of silence at Whisper's 16 kHz sample rate.
+    model.transcribe(np.zeros(16000, dtype=np.float32), fp16=False)
+
+def _warm_tts(tts_model: Any) -> None:
+    tts_model.tts(text=WARMUP_TEXTS[1])
+
+def _warmup_routine_for(name: str):
+    if name.startswith('embedding:'):
+        encoder = embedding_service.get_encoder(name[len('embedding:'):])
+        return lambda model: _warm_embedding(encoder)
+    return {'spacy': _warm_spacy, 'whisper': _warm_whisper, 'tts': _warm_tts}.get(name)
+
+
+class WarmupState:
+    """
+    Tracks per-model warm-up progress so /ready can tell whether the hot models are usable.
+    Status: pending -> loading -> warming -> ready, or failed (did not load) / warmup_failed
+    (loaded, but the dummy inference raised); only 'ready' counts as ready.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._required: List[str] = []
+
+    def configure(self, warm: List[str], required: List[str]) -> None:
+        with self._lock:
+            self._required = list(required)
+            for name in list(dict.fromkeys(warm + required)):
+                self._models.setdefault(name, {"status": "pending"})
+
+    def update(self, name: str, **fields) -> None:
+        with self._lock:
+            self._models.setdefault(name, {}).update(fields)
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(self._models.get(name, {}).get("status") == "ready" for name in self._required)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": all(self._models.get(n, {}).get("status") == "ready" for n in self._required),
+                "required_models": list(self._required),
+                "models": {name: dict(entry) for name, entry in self._models.items()},
+            }
+
+
+_state = WarmupState()
+_warmup_thread: Optional[threading.Thread] = None
+
+
+def _warm_model(name: str) -> bool:
+    _state.update(name, status="loading")
+    routine = _warmup_routine_for(name) # for embeddings this also registers the shared encoder's loader
+    load_start = time.perf_counter()
+    model = model_registry.get_model(name, retry_failed=True) # an explicit warm-up retries a failed load now
+    load_seconds = time.perf_counter() - load_start
+    if model is None:
+        _state.update(name, status="failed", error="model failed to load", load_seconds=round(load_seconds, 3))
+        return False
+
+    _state.update(name, status="warming", load_seconds=round(load_seconds, 3))
+    warm_start = time.perf_counter()
+    try:
+        if routine:
+            routine(model)
+    except Exception as e:
+        # A model that cannot run a dummy inference is not trusted with real traffic: /ready stays 503.
+        logger.error(f"Warm-up: Dummy inference for '{name}' failed: {e}", exc_info=True)
+        _state.update(name, status="warmup_failed", error=str(e), load_seconds=round(load_seconds, 3))
+        return False
+    warm_seconds = time.perf_counter() - warm_start
+    _state.update(name, status="ready", warmup_seconds=round(warm_seconds, 3))
+    logger.info(f"Warm-up: Model '{name}' ready (load {load_seconds:.2f}s, warm-up {warm_seconds:.2f}s).")
+    return True
+
+def run_warmup(names: List[str]) -> Dict[str, bool]:
+    """Loads and warms each model in turn. Blocks until done."""
+    results = {}
+    for name in names:
+        results[name] = _warm_model(name)
+    logger.info(f"Warm-up finished: {results}")
+    return results
+
+def _warm_until_ready(names: List[str], failed: Optional[List[str]] = None) -> None:
+    """
+    Warms names (unless failed says which of them already failed) and retries the failures with
+    the registry's backoff until all are ready, so /ready recovers from a transient load error.
+    """
+    if failed is None:
+        failed = [name for name, ok in run_warmup(names).items() if not ok]
+    attempt = 0
+    while failed:
+        delay = min(config.MODEL_LOAD_RETRY_MAX_SECONDS, config.MODEL_LOAD_RETRY_SECONDS * 2 ** attempt)
+        logger.warning(f"Warm-up: {failed} not ready; retrying in {delay:.0f}s.")
+        time.sleep(delay)
+        attempt += 1
+        failed = [name for name in failed if not _warm_model(name)]
+    logger.info("Warm-up: all models ready.")
+
+def _start_warmup_thread(names: List[str], failed: Optional[List[str]] = None) -> None:
+    global _warmup_thread
+    _warmup_thread = threading.Thread(target=_warm_until_ready, args=(names, failed), name="model-warmup", daemon=True)
+    _warmup_thread.start()
+
+def start_warmup(models: Optional[List[str]] = None, required: Optional[List[str]] = None, mode: Optional[str] = None) -> None:
+    """
+    Starts the warm-up phase for the configured models.
+    mode 'background' (default) warms in a daemon thread so the process can answer /live immediately,
+    'blocking' warms before returning, and 'off' skips warm-up (models load lazily on first use).
+    In both warming modes, models that fail are retried in the background with a backoff.
+    """
+    mode = (mode or config.WARMUP_MODE).lower()
+    warm = model_registry.expand_model_names(models if models is not None else config.PRELOAD_MODELS)
+    required = model_registry.expand_model_names(required if required is not None else config.READINESS_MODELS)
+
+    if mode == 'off':
+        # Nothing will warm the models, so readiness can't wait on them.
+        _state.configure([], [])
+        logger.info("Warm-up disabled (WARMUP_MODE=off). Models will load on first use.")
+        return
+    _state.configure(warm, required)
+    to_warm = list(dict.fromkeys(warm + required))
+    if not to_warm:
+        logger.info("Warm-up: No models configured. Models will load on first use.")
+        return
+    if mode == 'blocking':
+        failed = [name for name, ok in run_warmup(to_warm).items() if not ok]
+        if failed:
+            _start_warmup_thread(failed, failed)
+        return
+
+    _start_warmup_thread(to_warm)
+    logger.info(f"Warm-up started in the background for: {to_warm}")
+
+def is_ready() -> bool:
+    return _state.is_ready()
+
+def get_status() -> Dict[str, Any]:
+    return _state.snapshot()
@@ -0,0 +1,26 @@
+# server/rag_service/worker_pools.py
+"""
+Start method for the helper process pools of API and ingestion workers (PDF extraction, OCR).
+
+Those processes already have other threads running (request threads, the query batcher,
+heartbeats, warm-up) and torch/OpenMP loaded, so forking them is unsafe: a lock held by
+another thread at fork time (a logging handler, an allocator) stays locked in the child.
+Pools use 'forkserver' instead: a clean server process, started once per parent, preloads
+POOL_PRELOAD_MODULES (small modules that import neither the app nor torch) and forks the
+pool workers from itself. Where forkserver is unavailable, 'spawn' is used.
+
+Both start methods import the parent's main script in each child (as __mp_main__); app.py
+skips its service start-up in that case.
+"""
+import multiprocessing
+from typing import Any
+
+POOL_PRELOAD_MODULES = ['pdf_page_worker', 'ocr_worker']
+
+
+def pool_context() -> Any:
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(POOL_PRELOAD_MODULES) # only used when this process's server starts
+    return context